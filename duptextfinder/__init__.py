@@ -1,4 +1,70 @@
-from .duplicate_finder import DuplicateFinder, Duplicate, TreeBackend
+import importlib
+
+from .duplicate_finder import (
+    DuplicateFinder,
+    Duplicate,
+    DuplicateList,
+    TreeBackend,
+    Truncation,
+    Coverage,
+)
 from .char_fingerprint_builder import CharFingerprintBuilder
 from .word_fingerprint_builder import WordFingerprintBuilder
+from .byte_fingerprint_builder import ByteFingerprintBuilder
+from .vocabulary import Vocabulary
+from .text_normalizer import TextNormalizer, OffsetMap
+from .multi_threshold_duplicate_finder import MultiThresholdDuplicateFinder
+from .suffix_array_engine import SuffixArrayEngine
+from .index import MemoryIndex
+from .tree_backend_calibration import calibrateTreeBackends
 from .span import Span
+
+# names whose modules depend on heavier standard modules (asyncio, sqlite3,
+# multiprocessing, csv, pickle...), only imported when first accessed so that
+# importing the package stays fast
+_LAZY_MODULES_BY_NAME = {
+    "SqliteFingerprintIndex": ".sqlite_index",
+    "SharedMemoryIndex": ".shared_memory_index",
+    "AsyncDuplicateFinder": ".async_duplicate_finder",
+    "FinderRegistry": ".finder_registry",
+    "DbDocumentReader": ".db_io",
+    "DbDuplicateWriter": ".db_io",
+    "findDuplicatesInDb": ".db_io",
+    "ProvenanceIndex": ".provenance",
+    "Copy": ".provenance",
+}
+
+__all__ = [
+    "DuplicateFinder",
+    "Duplicate",
+    "DuplicateList",
+    "TreeBackend",
+    "Truncation",
+    "Coverage",
+    "CharFingerprintBuilder",
+    "WordFingerprintBuilder",
+    "ByteFingerprintBuilder",
+    "Vocabulary",
+    "TextNormalizer",
+    "OffsetMap",
+    "MultiThresholdDuplicateFinder",
+    "SuffixArrayEngine",
+    "MemoryIndex",
+    "calibrateTreeBackends",
+    "Span",
+    *_LAZY_MODULES_BY_NAME,
+]
+
+
+def __getattr__(name):
+    moduleName = _LAZY_MODULES_BY_NAME.get(name)
+    if moduleName is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(moduleName, __name__), name)
+    # cache it so that __getattr__() isn't called again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_MODULES_BY_NAME))
@@ -0,0 +1,125 @@
+import asyncio
+
+
+class AsyncDuplicateFinder:
+    """
+    asyncio-friendly wrapper around one `DuplicateFinder` per partition (for
+    instance per patient).
+
+    Calls to `findDuplicates()` are executed in an executor (a thread pool by
+    default) so they don't block the event loop. Documents of a same partition
+    are always processed in the order in which `findDuplicates()` was called,
+    and documents of a partition submitted while the previous ones are being
+    processed are coalesced into one batch, processed by one executor call.
+    """
+
+    def __init__(self, createDuplicateFinder, executor=None):
+        """
+        Parameters
+        ----------
+        createDuplicateFinder: Callable[[Any], DuplicateFinder]
+            Function returning a new `DuplicateFinder` for a partition key,
+            called the first time a document of the partition is submitted
+        executor: Optional[concurrent.futures.Executor]
+            Executor in which to run duplicate finding. If `None`, the default
+            executor of the event loop will be used. Must not be a process pool
+            since `DuplicateFinder` instances are kept in this process
+        """
+
+        self.createDuplicateFinder = createDuplicateFinder
+        self.executor = executor
+
+        # DuplicateFinder instances, by partition
+        self.duplicateFinders = {}
+        # documents waiting to be processed, by partition
+        self._pendingDocsByPartition = {}
+        # tasks processing pending documents, by partition
+        self._tasksByPartition = {}
+
+    async def findDuplicates(self, partition, docId, docText):
+        """
+        Look for parts in `docText` in common with previously submitted
+        documents of the same partition, cf `DuplicateFinder.findDuplicates()`
+
+        Parameters
+        ----------
+        partition: Any
+            Partition key of the document. Documents are only compared to
+            documents of the same partition
+        docId: str
+            Unique identifier of the document in the partition
+        docText: str
+            Text of the document
+
+        Returns
+        -------
+        List[Duplicate]
+            Duplicates found in `docText`
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pendingDocsByPartition.setdefault(partition, []).append(
+            (docId, docText, future)
+        )
+        if partition not in self._tasksByPartition:
+            self._tasksByPartition[partition] = loop.create_task(
+                self._processPartition(partition)
+            )
+        return await future
+
+    async def _processPartition(self, partition):
+        """
+        Process pending documents of a partition by batches until there are no
+        more documents
+        """
+
+        loop = asyncio.get_running_loop()
+        try:
+            duplicateFinder = self.duplicateFinders.get(partition)
+            if duplicateFinder is None:
+                duplicateFinder = self.createDuplicateFinder(partition)
+                self.duplicateFinders[partition] = duplicateFinder
+
+            while True:
+                batch = self._pendingDocsByPartition.pop(partition, None)
+                if not batch:
+                    break
+                try:
+                    results = await loop.run_in_executor(
+                        self.executor,
+                        _processBatch,
+                        duplicateFinder,
+                        [(docId, docText) for docId, docText, _ in batch],
+                    )
+                except Exception as e:
+                    results = [e] * len(batch)
+
+                for (_, _, future), result in zip(batch, results):
+                    if future.cancelled():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        except Exception as e:
+            for _, _, future in self._pendingDocsByPartition.pop(partition, []):
+                if not future.cancelled():
+                    future.set_exception(e)
+        finally:
+            del self._tasksByPartition[partition]
+
+
+def _processBatch(duplicateFinder, docs):
+    """
+    Call `findDuplicates()` on a batch of documents of the same partition,
+    returning the exception instead of the duplicates for documents that failed
+    """
+
+    results = []
+    for docId, docText in docs:
+        try:
+            results.append(duplicateFinder.findDuplicates(docId, docText))
+        except Exception as e:
+            results.append(e)
+    return results
@@ -0,0 +1,248 @@
+from bisect import bisect_left
+import re
+import warnings
+
+from .span import Span
+
+_LINE_REGEXP = re.compile(rb"[^\r\n]+")
+
+# byte translation table, indexed by byte value
+_ASCII_LOWER_TABLE = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz"
+)
+# UTF-8 continuation bytes (0b10xxxxxx), which don't start a character
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+class ByteFingerprintBuilder:
+    """
+    Build fingerprints directly over UTF-8 encoded texts (`bytes`, `bytearray`,
+    `memoryview` or `mmap` objects), without decoding them to `str`. To be used
+    within a `DuplicateFinder` when processing large exports, for instance with
+    slices of a memory-mapped file.
+
+    Like `CharFingerprintBuilder`, each text is scanned by a window of
+    `fingerprintLength` bytes with a shift size of `orf` bytes. Fingerprints
+    are the integers made of the bytes in each window (read directly from the
+    buffer, so no copy of the text is made, except a lowercased one when
+    case-insensitive), so unlike hashes, different windows of the same length
+    never share a fingerprint.
+    Fingerprinting is slightly slower than with `CharFingerprintBuilder` on
+    decoded texts (about 15% in bytes and 25% in characters, since character
+    boundaries have to be found first), but texts don't have to be decoded.
+
+    Spans can be reported in bytes or in characters. In characters, windows
+    only start at character boundaries, and a span covers the characters whose
+    1st byte is in the window. `stopWhenCoveredFraction` and `findCoverage()`
+    of `DuplicateFinder` count the length of texts in the same unit (cf
+    `getTextLength()`).
+    """
+
+    def __init__(
+        self,
+        fingerprintLength,
+        orf=1,
+        caseSensitive=True,
+        allowMultiline=True,
+        unit="bytes",
+    ):
+        """
+        Parameters
+        ----------
+        fingerprintLength: int
+            Number of bytes in fingerprints (cf `CharFingerprintBuilder`)
+        orf: int
+            Open Reading Frame, ie the shift size (in number of bytes) used when
+            moving the fingerprint window over the text (cf
+            `CharFingerprintBuilder`)
+        caseSensitive: bool
+            If False, ASCII letters are folded to lowercase beforehand, thus
+            making duplicate detection case-insensitive for ASCII letters
+            (other letters are left unchanged)
+        allowMultiline: bool
+            Whether fingerprints can span over multiple lines. Set to False
+            to prevent multiline duplicates
+        unit: str
+            Unit of the positions of the spans returned, "bytes" or "chars"
+            (counting the characters of the UTF-8 encoded texts)
+        """
+
+        if fingerprintLength < 1:
+            raise ValueError("Fingerprint length must be at least 1")
+        elif fingerprintLength < 2:
+            warnings.warn(
+                "Using a fingerprint of smaller than 2 defeats the purpose of fingerprinting "
+                "since there will be one fingerprint per byte. Duplicate finding is going "
+                "to be very slow."
+            )
+        if orf < 1:
+            raise ValueError("ORF must be at least 1")
+        elif orf > 1:
+            warnings.warn(
+                "Using and ORF bigger than 1 will probably lead to many duplicates being missed"
+            )
+        if unit not in ("bytes", "chars"):
+            raise ValueError(f"Unknown unit: {unit}")
+
+        self.fingerprintLength = fingerprintLength
+        self.orf = orf
+        self.caseSensitive = caseSensitive
+        self.allowMultiline = allowMultiline
+        self.unit = unit
+
+    def getTextLength(self, text):
+        """
+        Return the length of `text` in the unit of spans
+
+        Parameters
+        ----------
+        text: Union[bytes, bytearray, memoryview, mmap]
+            UTF-8 encoded text
+
+        Returns
+        -------
+        int
+            Number of bytes of `text`, or number of characters if `unit` is
+            "chars"
+        """
+
+        view = memoryview(text).cast("B")
+        if not self.caseSensitive:
+            view = memoryview(view.tobytes().translate(_ASCII_LOWER_TABLE))
+        if self.unit == "bytes":
+            return len(view)
+        # count bytes starting a character
+        return len(view.tobytes().translate(None, _CONTINUATION_BYTES))
+
+    def buildFingerprints(self, text):
+        """
+        Return a list of fingerprints and the spans in which they are found in
+        `text`.
+
+        Parameters
+        ----------
+        text: Union[bytes, bytearray, memoryview, mmap]
+            UTF-8 encoded text for which to build the fingerprints
+
+        Returns
+        -------
+        List[Tuple[Span, int]]
+            List of fingerprints contained in `text` and their corresponding
+            spans (in `unit`), sorted by ascending span
+        """
+
+        return list(self.iterFingerprints(text))
+
+    def iterFingerprints(self, text):
+        """
+        Same as `buildFingerprints()` but yield fingerprints one by one, so
+        that they don't have to be all kept in memory for long texts.
+
+        Parameters
+        ----------
+        text: Union[bytes, bytearray, memoryview, mmap]
+            UTF-8 encoded text for which to build the fingerprints
+
+        Returns
+        -------
+        Iterator[Tuple[Span, int]]
+            Iterator over fingerprints contained in `text` and their
+            corresponding spans (in `unit`), sorted by ascending span
+        """
+
+        view = memoryview(text).cast("B")
+        if not self.caseSensitive:
+            view = memoryview(view.tobytes().translate(_ASCII_LOWER_TABLE))
+
+        if self.allowMultiline:
+            yield from self._buildFingerprints(view, 0, len(view), 0)
+            return
+
+        # build fingerprints line by line if multiline fingerprints aren't
+        # allowed
+        charPosition = 0
+        previousEnd = 0
+        for match in _LINE_REGEXP.finditer(view):
+            # line breaks are 1 byte per char
+            charPosition += match.start() - previousEnd
+            charPosition = yield from self._buildFingerprints(
+                view, match.start(), match.end(), charPosition
+            )
+            previousEnd = match.end()
+
+    def _buildFingerprints(self, view, start, end, charStart):
+        """
+        Yield fingerprints and spans in which they are found in the bytes of
+        `view` from `start` to `end`.
+
+        Parameters
+        ----------
+        view: memoryview
+            Bytes of the full document text
+        start: int
+            Position of the 1st byte to fingerprint
+        end: int
+            Position of the last byte to fingerprint (excluded)
+        charStart: int
+            Character position of `start`, only used if `unit` is "chars"
+
+        Returns
+        -------
+        Iterator[Tuple[Span, int]]
+            Iterator over fingerprints and their corresponding spans, sorted by
+            ascending span. The return value of the generator is the character
+            position of `end` (if `unit` is "chars")
+        """
+
+        length = end - start
+        if length == 0:
+            return charStart
+
+        fingerprintLength = min(self.fingerprintLength, length)
+        fromBytes = int.from_bytes
+
+        if self.unit == "bytes":
+            # end of the last fingerprint yielded
+            lastEnd = start
+            for windowStart in range(start, end - fingerprintLength + 1, self.orf):
+                lastEnd = windowStart + fingerprintLength
+                span = Span(windowStart, lastEnd)
+                yield span, fromBytes(view[windowStart:lastEnd], "big")
+
+            # when the last window didn't end at `end`, we have to handle the tail
+            if lastEnd != end:
+                yield Span(lastEnd, end), fromBytes(view[lastEnd:end], "big")
+            return charStart
+
+        # positions of the bytes starting characters (UTF-8 continuation bytes
+        # are 0b10xxxxxx), followed by `end`
+        charStarts = [p for p in range(start, end) if view[p] & 0xC0 != 0x80]
+        nbChars = len(charStarts)
+        charStarts.append(end)
+
+        # number of characters starting before the end of the window
+        windowCharEnd = 0
+        lastEnd = start
+        for windowCharStart in range(nbChars):
+            windowStart = charStarts[windowCharStart]
+            windowEnd = windowStart + fingerprintLength
+            if windowEnd > end:
+                break
+            if (windowStart - start) % self.orf != 0:
+                continue
+            while charStarts[windowCharEnd] < windowEnd:
+                windowCharEnd += 1
+            span = Span(charStart + windowCharStart, charStart + windowCharEnd)
+            yield span, fromBytes(view[windowStart:windowEnd], "big")
+            lastEnd = windowEnd
+
+        # when the last window didn't end at `end`, we have to handle the tail
+        # (skipping the end of the last char of the previous window)
+        if lastEnd != end:
+            tailCharStart = bisect_left(charStarts, lastEnd)
+            tailStart = charStarts[tailCharStart]
+            if tailStart != end:
+                span = Span(charStart + tailCharStart, charStart + nbChars)
+                yield span, fromBytes(view[tailStart:end], "big")
+
+        return charStart + nbChars
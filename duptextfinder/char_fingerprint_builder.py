@@ -144,22 +144,36 @@ class CharFingerprintBuilder:
             corresponding characters spans, sorted by ascending span
         """
 
+        return list(self.iterFingerprints(text))
+
+    def iterFingerprints(self, text):
+        """
+        Same as `buildFingerprints()` but yield fingerprints one by one, so
+        that they don't have to be all kept in memory for long texts.
+
+        Parameters
+        ----------
+        text: str
+            Text for which to build the fingerprints
+
+        Returns
+        -------
+        Iterator[Tuple[Span, str]]
+            Iterator over fingerprints contained in `text` and their
+            corresponding characters spans, sorted by ascending span
+        """
+
         if not self.caseSensitive:
             text = text.lower()
 
         if self.allowMultiline:
-            return list(self._buildFingerprints(text, 0))
+            yield from self._buildFingerprints(text, 0)
+            return
 
         # build fingerprints line by line if multiline fingerprints aren't
         # allowed
-        spansAndFingerprints = []
         for match in _LINE_REGEXP.finditer(text):
-            lineStart = match.start()
-            line = match.group()
-            spansAndFingerprintsForLine = self._buildFingerprints(line, lineStart)
-            spansAndFingerprints.extend(spansAndFingerprintsForLine)
-
-        return spansAndFingerprints
+            yield from self._buildFingerprints(match.group(), match.start())
 
     def _buildFingerprints(self, text, textStart=0):
         """
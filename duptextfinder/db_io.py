@@ -0,0 +1,308 @@
+import csv
+import io
+import itertools
+import sys
+
+_DUPLICATE_COLUMNS = (
+    "partition",
+    "source_doc_id",
+    "target_doc_id",
+    "source_start",
+    "source_end",
+    "target_start",
+    "target_end",
+)
+
+_PLACEHOLDERS = {
+    "qmark": lambda i: "?",
+    "numeric": lambda i: f":{i + 1}",
+    "named": lambda i: f":p{i}",
+    "format": lambda i: "%s",
+    "pyformat": lambda i: "%s",
+}
+
+
+class DbDocumentReader:
+    """
+    Read documents from a database through a DB-API 2.0 connection (sqlite3,
+    psycopg2, etc), by chunks.
+
+    Documents are fetched sorted by partition (for instance patient id) then by
+    date, which is the order expected by `DuplicateFinder`. Rows are fetched
+    with `fetchmany()` so the whole table is never loaded in memory, and a
+    server-side cursor is used if `cursorName` is provided (psycopg2 named
+    cursors).
+
+    The same connection can be shared with a `DbDuplicateWriter`, except when
+    using a server-side cursor: the commits of the writer would close it (and
+    declaring it `WITH HOLD` would make the server copy the whole remaining
+    result set at the first commit, defeating streaming). The writer must then
+    use a separate connection.
+    """
+
+    def __init__(
+        self,
+        connection,
+        table="documents",
+        partitionColumn="partition",
+        idColumn="id",
+        dateColumn="date",
+        textColumn="text",
+        query=None,
+        chunkSize=1000,
+        cursorName=None,
+    ):
+        """
+        Parameters
+        ----------
+        connection: Any
+            DB-API 2.0 connection
+        table: str
+            Name of the table containing documents
+        partitionColumn: str
+            Column of `table` containing the partition key of the documents.
+            Documents are only compared to documents of the same partition
+        idColumn: str
+            Column of `table` containing the document ids
+        dateColumn: str
+            Column of `table` used to sort documents from older to newer
+        textColumn: str
+            Column of `table` containing the document texts
+        query: Optional[str]
+            Custom query to use instead of building one from `table` and column
+            names. Must return (partition, id, text) rows sorted by partition
+            then date
+        chunkSize: int
+            Number of rows to fetch per round trip
+        cursorName: Optional[str]
+            Name of the server-side cursor to use, for drivers supporting it
+            (such as psycopg2). No commit must happen on `connection` while
+            documents are read
+        """
+
+        if query is None:
+            query = (
+                f"SELECT {partitionColumn}, {idColumn}, {textColumn} FROM {table} "
+                f"ORDER BY {partitionColumn}, {dateColumn}, {idColumn}"
+            )
+
+        self.connection = connection
+        self.query = query
+        self.chunkSize = chunkSize
+        self.cursorName = cursorName
+
+    def __iter__(self):
+        """
+        Iterate over all documents
+
+        Returns
+        -------
+        Iterator[Tuple[Any, Any, str]]
+            Iterator over (partition, docId, docText) tuples
+        """
+
+        if self.cursorName is not None:
+            cursor = self.connection.cursor(name=self.cursorName)
+            cursor.itersize = self.chunkSize
+        else:
+            cursor = self.connection.cursor()
+
+        try:
+            cursor.execute(self.query)
+            while True:
+                rows = cursor.fetchmany(self.chunkSize)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iterPartitions(self):
+        """
+        Iterate over documents grouped by partition
+
+        Returns
+        -------
+        Iterator[Tuple[Any, Iterator[Tuple[Any, str]]]]
+            Iterator over partition keys and (docId, docText) tuples of the
+            partition. The documents of a partition must be consumed before
+            moving on to the next partition
+        """
+
+        for partition, rows in itertools.groupby(self, key=lambda r: r[0]):
+            yield partition, ((docId, docText) for _, docId, docText in rows)
+
+
+class DbDuplicateWriter:
+    """
+    Write duplicates to a database through a DB-API 2.0 connection, by batches.
+
+    Duplicates are buffered and inserted with one `executemany()` call (or one
+    `COPY` for drivers providing `copy_expert()`, such as psycopg2) every
+    `batchSize` rows, and the transaction is committed after each batch.
+
+    Can be used as a context manager to make sure remaining duplicates are
+    written on exit, including when an exception is raised (duplicates are
+    buffered document by document, so only the duplicates of fully processed
+    documents are written).
+    """
+
+    def __init__(self, connection, table="duplicates", batchSize=1000, useCopy=None):
+        """
+        Parameters
+        ----------
+        connection: Any
+            DB-API 2.0 connection
+        table: str
+            Name of the table in which duplicates are written, with columns
+            partition, source_doc_id, target_doc_id, source_start, source_end,
+            target_start and target_end (cf `createTable()`)
+        batchSize: int
+            Number of duplicates to buffer before writing them
+        useCopy: Optional[bool]
+            Whether to use `COPY FROM STDIN` instead of `executemany()`. If
+            `None`, `COPY` will be used when the driver seems to support it
+        """
+
+        if useCopy is None:
+            cursor = connection.cursor()
+            useCopy = hasattr(cursor, "copy_expert")
+            cursor.close()
+
+        self.connection = connection
+        self.table = table
+        self.batchSize = batchSize
+        self.useCopy = useCopy
+
+        self._rows = []
+        self._paramstyle = _getParamstyle(connection)
+
+    def createTable(self):
+        """Create the duplicates table if it does not already exist"""
+
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "partition TEXT, source_doc_id TEXT, target_doc_id TEXT, "
+            "source_start INTEGER, source_end INTEGER, "
+            "target_start INTEGER, target_end INTEGER)"
+        )
+        cursor.close()
+        self.connection.commit()
+
+    def write(self, partition, targetDocId, duplicates):
+        """
+        Buffer the duplicates of a document, and write buffered duplicates if
+        there are more than `batchSize`
+
+        Parameters
+        ----------
+        partition: Any
+            Partition key of the document
+        targetDocId: Any
+            Identifier of the document
+        duplicates: List[Duplicate]
+            Duplicates found in the document, as returned by
+            `DuplicateFinder.findDuplicates()`
+        """
+
+        self._rows.extend(
+            (
+                partition,
+                d.sourceDocId,
+                targetDocId,
+                d.sourceSpan.start,
+                d.sourceSpan.end,
+                d.targetSpan.start,
+                d.targetSpan.end,
+            )
+            for d in duplicates
+        )
+        if len(self._rows) >= self.batchSize:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered duplicates and commit"""
+
+        if not self._rows:
+            return
+
+        cursor = self.connection.cursor()
+        if self.useCopy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(self._rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {self.table} ({', '.join(_DUPLICATE_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        else:
+            placeholders = ", ".join(
+                _PLACEHOLDERS[self._paramstyle](i)
+                for i in range(len(_DUPLICATE_COLUMNS))
+            )
+            rows = self._rows
+            if self._paramstyle == "named":
+                rows = [{f"p{i}": v for i, v in enumerate(row)} for row in rows]
+            cursor.executemany(
+                f"INSERT INTO {self.table} ({', '.join(_DUPLICATE_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+        cursor.close()
+        self.connection.commit()
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+def findDuplicatesInDb(reader, writer, createDuplicateFinder):
+    """
+    Find duplicates in all documents provided by `reader`, partition by
+    partition, and write them with `writer`
+
+    Parameters
+    ----------
+    reader: DbDocumentReader
+        Reader providing documents sorted by partition and date
+    writer: DbDuplicateWriter
+        Writer to use to store duplicates. Remaining buffered duplicates are
+        written at the end. Must use a separate connection if `reader` uses a
+        server-side cursor
+    createDuplicateFinder: Callable[[Any], DuplicateFinder]
+        Function returning a new `DuplicateFinder` for a partition key
+
+    Returns
+    -------
+    int
+        Number of documents processed
+    """
+
+    if reader.cursorName is not None and writer.connection is reader.connection:
+        raise ValueError(
+            "Writer must use a separate connection when reader uses a "
+            "server-side cursor, which commits would close"
+        )
+
+    nbDocs = 0
+    for partition, docs in reader.iterPartitions():
+        duplicateFinder = createDuplicateFinder(partition)
+        for docId, docText in docs:
+            duplicates = duplicateFinder.findDuplicates(docId, docText)
+            writer.write(partition, docId, duplicates)
+            nbDocs += 1
+    writer.flush()
+    return nbDocs
+
+
+def _getParamstyle(connection):
+    """Return the DB-API paramstyle of the module `connection` comes from"""
+
+    moduleName = type(connection).__module__.split(".")[0]
+    module = sys.modules.get(moduleName)
+    return getattr(module, "paramstyle", "qmark")
@@ -1,27 +1,43 @@
+from array import array
+from bisect import bisect_left, bisect_right
 from enum import Enum
-
-try:
-    import intervaltree as it
-
-    _HAS_INTERVAL_TREE = True
-except ImportError:
-    _HAS_INTERVAL_TREE = False
-
-try:
-    from ncls import NCLS
-    import numpy as np
-
-    _HAS_NCLS = True
-except ImportError:
-    _HAS_NCLS = False
-
+import functools
+import importlib.util
+import itertools
+import os
+from pathlib import Path
+import struct
+import time
+
+from .index import MemoryIndex
+from .read_write_lock import ReadWriteLock
 from .span import Span
+from .tree_backend_calibration import (
+    FIND_SPANS_BELONGING_TO_DUPLICATES,
+    REMOVE_OVERLAPPING_DUPLICATES,
+    loadTreeBackendThresholds,
+)
+
+_SNAPSHOT_MAGIC = b"DTFS"
+# version of the snapshot format
+_SNAPSHOT_HEADER = struct.Struct("<q")
+_SNAPSHOT_VERSION = 1
 
 
 class _Document:
     """Fingerprinted document"""
 
-    def __init__(self, id, spansByFingerprint):
+    # default for documents pickled before duplicated fingerprints were kept
+    duplicatedFingerprints = frozenset()
+
+    def __init__(
+        self,
+        id,
+        spansByFingerprint,
+        sourceDocIds=(),
+        offsetMap=None,
+        duplicatedFingerprints=(),
+    ):
         """
         Parameters
         ----------
@@ -31,10 +47,68 @@ class _Document:
             Fingerprinted spans of the document, organized by fingerprint.
             This is used to easily get all spans of a source document having the
             same fingerprint as the span of a target document.
+        sourceDocIds: Iterable[str]
+            Identifiers of the documents used as sources by the duplicates of
+            the document. Used to find out which documents are affected when a
+            document is removed or replaced
+        offsetMap: Optional[OffsetMap]
+            If the document was normalized before being fingerprinted, mapping
+            of the positions of the spans to the positions of the original text
+        duplicatedFingerprints: Iterable[str]
+            Fingerprints of the document only found in spans belonging to
+            duplicates (and therefore missing from `spansByFingerprint`). Along
+            with `spansByFingerprint`, used to find out which documents may
+            match a document that is inserted, removed or replaced before them
         """
 
         self.id = id
         self.spansByFingerprint = spansByFingerprint
+        self.sourceDocIds = frozenset(sourceDocIds)
+        self.offsetMap = offsetMap
+        self.duplicatedFingerprints = frozenset(duplicatedFingerprints)
+
+    def __getstate__(self):
+        # spans are packed in arrays, which are much faster to pickle and
+        # unpickle than Span objects. They are unpacked on first access (cf
+        # __getattr__()), so that loading a snapshot is fast
+        state = self.__dict__.copy()
+        spansByFingerprint = state.pop("spansByFingerprint", None)
+        if spansByFingerprint is not None:
+            counts = array("q", [len(spans) for spans in spansByFingerprint.values()])
+            spans = list(itertools.chain.from_iterable(spansByFingerprint.values()))
+            starts = array("q", [span.start for span in spans])
+            ends = array("q", [span.end for span in spans])
+            state["_packedSpans"] = list(spansByFingerprint), counts, starts, ends
+        return state
+
+    def __getattr__(self, name):
+        # only called when the attribute wasn't found, ie when spans of an
+        # unpickled document weren't unpacked yet
+        if name != "spansByFingerprint":
+            raise AttributeError(name)
+        packedSpans = self.__dict__.get("_packedSpans")
+        if packedSpans is None:
+            # unpacked by another thread in the meantime
+            try:
+                return self.__dict__[name]
+            except KeyError:
+                raise AttributeError(name) from None
+
+        fingerprints, counts, starts, ends = packedSpans
+        spans = list(map(Span, starts, ends))
+        spansByFingerprint = dict(
+            zip(
+                fingerprints,
+                (
+                    spans[i - c : i]
+                    for c, i in zip(counts, itertools.accumulate(counts))
+                ),
+            )
+        )
+        # set spans before removing packed spans, for concurrent readers
+        self.spansByFingerprint = spansByFingerprint
+        self.__dict__.pop("_packedSpans", None)
+        return spansByFingerprint
 
 
 class Duplicate:
@@ -45,7 +119,7 @@ class Duplicate:
 
     __slots__ = "sourceDocId", "sourceSpan", "targetSpan", "length"
 
-    def __init__(self, sourceDocId, sourceSpan, targetSpan):
+    def __init__(self, sourceDocId, sourceSpan, targetSpan, mapped=False):
         """
         Parameters
         ----------
@@ -55,10 +129,16 @@ class Duplicate:
             Duplicated character span in the source document
         targetSpan: Span
             Duplicated character span in the target document. Must be same
-            length as `sourceSpan`
+            length as `sourceSpan`, unless `mapped` is set. `length` is the
+            length of `targetSpan`
+        mapped: bool
+            Whether the spans were mapped back to the original texts after
+            normalization by a `TextNormalizer`, in which case they may have
+            different lengths (the original texts may for instance have
+            different whitespace)
         """
 
-        assert sourceSpan.length == targetSpan.length
+        assert mapped or sourceSpan.length == targetSpan.length
 
         self.sourceDocId = sourceDocId
         self.sourceSpan = sourceSpan
@@ -69,13 +149,112 @@ class Duplicate:
         return f"Duplicate(sourceDocId={self.sourceDocId}, sourceSpan={self.sourceSpan!r}, targetSpan={self.targetSpan!r})"
 
 
+class DuplicateList(list):
+    """
+    List of `Duplicate` objects returned by `DuplicateFinder.findDuplicates()`,
+    also indicating whether some work limits were hit, in which case the list
+    may be incomplete
+    """
+
+    def __init__(
+        self,
+        duplicates=(),
+        truncations=(),
+        revisedDuplicates=None,
+        templateDuplicates=(),
+    ):
+        """
+        Parameters
+        ----------
+        duplicates: Iterable[Duplicate]
+            Duplicates found
+        truncations: Iterable[Truncation]
+            Work limits that were hit while finding the duplicates
+        revisedDuplicates: Optional[Dict[str, DuplicateList]]
+            New duplicates of the later documents that were processed again
+            because of a document received late (cf `allowLateDocuments` of
+            `DuplicateFinder`), by document id
+        templateDuplicates: Iterable[Duplicate]
+            Parts of the document found in templates (cf
+            `DuplicateFinder.addTemplate()`), whose `sourceDocId` is the id of
+            the template
+        """
+
+        super().__init__(duplicates)
+        self.truncations = frozenset(truncations)
+        self.revisedDuplicates = {} if revisedDuplicates is None else revisedDuplicates
+        self.templateDuplicates = list(templateDuplicates)
+
+    @property
+    def truncated(self):
+        """Whether some work limits were hit (and some duplicates maybe missed)"""
+
+        return bool(self.truncations)
+
+
+class Coverage:
+    """
+    Part of a document covered by duplicates, as returned by
+    `DuplicateFinder.findCoverage()`
+    """
+
+    def __init__(self, length, nbDuplicatedChars, bitmap=None):
+        """
+        Parameters
+        ----------
+        length: int
+            Number of characters in the document
+        nbDuplicatedChars: int
+            Number of characters of the document belonging to duplicates
+        bitmap: Optional[numpy.ndarray]
+            Positions of the characters belonging to duplicates, as a bit array
+            packed with `numpy.packbits()` (use `numpy.unpackbits(bitmap,
+            count=length)` to get one value per character)
+        """
+
+        self.length = length
+        self.nbDuplicatedChars = nbDuplicatedChars
+        self.bitmap = bitmap
+
+    @property
+    def fraction(self):
+        """Fraction of the characters of the document belonging to duplicates"""
+
+        return self.nbDuplicatedChars / self.length if self.length else 0.0
+
+    def __repr__(self):
+        return f"Coverage(length={self.length}, nbDuplicatedChars={self.nbDuplicatedChars})"
+
+
+class Truncation(Enum):
+    """Work limits of `DuplicateFinder` that can cause results to be partial"""
+
+    # some source spans were ignored for fingerprints having more than
+    # `maxSourceSpansPerFingerprint` spans in a source document
+    SOURCE_SPANS = "SOURCE_SPANS"
+    # some in-progress duplicates were abandoned because there were more than
+    # `maxInProgressDuplicates`
+    IN_PROGRESS_DUPLICATES = "IN_PROGRESS_DUPLICATES"
+    # `maxTime` was exceeded, remaining parts of the target document and
+    # remaining source documents were not processed
+    TIME = "TIME"
+    # `maxSources` source documents with duplicates were found, remaining
+    # source documents were not processed
+    MAX_SOURCES = "MAX_SOURCES"
+    # `stopWhenCoveredFraction` of the target document was covered by
+    # duplicates, remaining source documents were not processed
+    COVERED_FRACTION = "COVERED_FRACTION"
+
+
 class TreeBackend(Enum):
     """Available backends to use for overlap trees. Using NCLS might improve
-    performance"""
+    performance. AUTO selects a backend at each call depending on the size of
+    inputs, using thresholds saved by `calibrateTreeBackends()`"""
 
     NONE = "NONE"
     INTERVAL_TREE = "INTERVAL_TREE"
     NCLS = "NCLS"
+    AUTO = "AUTO"
 
 
 class DuplicateFinder:
@@ -84,15 +263,52 @@ class DuplicateFinder:
 
     Relies on a fingerprint builder to generate fingerprints for each document,
     then identifies common consecutive fingerprints between documents.
+
+    Previously seen documents can be removed or replaced (for instance when a
+    note is amended or retracted) with `removeDocument()` and
+    `replaceDocument()`. Since the duplicates of a document depend on the
+    documents seen before it, these operations return the ids of the later
+    documents whose duplicates may have changed. Their duplicates are not
+    updated automatically: calling `replaceDocument()` with their unchanged
+    text recomputes them (and returns in turn the documents affected by this
+    change).
+
+    Documents are expected to be processed in chronological order. When
+    `allowLateDocuments` is set, documents can be given a timestamp, and a
+    document older than the last ones is processed as if it had been received
+    in order: only the previous documents are used as its sources, and the
+    later documents it may be a source for are processed again.
+
+    Instances can be shared between threads: `queryDuplicates()` calls (which
+    don't modify the history) run concurrently, while methods modifying the
+    history wait for ongoing queries and run one at a time.
     """
 
-    def __init__(self, fingerprintBuilder, minDuplicateLength=2, treeBackend=None):
+    def __init__(
+        self,
+        fingerprintBuilder=None,
+        minDuplicateLength=2,
+        treeBackend=None,
+        engine=None,
+        index=None,
+        maxSourceSpansPerFingerprint=None,
+        maxInProgressDuplicates=None,
+        maxTime=None,
+        maxSources=None,
+        stopWhenCoveredFraction=None,
+        chunkSize=None,
+        provenanceIndex=None,
+        globalOverlapResolution=False,
+        allowLateDocuments=False,
+        maxGapLength=None,
+        normalizer=None,
+    ):
         """
         Parameters
         ----------
-        fingerprintBuilder: Union[CharFingerprintBuilder, WordFingerprintBuilder]
+        fingerprintBuilder: Optional[Union[CharFingerprintBuilder, WordFingerprintBuilder]]
             Fingerprint builder instance to use to generate fingerprints for
-            each document
+            each document. Must be `None` if `engine` is provided
         minDuplicateLength: int
             Minimum number of characters in duplicates. Should be set in
             accordance with the `fingerprintLength` of the fingerprint builder,
@@ -103,30 +319,318 @@ class DuplicateFinder:
             NCLS or INTERVAL_TREE (in that order) if they appear to be
             available. Using NCLS should provide best performance. INTERVAL_TREE
             performance can be inferior to not using overlap trees at all.
+            With AUTO, the fastest backend is selected for each document
+            according to its number of duplicates, using the thresholds saved
+            by `calibrateTreeBackends()` (or default thresholds if it was never
+            run)
+        engine: Optional[SuffixArrayEngine]
+            Alternative matching engine to use instead of fingerprints. When
+            provided, `fingerprintBuilder` must be `None`
+        index: Optional[Union[MemoryIndex, SqliteFingerprintIndex]]
+            Storage of previously seen documents. If `None` provided, documents
+            will be kept in memory. Persistent indexes such as
+            `SqliteFingerprintIndex` can only be used with fingerprints (not
+            with `engine`)
+        maxSourceSpansPerFingerprint: Optional[int]
+            Maximum number of spans of a source document to consider for each
+            fingerprint of the target document. Highly repeated fingerprints
+            (tables, separator lines, etc) will only be matched to the 1st
+            spans having them. `None` means no limit
+        maxInProgressDuplicates: Optional[int]
+            Maximum number of duplicates being built simultaneously when
+            matching a target document with a source document (cf
+            `_buildDuplicates()`). `None` means no limit
+        maxTime: Optional[float]
+            Maximum time (in seconds) to spend matching a target document with
+            previous documents. Once exceeded, remaining previous documents are
+            not processed. The time spent in fingerprinting, overlap removal
+            and blacklisting is included but these steps are never interrupted.
+            `None` means no limit
+        maxSources: Optional[int]
+            Maximum number of source documents to return duplicates for. Previous
+            documents are processed by decreasing number of fingerprints in
+            common with the target document (rather than chronologically), and
+            processing stops as soon as `maxSources` of them yielded
+            duplicates (with `globalOverlapResolution`, remaining duplicates
+            once overlaps are resolved across sources). `None` means no limit
+        stopWhenCoveredFraction: Optional[float]
+            Fraction (between 0 and 1) of the characters of the target document
+            after which to stop looking for duplicates. Previous documents are
+            processed in the same order as with `maxSources`, and processing
+            stops as soon as duplicates cover this fraction of the target
+            document. `None` means no limit
+
+            When any of these limits is hit, the duplicates returned by
+            `findDuplicates()` may be incomplete, which is indicated by their
+            `truncations` attribute. The limits are only supported with
+            fingerprints (not with `engine`)
+        chunkSize: Optional[int]
+            If provided, documents are fingerprinted and matched with previous
+            documents by chunks of `chunkSize` fingerprints, rather than all at
+            once. The duplicates found are the same, but the memory needed to
+            process a document depends on `chunkSize` rather than on the length
+            of the document, at the cost of fingerprinting documents twice. To
+            be used for very long documents. Not supported with `engine`,
+            `maxSources` and `stopWhenCoveredFraction`
+        provenanceIndex: Optional[ProvenanceIndex]
+            Reverse index to keep up to date with the duplicates found, to be
+            able to find out where documents were copied to
+        globalOverlapResolution: bool
+            By default, overlapping duplicates are trimmed or dropped source
+            document by source document, so duplicates from different source
+            documents may overlap. If True, this is done once for the
+            duplicates of all source documents, so that no duplicates overlap.
+            Longer duplicates are kept first, then duplicates from earlier
+            source documents
+        allowLateDocuments: bool
+            Whether documents can be received out of chronological order (cf
+            `findDuplicates()`). The text of each document is then kept in
+            memory, to be able to process it again. Only supported with
+            `MemoryIndex`
+        maxGapLength: Optional[int]
+            If provided, duplicates from the same source document separated by
+            at most `maxGapLength` characters (the same number of characters in
+            the source and target documents, for instance when a date or a dose
+            was edited in the copied text) are merged into one duplicate
+            including the gap, and `minDuplicateLength` applies to merged
+            duplicates. Not supported with `engine`
+        normalizer: Optional[TextNormalizer]
+            If provided, texts are normalized before being fingerprinted (or
+            matched by `engine`), and the spans of duplicates are mapped back
+            to the original texts. Only supported with `MemoryIndex`
         """
 
+        if (fingerprintBuilder is None) == (engine is None):
+            raise ValueError(
+                "Exactly one of fingerprintBuilder and engine must be provided"
+            )
+        if index is None:
+            index = MemoryIndex()
+        elif engine is not None and not isinstance(index, MemoryIndex):
+            raise ValueError("Only MemoryIndex can be used along with an engine")
+        if engine is not None and (
+            maxSourceSpansPerFingerprint is not None
+            or maxInProgressDuplicates is not None
+            or maxTime is not None
+            or maxSources is not None
+            or stopWhenCoveredFraction is not None
+        ):
+            raise ValueError("Work limits can't be used along with an engine")
+        if chunkSize is not None and (
+            engine is not None
+            or maxSources is not None
+            or stopWhenCoveredFraction is not None
+        ):
+            raise ValueError(
+                "chunkSize can't be used along with an engine, maxSources or "
+                "stopWhenCoveredFraction"
+            )
+        if engine is not None and maxGapLength is not None:
+            raise ValueError("maxGapLength can't be used along with an engine")
+        if allowLateDocuments and not isinstance(index, MemoryIndex):
+            raise ValueError("allowLateDocuments can only be used with MemoryIndex")
+        if normalizer is not None and not isinstance(index, MemoryIndex):
+            raise ValueError("normalizer can only be used with MemoryIndex")
+
         if treeBackend is None:
-            if _HAS_NCLS:
-                treeBackend = TreeBackend.NCLS
-            elif _HAS_INTERVAL_TREE:
-                treeBackend = TreeBackend.INTERVAL_TREE
-            else:
-                treeBackend = TreeBackend.NONE
+            treeBackend = _getDefaultTreeBackend()
 
         self.fingerprintBuilder = fingerprintBuilder
         self.minDuplicateLength = minDuplicateLength
         self.treeBackend = treeBackend
+        self.engine = engine
+        self.maxSourceSpansPerFingerprint = maxSourceSpansPerFingerprint
+        self.maxInProgressDuplicates = maxInProgressDuplicates
+        self.maxTime = maxTime
+        self.maxSources = maxSources
+        self.stopWhenCoveredFraction = stopWhenCoveredFraction
+        self.chunkSize = chunkSize
+        self.provenanceIndex = provenanceIndex
+        self.globalOverlapResolution = globalOverlapResolution
+        self.allowLateDocuments = allowLateDocuments
+        self.maxGapLength = maxGapLength
+        self.normalizer = normalizer
+
+        # previously seen documents
+        self._index = index
+        # fingerprinted templates, by id
+        self._templatesById = {}
+        # texts and timestamps of previously seen documents, by id (only
+        # with allowLateDocuments)
+        self._textsById = {}
+        self._timestampsById = {}
+        # timestamps of previously seen documents, sorted, and corresponding
+        # ids (in the same order as in the index)
+        self._sortedTimestamps = []
+        self._sortedTimestampDocIds = []
+        # allows concurrent queries, but only one modification of the index
+        # at a time
+        self._lock = ReadWriteLock()
+
+    def __len__(self):
+        """Number of previously seen documents"""
+
+        with self._lock.reading():
+            return len(self._index)
+
+    def __contains__(self, docId):
+        """Whether a document with id `docId` was previously seen"""
+
+        with self._lock.reading():
+            return docId in self._index
+
+    def __getstate__(self):
+        # locks can't be pickled
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = ReadWriteLock()
+
+    def saveSnapshot(self, path):
+        """
+        Save the finder (parameters and previously seen documents) to a file,
+        from which a new process can quickly get a warm finder with
+        `loadSnapshot()`, instead of processing the history again.
+
+        Only supported with `MemoryIndex` (other indexes are already
+        persistent). The fingerprint builder, engine and normalizer must be
+        picklable.
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            Path of the file to write
+        """
+
+        import pickle
+
+        if not isinstance(self._index, MemoryIndex):
+            raise Exception("Snapshots can only be saved along with MemoryIndex")
+
+        with self._lock.reading():
+            data = pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+        # write to temporary file first so a crash doesn't leave a truncated
+        # file behind
+        path = Path(path)
+        tmpPath = path.with_name(path.name + ".tmp")
+        with open(tmpPath, "wb") as fp:
+            fp.write(_SNAPSHOT_MAGIC)
+            fp.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_VERSION))
+            fp.write(data)
+        os.replace(tmpPath, path)
+
+    @classmethod
+    def loadSnapshot(cls, path):
+        """
+        Load a finder saved with `saveSnapshot()`
+
+        The fingerprinted spans of each document are only unpacked when the
+        document is first compared to a new document, so loading is fast even
+        for large histories.
+
+        Snapshots are pickle files, and unpickling can run arbitrary code: only
+        load snapshots from trusted sources (typically, saved by the same
+        application).
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            Path of the file to read
+
+        Returns
+        -------
+        DuplicateFinder
+            Loaded finder
+        """
 
-        # mapping of previously seen documents, by id
-        self._docsById = dict()
+        import pickle
 
-    def findDuplicates(self, docId, docText):
+        with open(path, "rb") as fp:
+            if fp.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise Exception(f"{path} is not a duplicate finder snapshot")
+            (version,) = _SNAPSHOT_HEADER.unpack(fp.read(_SNAPSHOT_HEADER.size))
+            if version != _SNAPSHOT_VERSION:
+                raise Exception(f"Unsupported snapshot version: {version}")
+            duplicateFinder = pickle.load(fp)
+        if not isinstance(duplicateFinder, cls):
+            raise Exception(f"{path} is not a duplicate finder snapshot")
+        return duplicateFinder
+
+    def findDuplicates(self, docId, docText, timestamp=None):
         """
         Look for parts in `docText` in common with previously seen documents,
         and return then as `Duplicate` objects.
 
         To compare "newer" documents with "older" ones, make sure to call this
-        by increasing date/time.
+        by increasing date/time, or set `allowLateDocuments` and provide
+        timestamps.
+
+        Parameters
+        ----------
+        docId: str
+            Unique identifier of the document
+        docText: str
+            Text of the document
+        timestamp: Optional[Any]
+            Date/time of the document (any comparable value). Required with
+            `allowLateDocuments` (and not supported otherwise). If older than
+            the timestamps of previously seen documents, the document is
+            processed as if it had been received before them: only documents
+            with older or equal timestamps are used as sources, and the later
+            documents whose duplicates may be affected are processed again
+            (cf `revisedDuplicates` of the returned `DuplicateList`)
+
+        Returns
+        -------
+        DuplicateList
+            `Duplicate` objects designating the character spans of `docText`
+            in common with previously seen documents, grouped by source
+            document (in the order in which source documents were seen)
+        """
+
+        if self.allowLateDocuments != (timestamp is not None):
+            raise Exception(
+                "timestamp must be provided if and only if allowLateDocuments is set"
+            )
+
+        with self._lock.writing():
+            if docId in self._index:
+                raise Exception(f"Already processed document with id {docId}")
+
+            beforeDocId = None
+            if self.allowLateDocuments:
+                beforeDocId = self._getNextDocId(timestamp)
+
+            if beforeDocId is None:
+                doc, duplicates = self._processDocument(docId, docText)
+                self._index.addDocument(doc)
+            else:
+                doc, duplicates = self._processDocument(
+                    docId, docText, beforeDocId=beforeDocId
+                )
+                self._index.insertDocument(doc, beforeDocId)
+            if self.provenanceIndex is not None:
+                self.provenanceIndex.addDuplicates(docId, duplicates)
+            if self.allowLateDocuments:
+                self._textsById[docId] = docText
+                self._addTimestamp(docId, timestamp)
+
+            if beforeDocId is not None:
+                duplicates.revisedDuplicates = self._reprocessLaterDocuments(doc)
+            return duplicates
+
+    def findCoverage(self, docId, docText, bitmap=False):
+        """
+        Like `findDuplicates()`, but only return the number of characters of
+        `docText` belonging to duplicates, rather than the duplicates.
+
+        The document is stored and used as a source for upcoming documents
+        exactly as with `findDuplicates()`, but some of the work not impacting
+        the coverage is skipped (sorting of duplicates, trimming of duplicates
+        when they don't overlap, overlap tree building for blacklisting).
 
         Parameters
         ----------
@@ -134,32 +638,569 @@ class DuplicateFinder:
             Unique identifier of the document
         docText: str
             Text of the document
+        bitmap: bool
+            Whether to also return the positions of duplicated characters, as a
+            packed bit array. Requires numpy
+
+        Returns
+        -------
+        Coverage
+            Number of characters in `docText` belonging to duplicates (and
+            their positions)
+        """
+
+        if self.allowLateDocuments:
+            raise Exception(
+                "findCoverage() can't be used along with allowLateDocuments"
+            )
+        if bitmap and not _isAvailable("numpy"):
+            raise Exception(
+                "Coverage bitmap requested but numpy package does not seem to be installed"
+            )
+
+        with self._lock.writing():
+            if docId in self._index:
+                raise Exception(f"Already processed document with id {docId}")
+
+            doc, duplicates = self._processDocument(docId, docText, coverageOnly=True)
+            self._index.addDocument(doc)
+            if self.provenanceIndex is not None:
+                self.provenanceIndex.addDuplicates(docId, duplicates)
+
+        intervals = _mergeTargetSpans(duplicates)
+        nbDuplicatedChars = sum(end - start for start, end in intervals)
+        docLength = self._getTextLength(docText)
+        if not bitmap:
+            return Coverage(docLength, nbDuplicatedChars)
+        import numpy as np
+
+        duplicatedChars = np.zeros(docLength, dtype=bool)
+        for start, end in intervals:
+            duplicatedChars[start:end] = True
+        return Coverage(docLength, nbDuplicatedChars, np.packbits(duplicatedChars))
+
+    def queryDuplicates(self, docText):
+        """
+        Look for parts in `docText` in common with previously seen documents,
+        like `findDuplicates()`, but without storing `docText`. It will not be
+        used as a source for upcoming documents.
+
+        Several queries can run at the same time from different threads.
+
+        Parameters
+        ----------
+        docText: str
+            Text of the document, for instance a draft
+
+        Returns
+        -------
+        DuplicateList
+            `Duplicate` objects designating the character spans of `docText`
+            in common with previously seen documents, cf `findDuplicates()`
+        """
+
+        with self._lock.reading():
+            _, duplicates = self._processDocument(None, docText, buildDocument=False)
+            return duplicates
+
+    def addTemplate(self, templateId, templateText):
+        """
+        Register a template (boilerplate text from which many documents are
+        instantiated).
+
+        Parts of upcoming documents found in templates are reported separately,
+        in the `templateDuplicates` attribute of the `DuplicateList` returned by
+        `findDuplicates()`, rather than as duplicates of previous documents.
+        They are not matched with previous documents nor stored in the index,
+        which saves memory and time when most documents share the same
+        templates. The fingerprints of templates are stored only once.
+
+        Not supported with `engine` nor `chunkSize`.
+
+        Parameters
+        ----------
+        templateId: str
+            Unique identifier of the template
+        templateText: str
+            Text of the template
+        """
+
+        if self.engine is not None or self.chunkSize is not None:
+            raise Exception("Templates can't be used along with an engine or chunkSize")
+
+        with self._lock.writing():
+            if templateId in self._templatesById:
+                raise Exception(f"Already added template with id {templateId}")
+
+            offsetMap = None
+            if self.normalizer is not None:
+                templateText, offsetMap = self.normalizer.normalize(templateText)
+            spansByFingerprint = {}
+            for span, fingerprint in self.fingerprintBuilder.iterFingerprints(
+                templateText
+            ):
+                spansByFingerprint.setdefault(fingerprint, []).append(span)
+            self._templatesById[templateId] = _Document(
+                templateId, spansByFingerprint, offsetMap=offsetMap
+            )
+
+    def searchPassage(self, text, minLength=None):
+        """
+        Look for the parts of a passage (for instance a template paragraph)
+        found in previously seen documents.
+
+        Unlike `queryDuplicates()`, overlapping hits are not trimmed: all the
+        occurrences of each part of the passage are returned.
+
+        Note that the parts of documents that were found to be duplicates of
+        previous documents are not indexed (cf `findDuplicates()`), so a
+        passage copied in several documents will only be found in the 1st one.
+        The documents it was copied to can be found with a `ProvenanceIndex`.
+
+        Parameters
+        ----------
+        text: str
+            Passage to look for. Not stored
+        minLength: Optional[int]
+            Minimum number of characters of the hits. If `None` provided,
+            `minDuplicateLength` is used
+
+        Returns
+        -------
+        List[Tuple[str, Span]]
+            Identifiers of the documents containing parts of the passage and
+            character spans of these parts, in the order in which documents
+            were seen then by ascending spans
+        """
+
+        if self.engine is not None:
+            raise Exception("searchPassage() can't be used along with an engine")
+        if minLength is None:
+            minLength = self.minDuplicateLength
+
+        if self.normalizer is not None:
+            text, _ = self.normalizer.normalize(text)
+
+        with self._lock.reading():
+            spansAndFingerprints = self.fingerprintBuilder.buildFingerprints(text)
+            fingerprints = {fingerprint for _, fingerprint in spansAndFingerprints}
+
+            hits = []
+            for doc in self._index.getDocuments(fingerprints):
+                duplicates = _buildDuplicates(spansAndFingerprints, doc, minLength)
+                # the same source span can match several parts of the passage
+                sourceSpans = sorted(
+                    {(d.sourceSpan.start, d.sourceSpan.end) for d in duplicates}
+                )
+                for start, end in sourceSpans:
+                    span = Span(start, end)
+                    if doc.offsetMap is not None:
+                        span = doc.offsetMap.toOriginalSpan(span)
+                    hits.append((doc.id, span))
+            return hits
+
+    def removeDocument(self, docId):
+        """
+        Remove a previously seen document, so that it is not used as a source
+        anymore.
+
+        The duplicates of later documents that had this document as source
+        are not updated, cf `replaceDocument()`.
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document to remove
+
+        Returns
+        -------
+        List[str]
+            Identifiers of the later documents whose duplicates may be
+            affected (those having the removed document as source), in the
+            order in which they were seen
+        """
+
+        with self._lock.writing():
+            if docId not in self._index:
+                raise Exception(f"Unknown document with id {docId}")
+
+            affectedDocIds = self._index.getAffectedDocIds(docId, set())
+            self._index.removeDocument(docId)
+            self._textsById.pop(docId, None)
+            if self.allowLateDocuments:
+                self._removeTimestamp(docId)
+            if self.provenanceIndex is not None:
+                self.provenanceIndex.removeDocument(docId)
+            return affectedDocIds
+
+    def replaceDocument(self, docId, docText):
+        """
+        Replace the text of a previously seen document, keeping its position
+        in the history. Its duplicates are recomputed, only against the
+        documents seen before it.
+
+        The duplicates of later documents are not updated, cf class docstring.
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document to replace
+        docText: str
+            New text of the document
+
+        Returns
+        -------
+        Tuple[DuplicateList, List[str]]
+            Duplicates found in the new text (cf `findDuplicates()`), and
+            identifiers of the later documents whose duplicates may be affected
+            (those having the replaced document as source, or having
+            fingerprints in common with its new text), in the order in which
+            they were seen
+        """
+
+        with self._lock.writing():
+            if docId not in self._index:
+                raise Exception(f"Unknown document with id {docId}")
+
+            doc, duplicates = self._processDocument(docId, docText, beforeDocId=docId)
+            # without fingerprints, any later document may now match the new text
+            fingerprints = (
+                None if self.engine is not None else set(doc.spansByFingerprint)
+            )
+            affectedDocIds = self._index.getAffectedDocIds(docId, fingerprints)
+            self._index.replaceDocument(doc)
+            if self.allowLateDocuments:
+                self._textsById[docId] = docText
+            if self.provenanceIndex is not None:
+                self.provenanceIndex.removeTarget(docId)
+                self.provenanceIndex.addDuplicates(docId, duplicates)
+            return duplicates, affectedDocIds
+
+    def _getTextLength(self, docText):
+        """
+        Return the length of `docText` in the unit of the spans of the
+        fingerprint builder (for instance characters for a
+        `ByteFingerprintBuilder` with `unit="chars"`)
+        """
+
+        getTextLength = getattr(self.fingerprintBuilder, "getTextLength", None)
+        return len(docText) if getTextLength is None else getTextLength(docText)
+
+    def _getNextDocId(self, timestamp):
+        """
+        Return the id of the 1st stored document with a timestamp strictly
+        greater than `timestamp`, or `None` if there is no such document
+        """
+
+        timestamps = self._sortedTimestamps
+        # fast path for documents received in order
+        if not timestamps or timestamp >= timestamps[-1]:
+            return None
+        position = bisect_right(timestamps, timestamp)
+        return self._sortedTimestampDocIds[position]
+
+    def _addTimestamp(self, docId, timestamp):
+        """
+        Record the timestamp of a newly stored document, stored after all the
+        documents with a lower or equal timestamp
+        """
+
+        self._timestampsById[docId] = timestamp
+        timestamps = self._sortedTimestamps
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            self._sortedTimestampDocIds.append(docId)
+        else:
+            position = bisect_right(timestamps, timestamp)
+            timestamps.insert(position, timestamp)
+            self._sortedTimestampDocIds.insert(position, docId)
+
+    def _removeTimestamp(self, docId):
+        """Forget the timestamp of a removed document"""
+
+        timestamp = self._timestampsById.pop(docId)
+        # look for the document among the ones with the same timestamp
+        position = bisect_left(self._sortedTimestamps, timestamp)
+        while self._sortedTimestampDocIds[position] != docId:
+            position += 1
+        del self._sortedTimestamps[position]
+        del self._sortedTimestampDocIds[position]
+
+    def _reprocessLaterDocuments(self, doc):
+        """
+        Process again the documents stored after a document received late,
+        whose duplicates may have changed, and propagate the changes to the
+        documents stored after them
+
+        Parameters
+        ----------
+        doc: Union[_Document, _TextDocument]
+            Stored version of the document received late
 
         Returns
         -------
-        Dict[str, List[Duplicate]]
-            For each previously seen document that has parts in common with
-            `docText`, a list of Duplicate` objects designated corresponding
-            character spans. The key of the mapping is the source document id
+        Dict[str, DuplicateList]
+            New duplicates of the documents processed again, by id
         """
 
-        if docId in self._docsById:
-            raise Exception(f"Already processed document with id {docId}")
+        # documents to process again (all later documents with an engine
+        # since there are no fingerprints to tell which ones may match)
+        fingerprints = None if self.engine is not None else set(doc.spansByFingerprint)
+        docIdsToProcess = set(self._index.getAffectedDocIds(doc.id, fingerprints))
+
+        laterDocIds = itertools.dropwhile(
+            lambda i: i != doc.id, list(self._index.getDocIds())
+        )
+        next(laterDocIds)
+        revisedDuplicates = {}
+        for docId in laterDocIds:
+            if docId not in docIdsToProcess:
+                continue
+            oldDoc = self._index.docsById[docId]
+            newDoc, duplicates = self._processDocument(
+                docId, self._textsById[docId], beforeDocId=docId
+            )
+            self._index.replaceDocument(newDoc)
+            if self.provenanceIndex is not None:
+                self.provenanceIndex.removeTarget(docId)
+                self.provenanceIndex.addDuplicates(docId, duplicates)
+            revisedDuplicates[docId] = duplicates
+
+            # documents stored after this one are only affected if the spans
+            # that can be used as sources changed (blacklisting)
+            if self.engine is not None:
+                fingerprints = None
+            else:
+                fingerprints = _getChangedFingerprints(oldDoc, newDoc)
+                # spans removed from the document only affect the documents
+                # having it as source
+                if (
+                    not fingerprints
+                    and oldDoc.spansByFingerprint.keys()
+                    <= newDoc.spansByFingerprint.keys()
+                ):
+                    continue
+            docIdsToProcess.update(self._index.getAffectedDocIds(docId, fingerprints))
+        return revisedDuplicates
+
+    def _processDocument(
+        self, docId, docText, beforeDocId=None, buildDocument=True, coverageOnly=False
+    ):
+        """
+        Find the duplicates of a document and build the version of the document
+        to store in the index, without storing it.
+
+        If `normalizer` is set, the document is normalized first, and the spans
+        of the duplicates are mapped back to the original texts.
+
+        Parameters and return value are the same as for
+        `_processNormalizedDocument()`
+        """
+
+        if self.normalizer is None:
+            return self._processNormalizedDocument(
+                docId, docText, beforeDocId, buildDocument, coverageOnly
+            )
+
+        normalizedText, offsetMap = self.normalizer.normalize(docText)
+        doc, duplicates = self._processNormalizedDocument(
+            docId, normalizedText, beforeDocId, buildDocument, coverageOnly
+        )
+        if doc is not None:
+            doc.offsetMap = offsetMap
+        duplicates = DuplicateList(
+            _mapDuplicatesToOriginal(duplicates, offsetMap, self._index.docsById),
+            duplicates.truncations,
+            templateDuplicates=_mapDuplicatesToOriginal(
+                duplicates.templateDuplicates, offsetMap, self._templatesById
+            ),
+        )
+        return doc, duplicates
+
+    def _processNormalizedDocument(
+        self, docId, docText, beforeDocId=None, buildDocument=True, coverageOnly=False
+    ):
+        """
+        Find the duplicates of a (normalized) document and build the version of
+        the document to store in the index, without storing it
+
+        Parameters
+        ----------
+        docId: Optional[str]
+            Unique identifier of the document
+        docText: str
+            Text of the document
+        beforeDocId: Optional[str]
+            If provided, only documents seen before this one are used as
+            sources
+        buildDocument: bool
+            Whether to build the document to store. If False, `None` is
+            returned instead of the document
+        coverageOnly: bool
+            Whether only the target spans covered by the duplicates matter.
+            Overlap removal is then skipped for sources whose duplicates don't
+            overlap, and the duplicates are returned in no particular order
+
+        Returns
+        -------
+        Tuple[Union[_Document, _TextDocument], DuplicateList]
+            Document to store and its duplicates
+        """
+
+        if self.engine is not None:
+            return self._processDocumentWithEngine(
+                docId, docText, beforeDocId, buildDocument
+            )
+        if self.chunkSize is not None:
+            return self._processDocumentByChunks(
+                docId, docText, beforeDocId, buildDocument, coverageOnly
+            )
+
+        deadline = None if self.maxTime is None else time.monotonic() + self.maxTime
+        truncations = set()
 
         # retrieve fingerprints with spans, sorted by spans
         spansAndFingerprints = self.fingerprintBuilder.buildFingerprints(docText)
 
-        duplicates = []
-        for previousDoc in self._docsById.values():
+        # parts found in templates are neither matched with previous documents
+        # nor stored
+        templateDuplicates = []
+        if self._templatesById:
+            templateDuplicates = self._findTemplateDuplicates(spansAndFingerprints)
+            spansAndFingerprints = list(
+                _iterSpansOutsideDuplicates(spansAndFingerprints, templateDuplicates)
+            )
+
+        # only retrieve previous documents (and spans) having fingerprints in
+        # common with the new document (all of them for in-memory storage)
+        fingerprints = {fingerprint for _, fingerprint in spansAndFingerprints}
+        previousDocs = list(self._index.getDocuments(fingerprints, beforeDocId))
+
+        if self.maxSources is None and self.stopWhenCoveredFraction is None:
+            docIndices = range(len(previousDocs))
+        else:
+            # process first the previous documents most likely to contain the
+            # largest duplicates
+            nbsSharedFingerprints = [
+                _countSharedFingerprints(fingerprints, d) for d in previousDocs
+            ]
+            docIndices = sorted(
+                (i for i, n in enumerate(nbsSharedFingerprints) if n > 0),
+                key=lambda i: -nbsSharedFingerprints[i],
+            )
+        if self.stopWhenCoveredFraction is not None:
+            # characters of the target doc belonging to duplicates
+            docLength = self._getTextLength(docText)
+            coveredChars = bytearray(docLength)
+            nbCoveredChars = 0
+
+        def resolveOverlapsAcrossSources():
+            # return duplicates in chronological order of source documents
+            return _removeOverlappingDuplicatesAcrossSources(
+                [duplicatesByDocIndex[i] for i in sorted(duplicatesByDocIndex)],
+                self.minDuplicateLength,
+                self.treeBackend,
+            )
+
+        duplicatesByDocIndex = {}
+        # with globalOverlapResolution, duplicates of all sources once overlaps
+        # are resolved, and number of sources they were resolved for
+        resolvedDuplicates = []
+        nbResolvedSources = 0
+        for docIndex in docIndices:
+            if deadline is not None and time.monotonic() > deadline:
+                truncations.add(Truncation.TIME)
+                break
+            if (
+                self.maxSources is not None
+                and len(duplicatesByDocIndex) >= self.maxSources
+            ):
+                nbSources = len(duplicatesByDocIndex)
+                # sources whose duplicates are all removed when resolving
+                # overlaps don't count
+                if self.globalOverlapResolution:
+                    if nbResolvedSources != len(duplicatesByDocIndex):
+                        resolvedDuplicates = resolveOverlapsAcrossSources()
+                        nbResolvedSources = len(duplicatesByDocIndex)
+                    nbSources = len({d.sourceDocId for d in resolvedDuplicates})
+                if nbSources >= self.maxSources:
+                    truncations.add(Truncation.MAX_SOURCES)
+                    break
+            if (
+                self.stopWhenCoveredFraction is not None
+                and nbCoveredChars >= self.stopWhenCoveredFraction * docLength
+            ):
+                truncations.add(Truncation.COVERED_FRACTION)
+                break
+
             docDuplicates = _buildDuplicates(
                 spansAndFingerprints,
-                sourceDoc=previousDoc,
+                sourceDoc=previousDocs[docIndex],
                 minDuplicateLength=self.minDuplicateLength,
+                maxSourceSpans=self.maxSourceSpansPerFingerprint,
+                maxInProgressDuplicates=self.maxInProgressDuplicates,
+                deadline=deadline,
+                truncations=truncations,
+                maxGapLength=self.maxGapLength,
             )
-            docDuplicates = _removeOverlappingDuplicates(
-                docDuplicates, self.minDuplicateLength, self.treeBackend
+            # overlaps are removed afterwards for all sources at once
+            if not self.globalOverlapResolution and (
+                not coverageOnly or _haveOverlappingTargetSpans(docDuplicates)
+            ):
+                docDuplicates = _removeOverlappingDuplicates(
+                    docDuplicates, self.minDuplicateLength, self.treeBackend
+                )
+            if not docDuplicates:
+                continue
+            duplicatesByDocIndex[docIndex] = docDuplicates
+
+            if self.stopWhenCoveredFraction is not None:
+                for duplicate in docDuplicates:
+                    start, end = duplicate.targetSpan.start, duplicate.targetSpan.end
+                    nbCoveredChars += duplicate.length - coveredChars.count(
+                        1, start, end
+                    )
+                    coveredChars[start:end] = b"\x01" * duplicate.length
+
+        if self.globalOverlapResolution:
+            if nbResolvedSources != len(duplicatesByDocIndex):
+                resolvedDuplicates = resolveOverlapsAcrossSources()
+            duplicates = DuplicateList(
+                resolvedDuplicates,
+                truncations,
+                templateDuplicates=templateDuplicates,
+            )
+        else:
+            # return duplicates in chronological order of source documents
+            duplicates = DuplicateList(
+                (
+                    d
+                    for i in sorted(duplicatesByDocIndex)
+                    for d in duplicatesByDocIndex[i]
+                ),
+                truncations,
+                templateDuplicates=templateDuplicates,
+            )
+        if not buildDocument:
+            return None, duplicates
+
+        if coverageOnly:
+            # single sweep over the spans rather than an overlap tree
+            spansByFingerprint = {}
+            duplicatedFingerprints = set()
+            for span, fingerprint in _iterSpansOutsideDuplicates(
+                spansAndFingerprints, duplicates, duplicatedFingerprints
+            ):
+                spansByFingerprint.setdefault(fingerprint, []).append(span)
+            doc = _Document(
+                docId,
+                spansByFingerprint,
+                {d.sourceDocId for d in duplicates},
+                duplicatedFingerprints=duplicatedFingerprints.difference(
+                    spansByFingerprint
+                ),
             )
-            duplicates += docDuplicates
+            return doc, duplicates
 
         # pre-compute spans that are part of duplicates
         indicesOfDuplicatesSpans = _findSpansBelongingToDuplicates(
@@ -168,21 +1209,318 @@ class DuplicateFinder:
         # transform list of spans and fingerprints to mapping of fingerprints to
         # spans
         spansByFingerprint = {}
+        duplicatedFingerprints = set()
         for i, (span, fingerprint) in enumerate(spansAndFingerprints):
             # if the span belong to a duplicate we ignore it,
             # because we are only interested in recreating the duplication link
             # to the "source-most" initial document
             if i in indicesOfDuplicatesSpans:
+                duplicatedFingerprints.add(fingerprint)
                 continue
 
             spansByFingerprint.setdefault(fingerprint, []).append(span)
 
-        doc = _Document(docId, spansByFingerprint)
-        self._docsById[doc.id] = doc
+        doc = _Document(
+            docId,
+            spansByFingerprint,
+            {d.sourceDocId for d in duplicates},
+            duplicatedFingerprints=duplicatedFingerprints.difference(
+                spansByFingerprint
+            ),
+        )
+        return doc, duplicates
+
+    def _findTemplateDuplicates(self, spansAndFingerprints):
+        """
+        Return the parts of a document found in templates
+
+        Parameters
+        ----------
+        spansAndFingerprints: List[Tuple[Span, str]]
+            Spans and fingerprints of the document
+
+        Returns
+        -------
+        List[Duplicate]
+            Duplicates having templates as source, grouped by template (in the
+            order in which templates were added)
+        """
+
+        duplicatesByTemplate = []
+        for template in self._templatesById.values():
+            templateDuplicates = _buildDuplicates(
+                spansAndFingerprints, template, self.minDuplicateLength
+            )
+            if templateDuplicates:
+                duplicatesByTemplate.append(templateDuplicates)
+        return self._removeOverlappingDuplicatesBySource(duplicatesByTemplate)
+
+    def _processDocumentByChunks(
+        self, docId, docText, beforeDocId, buildDocument, coverageOnly=False
+    ):
+        """
+        Implementation of `_processDocument()` fingerprinting and matching the
+        document by chunks of `chunkSize` fingerprints
+        """
+
+        deadline = None if self.maxTime is None else time.monotonic() + self.maxTime
+        truncations = set()
+
+        # state of the matching with each previous document, carried over from
+        # one chunk to the next
+        buildersBySourceId = {}
+        spansAndFingerprints = self.fingerprintBuilder.iterFingerprints(docText)
+        while True:
+            chunk = list(itertools.islice(spansAndFingerprints, self.chunkSize))
+            if not chunk:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                truncations.add(Truncation.TIME)
+                break
+
+            # previous documents only need to contain the spans of the
+            # fingerprints of the chunk
+            previousDocs = self._index.getDocuments(
+                {fingerprint for _, fingerprint in chunk}, beforeDocId
+            )
+            for previousDoc in previousDocs:
+                builder = buildersBySourceId.get(previousDoc.id)
+                if builder is None:
+                    builder = _DuplicateBuilder(
+                        previousDoc,
+                        self.minDuplicateLength,
+                        maxSourceSpans=self.maxSourceSpansPerFingerprint,
+                        maxInProgressDuplicates=self.maxInProgressDuplicates,
+                        deadline=deadline,
+                        truncations=truncations,
+                        maxGapLength=self.maxGapLength,
+                    )
+                    buildersBySourceId[previousDoc.id] = builder
+                else:
+                    builder.sourceDoc = previousDoc
+                builder.feed(chunk)
+            # release the chunk before reading the next one
+            del chunk, previousDocs
+
+        # finish source by source, in the order in which they were seen
+        duplicatesBySource = []
+        for sourceId in self._index.getDocIds():
+            builder = buildersBySourceId.pop(sourceId, None)
+            if builder is not None:
+                duplicatesBySource.append(builder.finish())
+        duplicates = self._removeOverlappingDuplicatesBySource(
+            duplicatesBySource, coverageOnly
+        )
+
+        duplicates = DuplicateList(duplicates, truncations)
+        if not buildDocument:
+            return None, duplicates
+
+        # fingerprint the document again to only keep the spans that are not
+        # part of duplicates
+        spansByFingerprint = {}
+        duplicatedFingerprints = set()
+        for span, fingerprint in _iterSpansOutsideDuplicates(
+            self.fingerprintBuilder.iterFingerprints(docText),
+            duplicates,
+            duplicatedFingerprints,
+        ):
+            spansByFingerprint.setdefault(fingerprint, []).append(span)
+
+        doc = _Document(
+            docId,
+            spansByFingerprint,
+            {d.sourceDocId for d in duplicates},
+            duplicatedFingerprints=duplicatedFingerprints.difference(
+                spansByFingerprint
+            ),
+        )
+        return doc, duplicates
+
+    def _processDocumentWithEngine(self, docId, docText, beforeDocId, buildDocument):
+        """Implementation of `_processDocument()` delegating matching to `engine`"""
+
+        previousDocs = list(self._index.getDocuments(None, beforeDocId))
+        duplicatesBySourceId = self.engine.buildDuplicates(
+            docText, previousDocs, self.minDuplicateLength
+        )
+
+        # remove overlaps in the same order as with fingerprints
+        duplicates = self._removeOverlappingDuplicatesBySource(
+            [
+                duplicatesBySourceId[d.id]
+                for d in previousDocs
+                if duplicatesBySourceId.get(d.id)
+            ]
+        )
+
+        duplicates = DuplicateList(duplicates)
+        if not buildDocument:
+            return None, duplicates
+        doc = self.engine.buildDocument(docId, docText, duplicates)
+        return doc, duplicates
+
+    def _removeOverlappingDuplicatesBySource(
+        self, duplicatesBySource, coverageOnly=False
+    ):
+        """
+        Remove overlapping duplicates source by source, or for all sources at
+        once if `globalOverlapResolution` is set
+
+        Parameters
+        ----------
+        duplicatesBySource: List[List[Duplicate]]
+            Duplicates of each source document, in the order in which source
+            documents were seen
+        coverageOnly: bool
+            Cf `_processDocument()`
+
+        Returns
+        -------
+        List[Duplicate]
+            Non-overlapping duplicates, grouped by source document
+        """
+
+        if self.globalOverlapResolution:
+            return _removeOverlappingDuplicatesAcrossSources(
+                duplicatesBySource, self.minDuplicateLength, self.treeBackend
+            )
+
+        duplicates = []
+        for docDuplicates in duplicatesBySource:
+            if coverageOnly and not _haveOverlappingTargetSpans(docDuplicates):
+                duplicates += docDuplicates
+            else:
+                duplicates += _removeOverlappingDuplicates(
+                    docDuplicates, self.minDuplicateLength, self.treeBackend
+                )
         return duplicates
 
 
-def _buildDuplicates(targetSpansAndFingerprints, sourceDoc, minDuplicateLength):
+@functools.lru_cache(maxsize=None)
+def _isAvailable(packageName):
+    """
+    Return whether an optional package is installed, without importing it (so
+    that it is only imported when first used)
+    """
+
+    return importlib.util.find_spec(packageName) is not None
+
+
+def _isTreeBackendAvailable(treeBackend):
+    """Return whether the package needed by a tree backend is installed"""
+
+    if treeBackend is TreeBackend.NCLS:
+        return _isAvailable("ncls") and _isAvailable("numpy")
+    elif treeBackend is TreeBackend.INTERVAL_TREE:
+        return _isAvailable("intervaltree")
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _getTreeBackendThresholds():
+    """
+    Return the thresholds used by `TreeBackend.AUTO` (cf
+    `loadTreeBackendThresholds()`), loaded only once
+    """
+
+    return {
+        operation: [(minSize, TreeBackend(name)) for minSize, name in thresholds]
+        for operation, thresholds in loadTreeBackendThresholds().items()
+    }
+
+
+def _selectTreeBackend(operation, size):
+    """
+    Return the backend to use for `operation` on inputs of `size` with
+    `TreeBackend.AUTO`: the one of the highest threshold below `size`, skipping
+    backends that are not installed
+    """
+
+    selectedTreeBackend = TreeBackend.NONE
+    for minSize, treeBackend in _getTreeBackendThresholds()[operation]:
+        if minSize > size:
+            break
+        if _isTreeBackendAvailable(treeBackend):
+            selectedTreeBackend = treeBackend
+    return selectedTreeBackend
+
+
+def _getDefaultTreeBackend():
+    """Return NCLS or INTERVAL_TREE (in that order) if available, NONE otherwise"""
+
+    if _isTreeBackendAvailable(TreeBackend.NCLS):
+        return TreeBackend.NCLS
+    elif _isTreeBackendAvailable(TreeBackend.INTERVAL_TREE):
+        return TreeBackend.INTERVAL_TREE
+    else:
+        return TreeBackend.NONE
+
+
+def _mapDuplicatesToOriginal(duplicates, targetOffsetMap, sourceDocsById):
+    """
+    Map the spans of duplicates found in normalized texts to the original texts
+
+    Parameters
+    ----------
+    duplicates: List[Duplicate]
+        Duplicates with spans in normalized texts
+    targetOffsetMap: OffsetMap
+        Offset map of the target document
+    sourceDocsById: Dict[str, Union[_Document, _TextDocument]]
+        Source documents (with their offset maps), by id
+
+    Returns
+    -------
+    List[Duplicate]
+        Duplicates with spans in original texts
+    """
+
+    return [
+        Duplicate(
+            d.sourceDocId,
+            sourceDocsById[d.sourceDocId].offsetMap.toOriginalSpan(d.sourceSpan),
+            targetOffsetMap.toOriginalSpan(d.targetSpan),
+            mapped=True,
+        )
+        for d in duplicates
+    ]
+
+
+def _getChangedFingerprints(oldDoc, newDoc):
+    """
+    Return the fingerprints whose spans differ between 2 versions of a
+    document, ignoring the fingerprints only in `oldDoc`
+    """
+
+    oldSpansByFingerprint = oldDoc.spansByFingerprint
+    return {
+        fingerprint
+        for fingerprint, spans in newDoc.spansByFingerprint.items()
+        if [(s.start, s.end) for s in spans]
+        != [(s.start, s.end) for s in oldSpansByFingerprint.get(fingerprint, ())]
+    }
+
+
+def _countSharedFingerprints(fingerprints, doc):
+    """Return the number of distinct fingerprints of `doc` in `fingerprints`"""
+
+    spansByFingerprint = doc.spansByFingerprint
+    if len(fingerprints) < len(spansByFingerprint):
+        return sum(1 for f in fingerprints if f in spansByFingerprint)
+    return sum(1 for f in spansByFingerprint if f in fingerprints)
+
+
+def _buildDuplicates(
+    targetSpansAndFingerprints,
+    sourceDoc,
+    minDuplicateLength,
+    maxSourceSpans=None,
+    maxInProgressDuplicates=None,
+    deadline=None,
+    truncations=None,
+    maxGapLength=None,
+):
     """
     Create a list of `Duplicate` objects, by finding and merging all consecutive
     pairs of spans with common fingerprints in source and target docs. This
@@ -227,6 +1565,22 @@ def _buildDuplicates(targetSpansAndFingerprints, sourceDoc, minDuplicateLength):
         Document to be used as source
     minDuplicateLength: int
         Minimum number of characters in duplicates
+    maxSourceSpans: Optional[int]
+        Maximum number of source spans to consider for each target span
+    maxInProgressDuplicates: Optional[int]
+        Maximum number of "in-progress" duplicates. Duplicates extended by the
+        last target span are kept in priority
+    deadline: Optional[float]
+        Value of `time.monotonic()` after which remaining target spans are
+        ignored
+    truncations: Optional[Set[Truncation]]
+        Set to which to add the limits that were hit, if any
+    maxGapLength: Optional[int]
+        If provided, duplicates separated by at most `maxGapLength` characters
+        both in the source and target docs (ie on the same "diagonal", for
+        instance when a date was edited in the copied text) are merged into
+        one duplicate, including the gap. `minDuplicateLength` then applies to
+        merged duplicates
 
     Returns
     -------
@@ -235,125 +1589,306 @@ def _buildDuplicates(targetSpansAndFingerprints, sourceDoc, minDuplicateLength):
         target docs
     """
 
-    # duplicates being built, maybe be extended by upcoming spans.
-    # there will be several duplicates being built simultaneously if we
-    # encounter several source spans for one target span
-    inProgressDuplicates = []
-    # final duplicates that will be returned
-    finalDuplicates = []
+    builder = _DuplicateBuilder(
+        sourceDoc,
+        minDuplicateLength,
+        maxSourceSpans,
+        maxInProgressDuplicates,
+        deadline,
+        truncations,
+        maxGapLength,
+    )
+    builder.feed(targetSpansAndFingerprints)
+    return builder.finish()
 
-    # process each span in target doc (must be sorted)
-    for targetSpan, fingerprint in targetSpansAndFingerprints:
-        # get corresponding spans (ie with same fingerprint) in source doc
-        sourceSpans = sourceDoc.spansByFingerprint.get(fingerprint)
-        if not sourceSpans:
-            continue
 
-        extendedDuplicates = []
-        indicesOfMergedSourceSpans = set()
-
-        # for each "in-progress" duplicate, try to extend it with the target
-        # span and each source span
-        for duplicate in inProgressDuplicates:
-            extended = False
-            for i, sourceSpan in enumerate(sourceSpans):
-                # source and target spans should have the same length since they
-                # refer to the same fingerprint
-                assert sourceSpan.length == targetSpan.length
-
-                # only spans that are "monotonic extensions" of the duplicate's
-                # spans (both in source and target), ie that are contiguous or
-                # overlapping but also do not start before, can be used to
-                # extend the duplicate
-
-                # target spans are sorted so we already know the new target span
-                # does not start before the duplicate's target span. we just
-                # need to check if it starts within or right after the
-                # duplicate's target pan
-                assert (
-                    targetSpan.start > duplicate.targetSpan.start
-                    or targetSpan.start == duplicate.targetSpan.start
-                    and targetSpan.end > duplicate.targetSpan.end
-                )
-                if targetSpan.start > duplicate.targetSpan.end:
-                    continue
+class _DuplicateBuilder:
+    """
+    Implementation of `_buildDuplicates()` that can be fed the target spans of
+    a document in several chunks, "in-progress" duplicates being carried over
+    from one chunk to the next.
+
+    This makes it possible to process long target documents without having
+    all their fingerprints in memory at once. The duplicates returned by
+    `finish()` are exactly the same as the ones returned by
+    `_buildDuplicates()` for all the target spans at once.
+    """
 
-                # at the outermost level, we don't iterate over sorted source
-                # spans so in theory we would need to do more checks. in
-                # particular, we must be careful to avoid merging 2 source spans
-                # that overlap with each other but in a different way that the
-                # target span , as this would create a Duplicate with different
-                # source and target lengths.
-                # (this can happen because source spans are not sorted, cf tests
-                # cases 17_consecutive_reuse.json and 18_consecutive reuse.json)
-
-                # in practise, just checking if extended source and target spans
-                # have the same length seems to be enough and is more efficient
-                # that doing preliminary checks
-                extendedTargetLength = targetSpan.end - duplicate.targetSpan.start
-                extendedSourceLength = sourceSpan.end - duplicate.sourceSpan.start
-                if extendedSourceLength != extendedTargetLength:
-                    continue
+    def __init__(
+        self,
+        sourceDoc,
+        minDuplicateLength,
+        maxSourceSpans=None,
+        maxInProgressDuplicates=None,
+        deadline=None,
+        truncations=None,
+        maxGapLength=None,
+    ):
+        """
+        Parameters
+        ----------
+        sourceDoc: Document
+            Document to be used as source. Can be replaced between calls to
+            `feed()` by another version of the document having the same id, as
+            long as it contains the spans of all the fingerprints of the target
+            spans fed next
+        minDuplicateLength, maxSourceSpans, maxInProgressDuplicates, deadline, truncations, maxGapLength:
+            Cf `_buildDuplicates()`
+        """
 
-                extendedTargetSpan = Span(
-                    duplicate.targetSpan.start,
-                    targetSpan.end,
-                    length=extendedTargetLength,
-                )
-                extendedSourceSpan = Span(
-                    duplicate.sourceSpan.start,
-                    sourceSpan.end,
-                    length=extendedSourceLength,
-                )
+        self.sourceDoc = sourceDoc
+        self.minDuplicateLength = minDuplicateLength
+        self.maxSourceSpans = maxSourceSpans
+        self.maxInProgressDuplicates = maxInProgressDuplicates
+        self.deadline = deadline
+        self.truncations = truncations
+        self.maxGapLength = maxGapLength
+
+        # duplicates being built, maybe be extended by upcoming spans.
+        # there will be several duplicates being built simultaneously if we
+        # encounter several source spans for one target span
+        self.inProgressDuplicates = []
+        # final duplicates that will be returned
+        self.finalDuplicates = []
+        # with maxGapLength, duplicates that can't be extended anymore but may
+        # still be merged with an upcoming duplicate, by diagonal (offset
+        # between target and source spans)
+        self.closedDuplicatesByDiagonal = {}
+        # number of target spans fed so far having fingerprints in common with
+        # the source doc (the deadline is checked every 256 of them)
+        self.nbMatchedSpans = 0
+        # whether the deadline was exceeded (remaining spans are ignored)
+        self.stopped = False
+
+    def feed(self, targetSpansAndFingerprints):
+        """
+        Process the next target spans
+
+        Parameters
+        ----------
+        targetSpansAndFingerprints: List[Tuple[Span, str]]
+            Next fingerprints and corresponding spans in target document.
+            Must be sorted by ascending spans, and come after the spans
+            previously fed
+        """
+
+        if self.stopped:
+            return
+
+        sourceDoc = self.sourceDoc
+        minDuplicateLength = self.minDuplicateLength
+        maxSourceSpans = self.maxSourceSpans
+        maxInProgressDuplicates = self.maxInProgressDuplicates
+        deadline = self.deadline
+        truncations = self.truncations
+        inProgressDuplicates = self.inProgressDuplicates
+        finalDuplicates = self.finalDuplicates
+        maxGapLength = self.maxGapLength
+        closedDuplicatesByDiagonal = self.closedDuplicatesByDiagonal
+        nbMatchedSpans = self.nbMatchedSpans
+
+        # process each span in target doc (must be sorted)
+        for targetSpan, fingerprint in targetSpansAndFingerprints:
+            # get corresponding spans (ie with same fingerprint) in source doc
+            sourceSpans = sourceDoc.spansByFingerprint.get(fingerprint)
+            if not sourceSpans:
+                continue
 
-                # build and store new extended duplicate
-                # (we can't modify the existing instance because the same
-                # duplicate could be extended several times when there are
-                # several source spans for one target span)
-                extendedDuplicate = Duplicate(
-                    sourceDoc.id, extendedSourceSpan, extendedTargetSpan
+            # enforce work limits (only checking time once in a while since it
+            # is more costly)
+            if maxSourceSpans is not None and len(sourceSpans) > maxSourceSpans:
+                sourceSpans = sourceSpans[:maxSourceSpans]
+                truncations.add(Truncation.SOURCE_SPANS)
+            if (
+                deadline is not None
+                and nbMatchedSpans % 256 == 0
+                and time.monotonic() > deadline
+            ):
+                truncations.add(Truncation.TIME)
+                self.stopped = True
+                break
+            nbMatchedSpans += 1
+
+            extendedDuplicates = []
+            indicesOfMergedSourceSpans = set()
+
+            # for each "in-progress" duplicate, try to extend it with the target
+            # span and each source span
+            for duplicate in inProgressDuplicates:
+                extended = False
+                for i, sourceSpan in enumerate(sourceSpans):
+                    # source and target spans should have the same length since they
+                    # refer to the same fingerprint
+                    assert sourceSpan.length == targetSpan.length
+
+                    # only spans that are "monotonic extensions" of the duplicate's
+                    # spans (both in source and target), ie that are contiguous or
+                    # overlapping but also do not start before, can be used to
+                    # extend the duplicate
+
+                    # target spans are sorted so we already know the new target span
+                    # does not start before the duplicate's target span. we just
+                    # need to check if it starts within or right after the
+                    # duplicate's target pan
+                    assert (
+                        targetSpan.start > duplicate.targetSpan.start
+                        or targetSpan.start == duplicate.targetSpan.start
+                        and targetSpan.end > duplicate.targetSpan.end
+                    )
+                    if targetSpan.start > duplicate.targetSpan.end:
+                        continue
+
+                    # at the outermost level, we don't iterate over sorted source
+                    # spans so in theory we would need to do more checks. in
+                    # particular, we must be careful to avoid merging 2 source spans
+                    # that overlap with each other but in a different way that the
+                    # target span , as this would create a Duplicate with different
+                    # source and target lengths.
+                    # (this can happen because source spans are not sorted, cf tests
+                    # cases 17_consecutive_reuse.json and 18_consecutive reuse.json)
+
+                    # in practise, just checking if extended source and target spans
+                    # have the same length seems to be enough and is more efficient
+                    # that doing preliminary checks
+                    extendedTargetLength = targetSpan.end - duplicate.targetSpan.start
+                    extendedSourceLength = sourceSpan.end - duplicate.sourceSpan.start
+                    if extendedSourceLength != extendedTargetLength:
+                        continue
+
+                    extendedTargetSpan = Span(
+                        duplicate.targetSpan.start,
+                        targetSpan.end,
+                        length=extendedTargetLength,
+                    )
+                    extendedSourceSpan = Span(
+                        duplicate.sourceSpan.start,
+                        sourceSpan.end,
+                        length=extendedSourceLength,
+                    )
+
+                    # build and store new extended duplicate
+                    # (we can't modify the existing instance because the same
+                    # duplicate could be extended several times when there are
+                    # several source spans for one target span)
+                    extendedDuplicate = Duplicate(
+                        sourceDoc.id, extendedSourceSpan, extendedTargetSpan
+                    )
+                    extendedDuplicates.append(extendedDuplicate)
+
+                    # remember this duplicate was extended
+                    extended = True
+                    # remember this source span has been used to extend a
+                    # pre-existing duplicate (we don't need to create a new
+                    # duplicate for it later)
+                    indicesOfMergedSourceSpans.add(i)
+
+                # "in-progress" duplicate has not been extended. Since target spans
+                # are sorted, we know it won't be extended by upcoming spans so we
+                # can move it to the "final" list
+                if not extended:
+                    if maxGapLength is not None:
+                        # unless it can still be merged with an upcoming
+                        # duplicate on the same diagonal
+                        diagonal = (
+                            duplicate.targetSpan.start - duplicate.sourceSpan.start
+                        )
+                        previousDuplicate = closedDuplicatesByDiagonal.get(diagonal)
+                        if (
+                            previousDuplicate is not None
+                            and previousDuplicate.length >= minDuplicateLength
+                        ):
+                            finalDuplicates.append(previousDuplicate)
+                        closedDuplicatesByDiagonal[diagonal] = duplicate
+                    # only keep if min length criteria is satisfied
+                    elif duplicate.length >= minDuplicateLength:
+                        finalDuplicates.append(duplicate)
+
+            # only extended duplicated are kept in the new set of "in-progress"
+            # duplicates
+            inProgressDuplicates = extendedDuplicates
+
+            # for source spans that have not been used to extend previously
+            # existing duplicates, new duplicates must be created
+            if maxGapLength is None:
+                inProgressDuplicates.extend(
+                    Duplicate(sourceDoc.id, sourceSpan, targetSpan)
+                    for i, sourceSpan in enumerate(sourceSpans)
+                    if i not in indicesOfMergedSourceSpans
                 )
-                extendedDuplicates.append(extendedDuplicate)
-
-                # remember this duplicate was extended
-                extended = True
-                # remember this source span has been used to extend a
-                # pre-existing duplicate (we don't need to create a new
-                # duplicate for it later)
-                indicesOfMergedSourceSpans.add(i)
-
-            # "in-progress" duplicate has not been extended. Since target spans
-            # are sorted, we know it won't be extended by upcoming spans so we
-            # can move it to the "final" list
-            if not extended:
-                # only keep if min length criteria is satisfied
-                if duplicate.length >= minDuplicateLength:
-                    finalDuplicates.append(duplicate)
-
-        # only extended duplicated are kept in the new set of "in-progress"
-        # duplicates
-        inProgressDuplicates = extendedDuplicates
-
-        # for source spans that have not been used to extend previously
-        # existing duplicates, new duplicates must be created
-        inProgressDuplicates.extend(
-            Duplicate(sourceDoc.id, sourceSpan, targetSpan)
-            for i, sourceSpan in enumerate(sourceSpans)
-            if i not in indicesOfMergedSourceSpans
-        )
+            else:
+                self._closeDistantDuplicates(targetSpan.start)
+                for i, sourceSpan in enumerate(sourceSpans):
+                    if i in indicesOfMergedSourceSpans:
+                        continue
+                    # new duplicate continuing a closed duplicate of the same
+                    # diagonal after a small gap, merge them
+                    closedDuplicate = closedDuplicatesByDiagonal.pop(
+                        targetSpan.start - sourceSpan.start, None
+                    )
+                    if closedDuplicate is not None:
+                        inProgressDuplicates.append(
+                            Duplicate(
+                                sourceDoc.id,
+                                Span(closedDuplicate.sourceSpan.start, sourceSpan.end),
+                                Span(closedDuplicate.targetSpan.start, targetSpan.end),
+                            )
+                        )
+                    else:
+                        inProgressDuplicates.append(
+                            Duplicate(sourceDoc.id, sourceSpan, targetSpan)
+                        )
+
+            if (
+                maxInProgressDuplicates is not None
+                and len(inProgressDuplicates) > maxInProgressDuplicates
+            ):
+                del inProgressDuplicates[maxInProgressDuplicates:]
+                truncations.add(Truncation.IN_PROGRESS_DUPLICATES)
+
+        self.inProgressDuplicates = inProgressDuplicates
+        self.nbMatchedSpans = nbMatchedSpans
+
+    def _closeDistantDuplicates(self, targetStart):
+        """
+        Move to the "final" list the closed duplicates that are too far from
+        `targetStart` to be merged with upcoming duplicates
+        """
 
-    # don't forget to add remaining "in-progress" duplicates
-    finalDuplicates.extend(
-        duplicate
-        for duplicate in inProgressDuplicates
-        # only keep if min length criteria is satisfied
-        if duplicate.length >= minDuplicateLength
-    )
+        closedDuplicatesByDiagonal = self.closedDuplicatesByDiagonal
+        for diagonal, duplicate in list(closedDuplicatesByDiagonal.items()):
+            if targetStart - duplicate.targetSpan.end > self.maxGapLength:
+                del closedDuplicatesByDiagonal[diagonal]
+                if duplicate.length >= self.minDuplicateLength:
+                    self.finalDuplicates.append(duplicate)
+
+    def finish(self):
+        """
+        Return the duplicates built from all the target spans fed
+
+        Returns
+        -------
+        List[Duplicate]
+            List of duplicates representing spans with common text in source and
+            target docs
+        """
 
-    return finalDuplicates
+        # don't forget to add remaining "in-progress" (and closed) duplicates
+        self.finalDuplicates.extend(
+            duplicate
+            for duplicate in itertools.chain(
+                self.closedDuplicatesByDiagonal.values(), self.inProgressDuplicates
+            )
+            # only keep if min length criteria is satisfied
+            if duplicate.length >= self.minDuplicateLength
+        )
+        self.closedDuplicatesByDiagonal = {}
+        self.inProgressDuplicates = []
+        return self.finalDuplicates
 
 
-def _removeOverlappingDuplicates(duplicates, minDuplicateLength, treeBackend):
+def _removeOverlappingDuplicates(
+    duplicates, minDuplicateLength, treeBackend, sortKey=None
+):
     """
     Remove duplicates that have overlapping target spans.
 
@@ -431,6 +1966,10 @@ def _removeOverlappingDuplicates(duplicates, minDuplicateLength, treeBackend):
         after being trimmed will be dropped
     treeBackend: TreeBackend
         Backend to use for overlap trees.
+    sortKey: Optional[Callable[[Duplicate], Any]]
+        Key used to pick which duplicate to keep first among overlapping
+        duplicates (the one with the highest key is kept). If `None` provided,
+        the length of duplicates is used
 
     Returns
     -------
@@ -438,24 +1977,36 @@ def _removeOverlappingDuplicates(duplicates, minDuplicateLength, treeBackend):
         Updated list of on-contiguous, non-overlapping duplicates.
     """
 
+    if sortKey is None:
+        sortKey = _getLength
+
+    if treeBackend is TreeBackend.AUTO:
+        treeBackend = _selectTreeBackend(REMOVE_OVERLAPPING_DUPLICATES, len(duplicates))
+
     if treeBackend is TreeBackend.NCLS:
-        if not _HAS_NCLS:
+        if not _isAvailable("ncls"):
             raise Exception(
                 "NCLS tree backend requested but ncls package does not seem to be installed"
             )
-        return _removeOverlappingDuplicates_NCLS(duplicates, minDuplicateLength)
+        return _removeOverlappingDuplicates_NCLS(
+            duplicates, minDuplicateLength, sortKey
+        )
     elif treeBackend is TreeBackend.INTERVAL_TREE:
-        if not _HAS_INTERVAL_TREE:
+        if not _isAvailable("intervaltree"):
             raise Exception(
                 "Interval tree backend requested but intervaltree package does not seem to be installed"
             )
-        return _removeOverlappingDuplicates_IntervalTree(duplicates, minDuplicateLength)
+        return _removeOverlappingDuplicates_IntervalTree(
+            duplicates, minDuplicateLength, sortKey
+        )
     else:
         assert treeBackend is TreeBackend.NONE
-        return _removeOverlappingDuplicates_NoTree(duplicates, minDuplicateLength)
+        return _removeOverlappingDuplicates_NoTree(
+            duplicates, minDuplicateLength, sortKey
+        )
 
 
-def _removeOverlappingDuplicates_NoTree(duplicates, minDuplicateLength):
+def _removeOverlappingDuplicates_NoTree(duplicates, minDuplicateLength, sortKey):
     """
     Implementation of `_removeOverlappingDuplicates()` not relying on any kind
     of overlap tree
@@ -466,7 +2017,7 @@ def _removeOverlappingDuplicates_NoTree(duplicates, minDuplicateLength):
     # sort duplicates by length so we keep bigger duplicates and remove smaller
     # overlapping duplicates
     # (we use the duplicates list as a queue)
-    duplicates.sort(key=lambda d: d.length)
+    duplicates.sort(key=sortKey)
     while duplicates:
         # keep biggest
         duplicate = duplicates.pop()
@@ -500,7 +2051,7 @@ def _removeOverlappingDuplicates_NoTree(duplicates, minDuplicateLength):
 
         # re-sort if some duplicates were trimmed
         if mustSort:
-            duplicates.sort(key=lambda d: d.length)
+            duplicates.sort(key=sortKey)
 
     # restore initial ascending span order
     keptDuplicates.sort(key=lambda d: (d.targetSpan.start, d.targetSpan.end))
@@ -508,12 +2059,14 @@ def _removeOverlappingDuplicates_NoTree(duplicates, minDuplicateLength):
     return keptDuplicates
 
 
-def _removeOverlappingDuplicates_IntervalTree(duplicates, minDuplicateLength):
+def _removeOverlappingDuplicates_IntervalTree(duplicates, minDuplicateLength, sortKey):
     """
     Implementation of `_removeOverlappingDuplicates()` using a IntervalTree to
     find overlapping duplicates
     """
 
+    import intervaltree as it
+
     # build interval tree, storing duplicate index in Interval.data
     tree = it.IntervalTree(
         it.Interval(d.targetSpan.start, d.targetSpan.end, i)
@@ -529,7 +2082,7 @@ def _removeOverlappingDuplicates_IntervalTree(duplicates, minDuplicateLength):
     # that list. So we use a list of indices that we can safely mutate instead
     indicesOfDuplicates = sorted(
         range(len(duplicates)),
-        key=lambda i: duplicates[i].length,
+        key=lambda i: sortKey(duplicates[i]),
     )
     # blacklist of dropped duplicates
     indicesOfDroppedDuplicates = set()
@@ -588,7 +2141,7 @@ def _removeOverlappingDuplicates_IntervalTree(duplicates, minDuplicateLength):
             # speed up the sort and drain the queue
             indicesOfDuplicates = sorted(
                 (i for i in indicesOfDuplicates if i not in indicesOfDroppedDuplicates),
-                key=lambda i: duplicates[i].length,
+                key=lambda i: sortKey(duplicates[i]),
             )
 
     # restore initial sorting
@@ -597,12 +2150,15 @@ def _removeOverlappingDuplicates_IntervalTree(duplicates, minDuplicateLength):
     return keptDuplicates
 
 
-def _removeOverlappingDuplicates_NCLS(duplicates, minDuplicateLength):
+def _removeOverlappingDuplicates_NCLS(duplicates, minDuplicateLength, sortKey):
     """
     Implementation of `_removeOverlappingDuplicates()` using NCLS to
     find overlapping duplicates
     """
 
+    from ncls import NCLS
+    import numpy as np
+
     # build tree, storing duplicate index
     starts = np.array([d.targetSpan.start for d in duplicates], dtype=np.int64)
     ends = np.array([d.targetSpan.end for d in duplicates], dtype=np.int64)
@@ -618,7 +2174,7 @@ def _removeOverlappingDuplicates_NCLS(duplicates, minDuplicateLength):
     # that list. So we use a list of indices that we can safely mutate instead
     indicesOfDuplicates = sorted(
         range(len(duplicates)),
-        key=lambda i: duplicates[i].length,
+        key=lambda i: sortKey(duplicates[i]),
     )
     # blacklist of dropped duplicates
     indicesOfDroppedDuplicates = set()
@@ -667,7 +2223,7 @@ def _removeOverlappingDuplicates_NCLS(duplicates, minDuplicateLength):
             # speed up the sort and drain the queue
             indicesOfDuplicates = sorted(
                 (i for i in indicesOfDuplicates if i not in indicesOfDroppedDuplicates),
-                key=lambda i: duplicates[i].length,
+                key=lambda i: sortKey(duplicates[i]),
             )
 
     # restore initial sorting
@@ -676,6 +2232,60 @@ def _removeOverlappingDuplicates_NCLS(duplicates, minDuplicateLength):
     return keptDuplicates
 
 
+def _getLength(duplicate):
+    """Default sort key of `_removeOverlappingDuplicates()`"""
+
+    return duplicate.length
+
+
+def _removeOverlappingDuplicatesAcrossSources(
+    duplicatesBySource, minDuplicateLength, treeBackend
+):
+    """
+    Remove duplicates that have overlapping target spans, like
+    `_removeOverlappingDuplicates()`, but in one pass over the duplicates of
+    all source documents rather than source by source.
+
+    Among overlapping duplicates, the longest is kept first, then the one from
+    the earliest source document, then the one with the earliest target span.
+
+    Parameters
+    ----------
+    duplicatesBySource: List[List[Duplicate]]
+        Duplicates as returned by `_buildDuplicates()` for each source
+        document, in the order in which source documents were seen
+    minDuplicateLength, treeBackend:
+        Cf `_removeOverlappingDuplicates()`
+
+    Returns
+    -------
+    List[Duplicate]
+        Non-overlapping duplicates, grouped by source document (in the order in
+        which source documents were seen) then sorted by target span
+    """
+
+    rankBySourceId = {}
+    duplicates = []
+    for rank, sourceDuplicates in enumerate(duplicatesBySource):
+        for duplicate in sourceDuplicates:
+            rankBySourceId[duplicate.sourceDocId] = rank
+        duplicates += sourceDuplicates
+
+    keptDuplicates = _removeOverlappingDuplicates(
+        duplicates,
+        minDuplicateLength,
+        treeBackend,
+        sortKey=lambda d: (
+            d.length,
+            -rankBySourceId[d.sourceDocId],
+            -d.targetSpan.start,
+        ),
+    )
+    # kept duplicates are sorted by target span, group them by source
+    keptDuplicates.sort(key=lambda d: rankBySourceId[d.sourceDocId])
+    return keptDuplicates
+
+
 def _trimOrDropDuplicate(duplicate, targetSpanToTrim, minDuplicateLength):
     """
     Trim a duplicate if its target span overlaps with `targetSpanToTrim`, or
@@ -753,6 +2363,77 @@ def _trimOrDropDuplicate(duplicate, targetSpanToTrim, minDuplicateLength):
     return duplicate
 
 
+def _haveOverlappingTargetSpans(duplicates):
+    """
+    Whether some of `duplicates` have overlapping target spans, ie whether
+    `_removeOverlappingDuplicates()` would have anything to remove
+    """
+
+    targetSpans = sorted((d.targetSpan.start, d.targetSpan.end) for d in duplicates)
+    return any(
+        nextStart < end
+        for (_, end), (nextStart, _) in zip(targetSpans, targetSpans[1:])
+    )
+
+
+def _mergeTargetSpans(duplicates):
+    """
+    Return the disjoint intervals of characters covered by the target spans of
+    `duplicates`, as sorted `[start, end]` lists
+    """
+
+    intervals = []
+    for start, end in sorted(
+        (d.targetSpan.start, d.targetSpan.end) for d in duplicates
+    ):
+        if intervals and start <= intervals[-1][1]:
+            intervals[-1][1] = max(intervals[-1][1], end)
+        else:
+            intervals.append([start, end])
+    return intervals
+
+
+def _iterSpansOutsideDuplicates(
+    spansAndFingerprints, duplicates, duplicatedFingerprints=None
+):
+    """
+    Filter out spans that are part of duplicated areas, like
+    `_findSpansBelongingToDuplicates()` but in one linear sweep over the merged
+    target spans of the duplicates, without needing all the spans at once.
+
+    Parameters
+    ----------
+    spansAndFingerprints: Iterable[Tuple[Span, str]]
+        Spans and fingerprints of a document, sorted by ascending span
+    duplicates: List[Duplicate]
+        List of duplicates of the same document
+    duplicatedFingerprints: Optional[Set[str]]
+        If provided, set to which to add the fingerprints of the spans that
+        are filtered out
+
+    Returns
+    -------
+    Iterator[Tuple[Span, str]]
+        Spans and fingerprints that don't overlap with any duplicate
+    """
+
+    # disjoint intervals covered by duplicates, sorted
+    intervals = _mergeTargetSpans(duplicates)
+
+    i = 0
+    nbIntervals = len(intervals)
+    for span, fingerprint in spansAndFingerprints:
+        # skip intervals ending before the span (spans are sorted so they won't
+        # overlap with upcoming spans either)
+        while i < nbIntervals and intervals[i][1] <= span.start:
+            i += 1
+        if i < nbIntervals and intervals[i][0] < span.end:
+            if duplicatedFingerprints is not None:
+                duplicatedFingerprints.add(fingerprint)
+            continue
+        yield span, fingerprint
+
+
 def _findSpansBelongingToDuplicates(spans, duplicates, treeBackend):
     """
     Identify which spans are part of duplicated areas.
@@ -781,14 +2462,19 @@ def _findSpansBelongingToDuplicates(spans, duplicates, treeBackend):
         Indices of spans that overlap (even partly) with a duplicate
     """
 
+    if treeBackend is TreeBackend.AUTO:
+        treeBackend = _selectTreeBackend(
+            FIND_SPANS_BELONGING_TO_DUPLICATES, len(spans) * len(duplicates)
+        )
+
     if treeBackend is TreeBackend.NCLS:
-        if not _HAS_NCLS:
+        if not _isAvailable("ncls"):
             raise Exception(
                 "NCLS tree backend requested but ncls package does not seem to be installed"
             )
         return _findSpansBelongingToDuplicates_NCLS(spans, duplicates)
     elif treeBackend is TreeBackend.INTERVAL_TREE:
-        if not _HAS_INTERVAL_TREE:
+        if not _isAvailable("intervaltree"):
             raise Exception(
                 "Interval tree backend requested but intervaltree package does not seem to be installed"
             )
@@ -815,6 +2501,8 @@ def _findSpansBelongingToDuplicates_NoTree(spans, duplicates):
 def _findSpansBelongingToDuplicates_IntervalTree(spans, duplicates):
     """IntervalTree implementation of `_findSpansBelongingToDuplicates()`"""
 
+    import intervaltree as it
+
     tree = it.IntervalTree(
         it.Interval(d.targetSpan.start, d.targetSpan.end) for d in duplicates
     )
@@ -827,6 +2515,9 @@ def _findSpansBelongingToDuplicates_IntervalTree(spans, duplicates):
 def _findSpansBelongingToDuplicates_NCLS(spans, duplicates):
     """NCLS implementation of `_findSpansBelongingToDuplicates()`"""
 
+    from ncls import NCLS
+    import numpy as np
+
     # we get the answer for all spans in one shot, in one big request
 
     duplicateStarts = np.array([d.targetSpan.start for d in duplicates], dtype=np.int64)
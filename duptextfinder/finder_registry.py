@@ -0,0 +1,323 @@
+from collections import OrderedDict
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import zlib
+
+
+class FinderRegistry:
+    """
+    One `DuplicateFinder` per partition key (for instance per patient), with a
+    bounded number of finders (or of stored documents) kept in memory.
+
+    When the budget is exceeded, the least recently used finders are evicted.
+    If `spillDir` is provided, evicted finders are pickled and compressed to a
+    file of this directory, and transparently loaded back the next time their
+    partition is requested. Otherwise, their history is lost. Finders must
+    therefore be picklable to be spilled (which is the case with the default
+    `MemoryIndex`).
+
+    This class is not thread-safe: callers sharing a registry between threads
+    must synchronize accesses, and make sure that finders being used are not
+    evicted (cf `pinnedPartitions` of `getDuplicateFinder()`). To avoid
+    holding a lock while finders are loaded or spilled, they can call the
+    steps of `getDuplicateFinder()` separately (cf `DuplicateFinderService`).
+    The numbers of documents of the finders are then only refreshed when
+    `updateNbDocuments()` is called, so that the registry never has to wait
+    for finders being used.
+    """
+
+    def __init__(
+        self,
+        createDuplicateFinder,
+        maxFinders=None,
+        maxDocuments=None,
+        spillDir=None,
+        compressionLevel=6,
+    ):
+        """
+        Parameters
+        ----------
+        createDuplicateFinder: Callable[[str], DuplicateFinder]
+            Function returning a new `DuplicateFinder` for a partition key
+        maxFinders: Optional[int]
+            Maximum number of finders to keep in memory. `None` means no limit
+        maxDocuments: Optional[int]
+            Maximum number of documents stored by the finders kept in memory,
+            as a proxy of the memory they use. Since finders are used outside
+            of the registry, this is checked each time a finder is requested,
+            so the limit may be temporarily exceeded. `None` means no limit
+        spillDir: Optional[Union[str, Path]]
+            Directory in which to save evicted finders. If `None`, evicted
+            finders are dropped
+        compressionLevel: int
+            zlib compression level of the files of spilled finders
+        """
+
+        self.createDuplicateFinder = createDuplicateFinder
+        self.maxFinders = maxFinders
+        self.maxDocuments = maxDocuments
+        self.spillDir = None if spillDir is None else Path(spillDir)
+        self.compressionLevel = compressionLevel
+
+        if self.spillDir is not None:
+            self.spillDir.mkdir(parents=True, exist_ok=True)
+
+        # finders in memory by partition, from least to most recently used
+        self._findersByPartition = OrderedDict()
+        # numbers of documents of the finders in memory, as of their last
+        # update (cf updateNbDocuments())
+        self._nbDocsByPartition = {}
+        # number of finders evicted so far
+        self.nbEvictions = 0
+
+    def __len__(self):
+        """Number of finders in memory"""
+
+        return len(self._findersByPartition)
+
+    def __contains__(self, partition):
+        """Whether a finder exists for `partition`, in memory or spilled"""
+
+        return partition in self._findersByPartition or (
+            self.spillDir is not None and self._getSpillPath(partition).exists()
+        )
+
+    def getNbDocuments(self):
+        """
+        Return the number of documents stored by the finders in memory, as of
+        the last update of each finder. Doesn't wait for finders being used
+
+        Returns
+        -------
+        int
+            Sum of the lengths of the finders in memory
+        """
+
+        return sum(self._nbDocsByPartition.values())
+
+    def updateNbDocuments(self, partition, nbDocs):
+        """
+        Record the number of documents stored by the finder of a partition,
+        for instance after it processed new documents. Doesn't do any I/O nor
+        wait for the finder
+
+        Parameters
+        ----------
+        partition: str
+            Partition key
+        nbDocs: int
+            Length of the finder of the partition (ignored if it isn't in
+            memory anymore)
+        """
+
+        if partition in self._nbDocsByPartition:
+            self._nbDocsByPartition[partition] = nbDocs
+
+    def getDuplicateFinder(self, partition, pinnedPartitions=()):
+        """
+        Return the finder of a partition, loading it if it was spilled or
+        creating it if it doesn't exist yet, then evict least recently used
+        finders if the budget is exceeded
+
+        Parameters
+        ----------
+        partition: str
+            Partition key
+        pinnedPartitions: Container[str]
+            Partitions whose finders must not be evicted (for instance because
+            they are being used)
+
+        Returns
+        -------
+        DuplicateFinder
+            Finder of the partition
+        """
+
+        duplicateFinder = self.getLoadedDuplicateFinder(partition)
+        if duplicateFinder is None:
+            duplicateFinder = self.loadDuplicateFinder(partition)
+            self.addDuplicateFinder(partition, duplicateFinder)
+
+        # finders may have been modified since they were requested
+        for p, f in self._findersByPartition.items():
+            self.updateNbDocuments(p, len(f))
+        evictedFinders = self.evictDuplicateFinders(
+            lambda p: p == partition or p in pinnedPartitions
+        )
+        for evictedPartition, evictedFinder in evictedFinders:
+            self.spillDuplicateFinder(evictedPartition, evictedFinder)
+        return duplicateFinder
+
+    # The methods below are the steps of getDuplicateFinder(). They are exposed
+    # so that callers sharing a registry between threads can only synchronize
+    # the steps that don't do any I/O (getLoadedDuplicateFinder(),
+    # addDuplicateFinder() and evictDuplicateFinders()), and load or spill
+    # finders of different partitions concurrently
+
+    def getLoadedDuplicateFinder(self, partition):
+        """
+        Return the finder of a partition if it is in memory (marking it as
+        the most recently used), `None` otherwise. Doesn't do any I/O
+
+        Parameters
+        ----------
+        partition: str
+            Partition key
+
+        Returns
+        -------
+        Optional[DuplicateFinder]
+            Finder of the partition
+        """
+
+        duplicateFinder = self._findersByPartition.get(partition)
+        if duplicateFinder is not None:
+            self._findersByPartition.move_to_end(partition)
+        return duplicateFinder
+
+    def loadDuplicateFinder(self, partition):
+        """
+        Load the finder of a partition if it was spilled, or create it. The
+        finder is not added to the registry (cf `addDuplicateFinder()`), so
+        this doesn't modify the registry
+
+        Parameters
+        ----------
+        partition: str
+            Partition key, whose finder is not in memory
+
+        Returns
+        -------
+        DuplicateFinder
+            Finder of the partition
+        """
+
+        duplicateFinder = self._load(partition)
+        if duplicateFinder is None:
+            duplicateFinder = self.createDuplicateFinder(partition)
+        return duplicateFinder
+
+    def addDuplicateFinder(self, partition, duplicateFinder):
+        """
+        Add the finder of a partition to the finders in memory, as the most
+        recently used one. Doesn't evict finders nor do any I/O
+
+        Parameters
+        ----------
+        partition: str
+            Partition key, whose finder is not in memory
+        duplicateFinder: DuplicateFinder
+            Finder returned by `loadDuplicateFinder()`
+        """
+
+        assert partition not in self._findersByPartition
+        self._findersByPartition[partition] = duplicateFinder
+        # the finder isn't used yet so this doesn't wait
+        self._nbDocsByPartition[partition] = len(duplicateFinder)
+
+    def evictDuplicateFinders(self, isPinned=None):
+        """
+        Remove least recently used finders from memory until the budget is
+        respected, without saving them (cf `spillDuplicateFinder()`)
+
+        Parameters
+        ----------
+        isPinned: Optional[Callable[[str], bool]]
+            Function returning whether the finder of a partition must not be
+            evicted
+
+        Returns
+        -------
+        List[Tuple[str, DuplicateFinder]]
+            Partitions and evicted finders, to be passed to
+            `spillDuplicateFinder()`
+        """
+
+        nbDocs = self.getNbDocuments()
+
+        def isOverBudget():
+            return (
+                self.maxFinders is not None
+                and len(self._findersByPartition) > self.maxFinders
+            ) or (self.maxDocuments is not None and nbDocs > self.maxDocuments)
+
+        evictedFinders = []
+        for partition in list(self._findersByPartition):
+            if not isOverBudget():
+                break
+            if isPinned is not None and isPinned(partition):
+                continue
+            duplicateFinder = self._findersByPartition.pop(partition)
+            nbDocs -= self._nbDocsByPartition.pop(partition)
+            evictedFinders.append((partition, duplicateFinder))
+            self.nbEvictions += 1
+        return evictedFinders
+
+    def spillDuplicateFinder(self, partition, duplicateFinder):
+        """
+        Save an evicted finder to `spillDir` (if provided, otherwise do
+        nothing). Doesn't modify the registry
+
+        The finder of a partition being spilled must not be loaded before the
+        spill is done, otherwise its previous version would be loaded
+
+        Parameters
+        ----------
+        partition: str
+            Partition key
+        duplicateFinder: DuplicateFinder
+            Finder returned by `evictDuplicateFinders()`
+        """
+
+        if self.spillDir is not None:
+            self._save(partition, duplicateFinder)
+
+    def spillAll(self):
+        """
+        Evict all finders from memory (saving them if `spillDir` was provided),
+        for instance before shutting down
+        """
+
+        while self._findersByPartition:
+            partition, duplicateFinder = self._findersByPartition.popitem(last=False)
+            del self._nbDocsByPartition[partition]
+            self.nbEvictions += 1
+            self.spillDuplicateFinder(partition, duplicateFinder)
+
+    def _getSpillPath(self, partition):
+        # partition keys may not be valid file names
+        digest = hashlib.blake2b(str(partition).encode("utf-8"), digest_size=16)
+        return self.spillDir / f"{digest.hexdigest()}.finder"
+
+    def _save(self, partition, duplicateFinder):
+        data = zlib.compress(
+            pickle.dumps((partition, duplicateFinder), pickle.HIGHEST_PROTOCOL),
+            self.compressionLevel,
+        )
+        # write to temporary file first so a crash doesn't leave a truncated
+        # file behind
+        path = self._getSpillPath(partition)
+        tmpPath = path.with_suffix(".tmp")
+        tmpPath.write_bytes(data)
+        os.replace(tmpPath, path)
+
+    def _load(self, partition):
+        """
+        Load the file of a spilled finder, or return `None` if the partition
+        wasn't spilled
+        """
+
+        if self.spillDir is None:
+            return None
+        path = self._getSpillPath(partition)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        savedPartition, duplicateFinder = pickle.loads(zlib.decompress(data))
+        assert savedPartition == partition
+        # the file is kept (and overwritten at next eviction) so that only
+        # the latest documents are lost if the process stops unexpectedly
+        return duplicateFinder
@@ -0,0 +1,176 @@
+import hashlib
+import itertools
+
+
+class MemoryIndex:
+    """
+    Default storage of the documents previously seen by a `DuplicateFinder`,
+    kept in memory.
+
+    Alternative indexes (such as `SqliteFingerprintIndex`) can be passed to
+    `DuplicateFinder` as long as they provide the same methods.
+    """
+
+    def __init__(self):
+        # mapping of previously seen documents, by id (in insertion order)
+        self.docsById = dict()
+
+    def __contains__(self, docId):
+        return docId in self.docsById
+
+    def __len__(self):
+        return len(self.docsById)
+
+    def getDocIds(self):
+        """
+        Return the ids of all stored documents
+
+        Returns
+        -------
+        Iterable[str]
+            Identifiers of stored documents, in insertion order
+        """
+
+        return self.docsById.keys()
+
+    def addDocument(self, doc):
+        """
+        Store a document, after all previously stored documents
+
+        Parameters
+        ----------
+        doc: _Document
+            Fingerprinted document to store
+        """
+
+        self.docsById[doc.id] = doc
+
+    def insertDocument(self, doc, beforeDocId):
+        """
+        Store a document before another stored document
+
+        Parameters
+        ----------
+        doc: _Document
+            Fingerprinted document to store
+        beforeDocId: str
+            Identifier of the stored document before which to insert `doc`
+        """
+
+        # move the documents stored from beforeDocId on after the new document,
+        # so the cost depends on the number of later documents only
+        laterDocIds = list(
+            itertools.takewhile(lambda i: i != beforeDocId, reversed(self.docsById))
+        )
+        laterDocIds.append(beforeDocId)
+        laterDocs = [self.docsById.pop(i) for i in reversed(laterDocIds)]
+        self.docsById[doc.id] = doc
+        for laterDoc in laterDocs:
+            self.docsById[laterDoc.id] = laterDoc
+
+    def removeDocument(self, docId):
+        """
+        Remove a stored document
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document to remove
+        """
+
+        del self.docsById[docId]
+
+    def replaceDocument(self, doc):
+        """
+        Replace a stored document by a new version with the same id, keeping
+        its position
+
+        Parameters
+        ----------
+        doc: _Document
+            New version of the document
+        """
+
+        self.docsById[doc.id] = doc
+
+    def getDocuments(self, fingerprints=None, beforeDocId=None):
+        """
+        Return stored documents that can be used as sources for a target
+        document having `fingerprints`.
+
+        Parameters
+        ----------
+        fingerprints: Optional[Set[str]]
+            Fingerprints of the target document. Indexes may use them to only
+            return documents (and spans) having fingerprints in common with the
+            target document, this index ignores them
+        beforeDocId: Optional[str]
+            If provided, only documents stored before this one are returned
+
+        Returns
+        -------
+        Iterable[_Document]
+            Stored documents, in insertion order
+        """
+
+        if beforeDocId is None:
+            return self.docsById.values()
+        return itertools.takewhile(
+            lambda d: d.id != beforeDocId, self.docsById.values()
+        )
+
+    def getAffectedDocIds(self, docId, fingerprints):
+        """
+        Return the documents stored after `docId` whose duplicates may change
+        if `docId` is removed or replaced
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the removed or replaced document
+        fingerprints: Optional[Set[str]]
+            Fingerprints of the new version of the document (empty if it is
+            removed). If `None`, all the documents stored after `docId` are
+            considered affected
+
+        Returns
+        -------
+        List[str]
+            Identifiers of the documents stored after `docId` having it as
+            source or having fingerprints in `fingerprints` (including in the
+            spans belonging to their duplicates, which are matched too), in
+            insertion order
+        """
+
+        docs = itertools.dropwhile(lambda d: d.id != docId, self.docsById.values())
+        next(docs)
+        if fingerprints is None:
+            return [d.id for d in docs]
+        return [
+            d.id
+            for d in docs
+            if docId in d.sourceDocIds
+            or (
+                fingerprints
+                and not (
+                    fingerprints.isdisjoint(d.spansByFingerprint)
+                    and fingerprints.isdisjoint(d.duplicatedFingerprints)
+                )
+            )
+        ]
+
+
+def _hashFingerprint(fingerprint):
+    """
+    Return a 64-bit signed int for `fingerprint` that is stable across
+    processes (unlike `hash()`), so it can be persisted
+    """
+
+    if isinstance(fingerprint, int):
+        if -(2**63) <= fingerprint < 2**63:
+            return fingerprint
+        fingerprint = str(fingerprint)
+    if isinstance(fingerprint, str):
+        fingerprint = fingerprint.encode("utf-8", "surrogatepass")
+    digest = hashlib.blake2b(fingerprint, digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
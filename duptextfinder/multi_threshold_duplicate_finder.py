@@ -0,0 +1,128 @@
+from .duplicate_finder import (
+    _Document,
+    _buildDuplicates,
+    _findSpansBelongingToDuplicates,
+    _getDefaultTreeBackend,
+    _removeOverlappingDuplicates,
+)
+
+
+class MultiThresholdDuplicateFinder:
+    """
+    Finds duplicated parts in a set of documents for several minimum duplicate
+    lengths at once.
+
+    The results for each minimum length are the same as the ones of separate
+    `DuplicateFinder` instances, but documents are only fingerprinted once.
+
+    Because of blacklisting (cf `_findSpansBelongingToDuplicates()`), the spans
+    of a previous document that can be used as sources depend on the duplicates
+    found in that document, and therefore on the minimum length. So for each
+    previous document, we keep one version of its fingerprinted spans per
+    distinct blacklist, shared by all the minimum lengths for which the
+    blacklist is the same (which is most often the case, for instance for all
+    documents without any duplicate). Matching is done once per version,
+    with the smallest of the minimum lengths sharing it, and only overlap
+    removal and blacklisting are done separately for each minimum length.
+    """
+
+    def __init__(self, fingerprintBuilder, minDuplicateLengths, treeBackend=None):
+        """
+        Parameters
+        ----------
+        fingerprintBuilder: Union[CharFingerprintBuilder, WordFingerprintBuilder]
+            Fingerprint builder instance to use to generate fingerprints for
+            each document
+        minDuplicateLengths: List[int]
+            Minimum numbers of characters in duplicates for which to find
+            duplicates, cf `DuplicateFinder`
+        treeBackend: Optional[TreeBackend]
+            Backend to use for overlap trees, cf `DuplicateFinder`
+        """
+
+        if not minDuplicateLengths:
+            raise ValueError("At least one minimum duplicate length must be provided")
+
+        if treeBackend is None:
+            treeBackend = _getDefaultTreeBackend()
+
+        self.fingerprintBuilder = fingerprintBuilder
+        self.minDuplicateLengths = sorted(set(minDuplicateLengths))
+        self.treeBackend = treeBackend
+
+        # for each previously seen document, fingerprinted document to use as
+        # source for each min length (same instance for min lengths with the
+        # same blacklist)
+        self._docsByMinLengthById = dict()
+
+    def findDuplicates(self, docId, docText):
+        """
+        Look for parts in `docText` in common with previously seen documents,
+        for each minimum duplicate length.
+
+        Parameters
+        ----------
+        docId: str
+            Unique identifier of the document
+        docText: str
+            Text of the document
+
+        Returns
+        -------
+        Dict[int, List[Duplicate]]
+            Duplicates found in `docText` for each minimum duplicate length, cf
+            `DuplicateFinder.findDuplicates()`
+        """
+
+        if docId in self._docsByMinLengthById:
+            raise Exception(f"Already processed document with id {docId}")
+
+        spansAndFingerprints = self.fingerprintBuilder.buildFingerprints(docText)
+
+        duplicatesByMinLength = {m: [] for m in self.minDuplicateLengths}
+        for docsByMinLength in self._docsByMinLengthById.values():
+            # group min lengths by version of source doc to use
+            # (min lengths are sorted so the 1st one of each group is the
+            # smallest)
+            minLengthsByDocId = {}
+            for minLength, previousDoc in docsByMinLength.items():
+                if id(previousDoc) not in minLengthsByDocId:
+                    minLengthsByDocId[id(previousDoc)] = (previousDoc, [])
+                minLengthsByDocId[id(previousDoc)][1].append(minLength)
+
+            for previousDoc, minLengths in minLengthsByDocId.values():
+                # match once with the smallest min length, the other min lengths
+                # only filter out shorter duplicates
+                docDuplicates = _buildDuplicates(
+                    spansAndFingerprints,
+                    sourceDoc=previousDoc,
+                    minDuplicateLength=minLengths[0],
+                )
+                for minLength in minLengths:
+                    duplicatesByMinLength[minLength] += _removeOverlappingDuplicates(
+                        [d for d in docDuplicates if d.length >= minLength],
+                        minLength,
+                        self.treeBackend,
+                    )
+
+        # build one version of the document per distinct blacklist
+        spans = [s for s, _ in spansAndFingerprints]
+        docsByBlacklist = {}
+        docsByMinLength = {}
+        for minLength, duplicates in duplicatesByMinLength.items():
+            indicesOfDuplicatesSpans = frozenset(
+                _findSpansBelongingToDuplicates(spans, duplicates, self.treeBackend)
+            )
+            doc = docsByBlacklist.get(indicesOfDuplicatesSpans)
+            if doc is None:
+                spansByFingerprint = {}
+                for i, (span, fingerprint) in enumerate(spansAndFingerprints):
+                    if i in indicesOfDuplicatesSpans:
+                        continue
+                    spansByFingerprint.setdefault(fingerprint, []).append(span)
+                doc = _Document(docId, spansByFingerprint)
+                docsByBlacklist[indicesOfDuplicatesSpans] = doc
+            docsByMinLength[minLength] = doc
+
+        self._docsByMinLengthById[docId] = docsByMinLength
+        return duplicatesByMinLength
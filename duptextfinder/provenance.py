@@ -0,0 +1,308 @@
+from array import array
+import pickle
+import struct
+import sys
+
+from .span import Span
+
+_MAGIC = b"DTFP"
+# number of copies, size of pickled doc ids
+_HEADER = struct.Struct("<qq")
+# source doc index, source start, source end, target doc index, target start,
+# target end
+_NB_COPY_FIELDS = 6
+
+
+class Copy:
+    """
+    Duplicated part between 2 documents, as stored by `ProvenanceIndex`
+    (a `Duplicate` with the id of its target document)
+    """
+
+    __slots__ = "sourceDocId", "sourceSpan", "targetDocId", "targetSpan"
+
+    def __init__(self, sourceDocId, sourceSpan, targetDocId, targetSpan):
+        """
+        Parameters
+        ----------
+        sourceDocId: str
+            Identifier of the source document
+        sourceSpan: Span
+            Duplicated character span in the source document
+        targetDocId: str
+            Identifier of the target document, in which the source span was
+            copied
+        targetSpan: Span
+            Duplicated character span in the target document
+        """
+
+        self.sourceDocId = sourceDocId
+        self.sourceSpan = sourceSpan
+        self.targetDocId = targetDocId
+        self.targetSpan = targetSpan
+
+    def __repr__(self):
+        return f"Copy(sourceDocId={self.sourceDocId}, sourceSpan={self.sourceSpan!r}, targetDocId={self.targetDocId}, targetSpan={self.targetSpan!r})"
+
+
+class ProvenanceIndex:
+    """
+    Reverse index of the duplicates found by a `DuplicateFinder`, to find out
+    where the parts of a document were copied to.
+
+    When passed to a `DuplicateFinder`, the index is updated each time a
+    document is processed, removed or replaced. Copies are indexed both by
+    source and by target document, so looking up the copies of a document
+    only costs the number of copies of that document, and copy chains (a part
+    of a document copied in a 2d document, then copied from the 2d document in
+    a 3d one, etc) can be walked without processing documents again.
+
+    Note that because of blacklisting (cf `DuplicateFinder`), parts copied from
+    a document that were themselves copied from an older document are
+    attributed to the older document, so most chains are only one level deep.
+
+    The index can be saved to a compact binary file with `save()` and loaded
+    back with `load()`.
+    """
+
+    def __init__(self):
+        # copies by source doc id, and by target doc id (in insertion order)
+        self._copiesBySourceId = {}
+        self._copiesByTargetId = {}
+
+    def __len__(self):
+        """Number of copies stored"""
+
+        return sum(len(copies) for copies in self._copiesByTargetId.values())
+
+    def addDuplicates(self, targetDocId, duplicates):
+        """
+        Store the duplicates found in a document
+
+        Parameters
+        ----------
+        targetDocId: str
+            Identifier of the document in which the duplicates were found
+        duplicates: List[Duplicate]
+            Duplicates found in the document
+        """
+
+        for duplicate in duplicates:
+            self._addCopy(
+                Copy(
+                    duplicate.sourceDocId,
+                    duplicate.sourceSpan,
+                    targetDocId,
+                    duplicate.targetSpan,
+                )
+            )
+
+    def _addCopy(self, copy):
+        self._copiesBySourceId.setdefault(copy.sourceDocId, []).append(copy)
+        self._copiesByTargetId.setdefault(copy.targetDocId, []).append(copy)
+
+    def removeDocument(self, docId):
+        """
+        Forget all the copies from or to a document
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document
+        """
+
+        self.removeTarget(docId)
+        for copy in self._copiesBySourceId.pop(docId, []):
+            copies = self._copiesByTargetId[copy.targetDocId]
+            copies.remove(copy)
+            if not copies:
+                del self._copiesByTargetId[copy.targetDocId]
+
+    def removeTarget(self, targetDocId):
+        """
+        Forget the duplicates found in a document (for instance before storing
+        the duplicates of a new version of the document)
+
+        Parameters
+        ----------
+        targetDocId: str
+            Identifier of the document
+        """
+
+        copies = self._copiesByTargetId.pop(targetDocId, [])
+        for sourceDocId in {c.sourceDocId for c in copies}:
+            sourceCopies = [
+                c
+                for c in self._copiesBySourceId[sourceDocId]
+                if c.targetDocId != targetDocId
+            ]
+            if sourceCopies:
+                self._copiesBySourceId[sourceDocId] = sourceCopies
+            else:
+                del self._copiesBySourceId[sourceDocId]
+
+    def getCopies(self, sourceDocId, start=None, end=None):
+        """
+        Return the copies of the parts of a document
+
+        Parameters
+        ----------
+        sourceDocId: str
+            Identifier of the source document
+        start: Optional[int]
+            If provided, only copies of source spans ending after `start` are
+            returned
+        end: Optional[int]
+            If provided, only copies of source spans starting before `end` are
+            returned
+
+        Returns
+        -------
+        List[Copy]
+            Copies of the (range of the) source document, in the order in which
+            target documents were processed
+        """
+
+        return [
+            c
+            for c in self._copiesBySourceId.get(sourceDocId, [])
+            if (start is None or c.sourceSpan.end > start)
+            and (end is None or c.sourceSpan.start < end)
+        ]
+
+    def getSources(self, targetDocId):
+        """
+        Return the copies found in a document, ie its duplicates
+
+        Parameters
+        ----------
+        targetDocId: str
+            Identifier of the target document
+
+        Returns
+        -------
+        List[Copy]
+            Copies of parts of previous documents found in the target document
+        """
+
+        return list(self._copiesByTargetId.get(targetDocId, []))
+
+    def walkCopies(self, sourceDocId, start=None, end=None, maxDepth=None):
+        """
+        Walk the copy chains starting from (a range of) a document: copies of
+        the document, then copies of these copies, etc.
+
+        Parameters
+        ----------
+        sourceDocId: str
+            Identifier of the document at the start of the chains
+        start, end: Optional[int]
+            Range of the document to follow, cf `getCopies()`
+        maxDepth: Optional[int]
+            Maximum length of the chains to follow. `None` means no limit
+
+        Returns
+        -------
+        Iterator[Tuple[int, Copy]]
+            Copies found along the chains and their depth (1 for the copies of
+            the initial document), breadth-first
+        """
+
+        queue = [(sourceDocId, start, end)]
+        visited = set(queue)
+        depth = 0
+        while queue and (maxDepth is None or depth < maxDepth):
+            depth += 1
+            nextQueue = []
+            for docId, rangeStart, rangeEnd in queue:
+                for copy in self.getCopies(docId, rangeStart, rangeEnd):
+                    yield depth, copy
+                    # only follow the copied part of the target document
+                    key = (copy.targetDocId, copy.targetSpan.start, copy.targetSpan.end)
+                    if key not in visited:
+                        visited.add(key)
+                        nextQueue.append(key)
+            queue = nextQueue
+
+    def save(self, path):
+        """
+        Save the index to a binary file, made of a header, the pickled list of
+        doc ids and an array of 64-bit ints with 6 values per copy
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            Path of the file to write
+        """
+
+        indicesByDocId = {}
+        values = array("q")
+        for copies in self._copiesByTargetId.values():
+            for copy in copies:
+                sourceIndex = indicesByDocId.setdefault(
+                    copy.sourceDocId, len(indicesByDocId)
+                )
+                targetIndex = indicesByDocId.setdefault(
+                    copy.targetDocId, len(indicesByDocId)
+                )
+                values.extend(
+                    (
+                        sourceIndex,
+                        copy.sourceSpan.start,
+                        copy.sourceSpan.end,
+                        targetIndex,
+                        copy.targetSpan.start,
+                        copy.targetSpan.end,
+                    )
+                )
+
+        # values are stored as little-endian
+        if sys.byteorder == "big":
+            values.byteswap()
+        pickledDocIds = pickle.dumps(list(indicesByDocId))
+        with open(path, "wb") as fp:
+            fp.write(_MAGIC)
+            fp.write(_HEADER.pack(len(values) // _NB_COPY_FIELDS, len(pickledDocIds)))
+            fp.write(pickledDocIds)
+            values.tofile(fp)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with `save()`
+
+        Parameters
+        ----------
+        path: Union[str, Path]
+            Path of the file to read
+
+        Returns
+        -------
+        ProvenanceIndex
+            Loaded index
+        """
+
+        with open(path, "rb") as fp:
+            if fp.read(len(_MAGIC)) != _MAGIC:
+                raise Exception(f"{path} is not a provenance index file")
+            nbCopies, docIdsSize = _HEADER.unpack(fp.read(_HEADER.size))
+            docIds = pickle.loads(fp.read(docIdsSize))
+            values = array("q")
+            values.fromfile(fp, nbCopies * _NB_COPY_FIELDS)
+        if sys.byteorder == "big":
+            values.byteswap()
+
+        index = cls()
+        for i in range(0, len(values), _NB_COPY_FIELDS):
+            sourceIndex, sourceStart, sourceEnd, targetIndex, targetStart, targetEnd = (
+                values[i : i + _NB_COPY_FIELDS]
+            )
+            index._addCopy(
+                Copy(
+                    docIds[sourceIndex],
+                    Span(sourceStart, sourceEnd),
+                    docIds[targetIndex],
+                    Span(targetStart, targetEnd),
+                )
+            )
+        return index
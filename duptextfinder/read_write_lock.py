@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+import threading
+
+
+class ReadWriteLock:
+    """
+    Lock that can be held by several readers at once, or by one writer.
+
+    Writers have priority: once a writer is waiting, new readers wait until it
+    is done, so that a continuous flow of readers can't starve writers.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._nbReaders = 0
+        self._nbWaitingWriters = 0
+        self._isWriting = False
+
+    @contextmanager
+    def reading(self):
+        """Context manager holding the lock for reading"""
+
+        with self._condition:
+            while self._isWriting or self._nbWaitingWriters > 0:
+                self._condition.wait()
+            self._nbReaders += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._nbReaders -= 1
+                if self._nbReaders == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        """Context manager holding the lock for writing"""
+
+        with self._condition:
+            self._nbWaitingWriters += 1
+            try:
+                while self._isWriting or self._nbReaders > 0:
+                    self._condition.wait()
+            finally:
+                self._nbWaitingWriters -= 1
+            self._isWriting = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._isWriting = False
+                self._condition.notify_all()
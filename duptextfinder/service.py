@@ -0,0 +1,414 @@
+import argparse
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+from .char_fingerprint_builder import CharFingerprintBuilder
+from .duplicate_finder import DuplicateFinder
+from .finder_registry import FinderRegistry
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Request:
+    """Document waiting to be processed by `DuplicateFinderService`"""
+
+    __slots__ = "docId", "docText", "done", "duplicates", "error"
+
+    def __init__(self, docId, docText):
+        self.docId = docId
+        self.docText = docText
+        self.done = threading.Event()
+        self.duplicates = None
+        self.error = None
+
+
+class _ConflictError(Exception):
+    """Raised when a document was already processed (HTTP 409)"""
+
+
+class _Metrics:
+    """Counters and latency histogram exposed in Prometheus text format"""
+
+    def __init__(self):
+        self.nbDocs = 0
+        self.nbDuplicates = 0
+        self.nbErrors = 0
+        self.nbBatches = 0
+        self.latencyBucketCounts = [0] * (len(_LATENCY_BUCKETS) + 1)
+        self.latencySum = 0.0
+
+    def observeLatency(self, latency):
+        self.latencyBucketCounts[bisect_left(_LATENCY_BUCKETS, latency)] += 1
+        self.latencySum += latency
+
+    def render(self, nbFinders, nbStoredDocs, nbEvictions):
+        lines = []
+
+        def add(name, type, help, value):
+            lines.append(f"# HELP duptextfinder_{name} {help}")
+            lines.append(f"# TYPE duptextfinder_{name} {type}")
+            lines.append(f"duptextfinder_{name} {value}")
+
+        add("documents_total", "counter", "Documents processed", self.nbDocs)
+        add("duplicates_total", "counter", "Duplicates found", self.nbDuplicates)
+        add("errors_total", "counter", "Documents that failed", self.nbErrors)
+        add(
+            "batches_total", "counter", "Batches of documents processed", self.nbBatches
+        )
+        add("evictions_total", "counter", "Finders evicted", nbEvictions)
+        add("finders", "gauge", "Finders in memory", nbFinders)
+        add("stored_documents", "gauge", "Documents stored in finders", nbStoredDocs)
+
+        name = "duptextfinder_request_latency_seconds"
+        lines.append(f"# HELP {name} Time to process documents, including waiting")
+        lines.append(f"# TYPE {name} histogram")
+        cumulativeCount = 0
+        for bound, count in zip(_LATENCY_BUCKETS + ("+Inf",), self.latencyBucketCounts):
+            cumulativeCount += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulativeCount}')
+        lines.append(f"{name}_sum {self.latencySum}")
+        lines.append(f"{name}_count {cumulativeCount}")
+
+        return "\n".join(lines) + "\n"
+
+
+class DuplicateFinderService:
+    """
+    Thread-safe front to one `DuplicateFinder` per partition (for instance per
+    patient), meant to be exposed over HTTP by `createServer()`.
+
+    At most `maxFinders` finders are kept in memory, the least recently used
+    one being evicted when a new partition comes in. Evicted finders are saved
+    to `spillDir` and reloaded when needed if it is provided, otherwise their
+    history is lost (cf `FinderRegistry`).
+
+    Documents of a partition submitted while previous documents of the same
+    partition are being processed are queued and then processed together in
+    one batch by the thread that was already processing the partition, in
+    submission order.
+
+    Finders are loaded and spilled without holding the lock shared by all
+    partitions, so slow disk accesses only delay the partitions concerned.
+    """
+
+    def __init__(self, createDuplicateFinder, maxFinders=1000, spillDir=None):
+        """
+        Parameters
+        ----------
+        createDuplicateFinder: Callable[[str], DuplicateFinder]
+            Function returning a new `DuplicateFinder` for a partition key
+        maxFinders: int
+            Maximum number of finders to keep in memory
+        spillDir: Optional[Union[str, Path]]
+            Directory in which to save evicted finders
+        """
+
+        self.createDuplicateFinder = createDuplicateFinder
+        self.maxFinders = maxFinders
+
+        self._lock = threading.Lock()
+        # finders by partition
+        self._registry = FinderRegistry(
+            createDuplicateFinder, maxFinders=maxFinders, spillDir=spillDir
+        )
+        # requests waiting to be processed, for partitions being processed
+        self._pendingRequestsByPartition = {}
+        # events set when evicted finders are done being spilled, by partition
+        self._spillEventsByPartition = {}
+        self._metrics = _Metrics()
+
+    def findDuplicates(self, partition, docId, docText):
+        """
+        Look for parts in `docText` in common with previously submitted
+        documents of the same partition, cf `DuplicateFinder.findDuplicates()`.
+        Blocks until the document has been processed.
+
+        Parameters
+        ----------
+        partition: str
+            Partition key of the document
+        docId: str
+            Unique identifier of the document in the partition
+        docText: str
+            Text of the document
+
+        Returns
+        -------
+        List[Duplicate]
+            Duplicates found in `docText`
+        """
+
+        startTime = time.perf_counter()
+        request = _Request(docId, docText)
+
+        with self._lock:
+            pendingRequests = self._pendingRequestsByPartition.get(partition)
+            # partition is already being processed by another thread, which
+            # will also process this request
+            if pendingRequests is not None:
+                pendingRequests.append(request)
+                mustProcess = False
+            else:
+                self._pendingRequestsByPartition[partition] = [request]
+                mustProcess = True
+
+        if mustProcess:
+            self._processPartition(partition)
+        request.done.wait()
+
+        with self._lock:
+            self._metrics.observeLatency(time.perf_counter() - startTime)
+
+        if request.error is not None:
+            raise request.error
+        return request.duplicates
+
+    def _processPartition(self, partition):
+        """Process pending requests of a partition by batches until there are none"""
+
+        batch = []
+        try:
+            while True:
+                with self._lock:
+                    batch = self._pendingRequestsByPartition[partition]
+                    if not batch:
+                        del self._pendingRequestsByPartition[partition]
+                        return
+                    self._pendingRequestsByPartition[partition] = []
+
+                try:
+                    duplicateFinder = self._getDuplicateFinder(partition)
+                except Exception as e:
+                    duplicateFinder = None
+                    finderError = e
+
+                nbDuplicates = 0
+                nbErrors = 0
+                for request in batch:
+                    try:
+                        if duplicateFinder is None:
+                            raise finderError
+                        if request.docId in duplicateFinder:
+                            raise _ConflictError(
+                                f"Already processed document with id {request.docId}"
+                            )
+                        request.duplicates = duplicateFinder.findDuplicates(
+                            request.docId, request.docText
+                        )
+                        nbDuplicates += len(request.duplicates)
+                    except Exception as e:
+                        request.error = e
+                        nbErrors += 1
+                    request.done.set()
+
+                # counted outside of the lock shared by all partitions (the finder
+                # is only used by this thread anyway)
+                nbStoredDocs = None if duplicateFinder is None else len(duplicateFinder)
+                with self._lock:
+                    if nbStoredDocs is not None:
+                        self._registry.updateNbDocuments(partition, nbStoredDocs)
+                    self._metrics.nbBatches += 1
+                    self._metrics.nbDocs += len(batch)
+                    self._metrics.nbDuplicates += nbDuplicates
+                    self._metrics.nbErrors += nbErrors
+        except BaseException as e:
+            # don't leave requests waiting forever, nor the partition marked as
+            # being processed
+            with self._lock:
+                batch += self._pendingRequestsByPartition.pop(partition, [])
+            for request in batch:
+                if not request.done.is_set():
+                    request.error = e
+                    request.done.set()
+            raise
+
+    def _getDuplicateFinder(self, partition):
+        """
+        Get the finder of a partition being processed from the registry, and
+        spill the finders evicted to make room for it. The lock is only held
+        while the registry is modified, not while finders are loaded or saved
+        """
+
+        while True:
+            with self._lock:
+                spillEvent = self._spillEventsByPartition.get(partition)
+                if spillEvent is None:
+                    duplicateFinder = self._registry.getLoadedDuplicateFinder(partition)
+                    break
+            # the finder of the partition is being saved, wait before loading it
+            spillEvent.wait()
+
+        # the partition is being processed by this thread only, and is pinned,
+        # so its finder can't be loaded nor evicted by other threads meanwhile
+        if duplicateFinder is None:
+            duplicateFinder = self._registry.loadDuplicateFinder(partition)
+
+        with self._lock:
+            if self._registry.getLoadedDuplicateFinder(partition) is None:
+                self._registry.addDuplicateFinder(partition, duplicateFinder)
+            # don't evict finders being used
+            evictedFinders = self._registry.evictDuplicateFinders(
+                self._pendingRequestsByPartition.__contains__
+            )
+            spillEvents = [threading.Event() for _ in evictedFinders]
+            for (evictedPartition, _), spillEvent in zip(evictedFinders, spillEvents):
+                self._spillEventsByPartition[evictedPartition] = spillEvent
+
+        spillError = None
+        for (evictedPartition, evictedFinder), spillEvent in zip(
+            evictedFinders, spillEvents
+        ):
+            try:
+                self._registry.spillDuplicateFinder(evictedPartition, evictedFinder)
+            except Exception as e:
+                spillError = spillError or e
+            finally:
+                with self._lock:
+                    del self._spillEventsByPartition[evictedPartition]
+                spillEvent.set()
+        if spillError is not None:
+            raise spillError
+
+        return duplicateFinder
+
+    def renderMetrics(self):
+        """
+        Return metrics in Prometheus text format
+
+        Returns
+        -------
+        str
+            Counters of processed documents, duplicates, batches and evictions,
+            number of finders and stored documents and latency histogram
+        """
+
+        with self._lock:
+            return self._metrics.render(
+                len(self._registry),
+                self._registry.getNbDocuments(),
+                self._registry.nbEvictions,
+            )
+
+
+def createServer(service, host="127.0.0.1", port=8000):
+    """
+    Create an HTTP server exposing `service`, with these endpoints:
+
+    - `POST /documents`: process a document, with a JSON body containing
+      "partition", "id" and "text" keys. Return a JSON list of duplicates, or
+      a 409 error if the document was already processed
+    - `GET /metrics`: return metrics in Prometheus text format
+
+    Parameters
+    ----------
+    service: DuplicateFinderService
+        Service to expose
+    host: str
+        Host on which to listen
+    port: int
+        Port on which to listen (0 to pick a free port)
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        Server, not started yet (call `serve_forever()` to start it)
+    """
+
+    class _RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            self._sendResponse(
+                200, "text/plain; version=0.0.4", service.renderMetrics()
+            )
+
+        def do_POST(self):
+            if self.path != "/documents":
+                self.send_error(404)
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                data = json.loads(self.rfile.read(length))
+                partition, docId, docText = data["partition"], data["id"], data["text"]
+            except (ValueError, KeyError, TypeError):
+                self.send_error(400, "Expected JSON object with partition, id and text")
+                return
+
+            try:
+                duplicates = service.findDuplicates(partition, docId, docText)
+            except _ConflictError as e:
+                self._sendResponse(
+                    409, "application/json", json.dumps({"error": str(e)})
+                )
+                return
+            except Exception as e:
+                self._sendResponse(
+                    500, "application/json", json.dumps({"error": str(e)})
+                )
+                return
+
+            duplicatesData = [
+                {
+                    "source_doc_id": d.sourceDocId,
+                    "source_start": d.sourceSpan.start,
+                    "source_end": d.sourceSpan.end,
+                    "target_start": d.targetSpan.start,
+                    "target_end": d.targetSpan.end,
+                }
+                for d in duplicates
+            ]
+            self._sendResponse(200, "application/json", json.dumps(duplicatesData))
+
+        def _sendResponse(self, status, contentType, body):
+            body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", contentType)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), _RequestHandler)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Serve duplicate detection over HTTP, with one history per partition"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fingerprint-length", type=int, default=15)
+    parser.add_argument("--min-duplicate-length", type=int, default=15)
+    parser.add_argument("--max-finders", type=int, default=1000)
+    parser.add_argument(
+        "--spill-dir", help="Directory in which to save evicted finders"
+    )
+    args = parser.parse_args(args)
+
+    def createDuplicateFinder(partition):
+        return DuplicateFinder(
+            CharFingerprintBuilder(args.fingerprint_length),
+            minDuplicateLength=args.min_duplicate_length,
+        )
+
+    service = DuplicateFinderService(
+        createDuplicateFinder, maxFinders=args.max_finders, spillDir=args.spill_dir
+    )
+    server = createServer(service, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
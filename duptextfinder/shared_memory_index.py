@@ -0,0 +1,301 @@
+from array import array
+from bisect import bisect_left
+from multiprocessing import resource_tracker, shared_memory
+import pickle
+import struct
+
+from .duplicate_finder import _Document
+from .index import MemoryIndex, _hashFingerprint
+from .span import Span
+
+# number of fingerprint entries, size of pickled doc ids
+_HEADER = struct.Struct("<qq")
+_ITEM_SIZE = 8
+
+
+class SharedMemoryIndex:
+    """
+    Read-only storage of previously seen documents, shared between processes
+    through `multiprocessing.shared_memory`.
+
+    The fingerprints of all the documents of a `MemoryIndex` are exported into
+    one shared memory block as sorted arrays of (hash, docIndex, start, end).
+    Worker processes can then attach to the block by name and use it as the
+    index of their own `DuplicateFinder`, without copying nor unpickling the
+    history: fingerprint lookups are binary searches directly performed on the
+    shared buffer.
+
+    Documents processed by a worker are stored in a local `MemoryIndex`, in
+    addition to the shared (and immutable) history. Only these local documents
+    can be removed or replaced.
+
+    Fingerprints are stored as 64-bit hashes. Collisions are unlikely enough to
+    be ignored.
+    """
+
+    def __init__(self, sharedMemory, owner):
+        """
+        Use `create()` or `attach()` rather than calling this directly
+
+        Parameters
+        ----------
+        sharedMemory: shared_memory.SharedMemory
+            Shared memory block containing the exported index
+        owner: bool
+            Whether the block was created by this instance (and should be
+            unlinked by it)
+        """
+
+        self.sharedMemory = sharedMemory
+        self.owner = owner
+
+        buffer = sharedMemory.buf
+        nbItems, docIdsSize = _HEADER.unpack_from(buffer)
+        offset = _HEADER.size
+        self._docIds = pickle.loads(bytes(buffer[offset : offset + docIdsSize]))
+        self._sharedDocIds = set(self._docIds)
+        offset += docIdsSize
+        offset += -offset % _ITEM_SIZE
+
+        # zero-copy views on arrays
+        self._views = []
+        for _ in range(4):
+            view = buffer[offset : offset + nbItems * _ITEM_SIZE].cast("q")
+            self._views.append(view)
+            offset += nbItems * _ITEM_SIZE
+        self._hashes, self._docIndices, self._starts, self._ends = self._views
+
+        # documents processed after the export
+        self._localIndex = MemoryIndex()
+
+    @property
+    def name(self):
+        """Name of the shared memory block, to pass to `attach()`"""
+
+        return self.sharedMemory.name
+
+    @classmethod
+    def create(cls, index, name=None):
+        """
+        Export the documents of `index` to a new shared memory block.
+
+        The instance returned owns the block, which must be released with
+        `unlink()` when workers don't need it anymore.
+
+        Parameters
+        ----------
+        index: MemoryIndex
+            Index containing fingerprinted documents, for instance used by a
+            `DuplicateFinder` to process a reference history
+        name: Optional[str]
+            Name of the shared memory block to create. If `None`, a random name
+            will be used
+
+        Returns
+        -------
+        SharedMemoryIndex
+            Index owning the newly created block
+        """
+
+        docs = list(index.getDocuments())
+        entries = sorted(
+            (_hashFingerprint(fingerprint), docIndex, span.start, span.end)
+            for docIndex, doc in enumerate(docs)
+            for fingerprint, spans in doc.spansByFingerprint.items()
+            for span in spans
+        )
+        pickledDocIds = pickle.dumps([doc.id for doc in docs])
+        nbItems = len(entries)
+
+        offset = _HEADER.size + len(pickledDocIds)
+        offset += -offset % _ITEM_SIZE
+        size = offset + 4 * nbItems * _ITEM_SIZE
+        sharedMemory = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        buffer = sharedMemory.buf
+        _HEADER.pack_into(buffer, 0, nbItems, len(pickledDocIds))
+        buffer[_HEADER.size : _HEADER.size + len(pickledDocIds)] = pickledDocIds
+        for column in zip(*entries) if entries else ((), (), (), ()):
+            data = array("q", column).tobytes()
+            buffer[offset : offset + len(data)] = data
+            offset += nbItems * _ITEM_SIZE
+
+        return cls(sharedMemory, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to a shared memory block created by `create()`, typically from
+        a worker process
+
+        Parameters
+        ----------
+        name: str
+            Name of the shared memory block
+
+        Returns
+        -------
+        SharedMemoryIndex
+            Index reading the shared block
+        """
+
+        try:
+            # don't let the resource tracker of this process unlink the block
+            # (python >= 3.13)
+            sharedMemory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # attaching registers the block to the resource tracker on older
+            # versions, which would unlink it when this process exits
+            sharedMemory = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(sharedMemory._name, "shared_memory")
+        return cls(sharedMemory, owner=False)
+
+    def __reduce__(self):
+        # pickling (for instance to send the index to a worker process)
+        # attaches to the same block rather than copying it
+        return SharedMemoryIndex.attach, (self.name,)
+
+    def __contains__(self, docId):
+        return docId in self._sharedDocIds or docId in self._localIndex
+
+    def __len__(self):
+        return len(self._docIds) + len(self._localIndex)
+
+    def getDocIds(self):
+        """
+        Return the ids of all shared documents followed by the ids of local
+        documents
+
+        Returns
+        -------
+        List[str]
+            Identifiers of stored documents, in insertion order
+        """
+
+        return self._docIds + list(self._localIndex.getDocIds())
+
+    def addDocument(self, doc):
+        """
+        Store a document in the local (non-shared) part of the index
+
+        Parameters
+        ----------
+        doc: _Document
+            Fingerprinted document to store
+        """
+
+        self._localIndex.addDocument(doc)
+
+    def removeDocument(self, docId):
+        """
+        Remove a document from the local part of the index
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document to remove
+        """
+
+        self._checkIsLocal(docId)
+        self._localIndex.removeDocument(docId)
+
+    def replaceDocument(self, doc):
+        """
+        Replace a document of the local part of the index, keeping its position
+
+        Parameters
+        ----------
+        doc: _Document
+            New version of the document
+        """
+
+        self._checkIsLocal(doc.id)
+        self._localIndex.replaceDocument(doc)
+
+    def getAffectedDocIds(self, docId, fingerprints):
+        """
+        Return the documents stored after a local document whose duplicates
+        may change if it is removed or replaced, cf
+        `MemoryIndex.getAffectedDocIds()`
+        """
+
+        self._checkIsLocal(docId)
+        return self._localIndex.getAffectedDocIds(docId, fingerprints)
+
+    def _checkIsLocal(self, docId):
+        if docId in self._sharedDocIds:
+            raise Exception(
+                f"Can't modify document with id {docId} of the shared history"
+            )
+
+    def getDocuments(self, fingerprints, beforeDocId=None):
+        """
+        Return shared documents having fingerprints in common with a target
+        document (only containing the spans of these fingerprints), followed by
+        documents stored locally.
+
+        Parameters
+        ----------
+        fingerprints: Set[str]
+            Fingerprints of the target document
+        beforeDocId: Optional[str]
+            If provided, only documents stored before this one are returned
+
+        Returns
+        -------
+        List[_Document]
+            Stored documents, in insertion order
+        """
+
+        # shared documents are all before local ones
+        if beforeDocId in self._sharedDocIds:
+            maxDocIndex = self._docIds.index(beforeDocId)
+        else:
+            maxDocIndex = len(self._docIds)
+
+        hashes = self._hashes
+        nbItems = len(hashes)
+        docsByIndex = {}
+        for fingerprint in fingerprints:
+            hash = _hashFingerprint(fingerprint)
+            i = bisect_left(hashes, hash)
+            while i < nbItems and hashes[i] == hash:
+                docIndex = self._docIndices[i]
+                if docIndex < maxDocIndex:
+                    doc = docsByIndex.get(docIndex)
+                    if doc is None:
+                        doc = _Document(self._docIds[docIndex], {})
+                        docsByIndex[docIndex] = doc
+                    doc.spansByFingerprint.setdefault(fingerprint, []).append(
+                        Span(self._starts[i], self._ends[i])
+                    )
+                i += 1
+
+        docs = [docsByIndex[i] for i in sorted(docsByIndex)]
+        if beforeDocId not in self._sharedDocIds:
+            docs.extend(self._localIndex.getDocuments(fingerprints, beforeDocId))
+        return docs
+
+    def close(self):
+        """Detach from the shared memory block"""
+
+        self._releaseViews()
+        self.sharedMemory.close()
+
+    def unlink(self):
+        """Close and destroy the shared memory block (owner only)"""
+
+        if not self.owner:
+            raise Exception("Only the index that created the block can unlink it")
+        self.close()
+        self.sharedMemory.unlink()
+
+    def __del__(self):
+        # views must be released before the block can be closed
+        self._releaseViews()
+
+    def _releaseViews(self):
+        # views may not exist if __init__() failed
+        for view in getattr(self, "_views", ()):
+            view.release()
+        self._views = []
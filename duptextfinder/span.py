@@ -25,3 +25,8 @@ class Span:
 
     def __repr__(self):
         return f"Span(start={self.start}, end={self.end})"
+
+    def __reduce__(self):
+        # much faster to pickle and unpickle than the default for __slots__
+        # classes, which matters for snapshots of duplicate finders
+        return Span, (self.start, self.end)
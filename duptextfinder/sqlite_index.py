@@ -0,0 +1,341 @@
+import sqlite3
+import threading
+
+from .duplicate_finder import _Document
+from .index import _hashFingerprint
+from .span import Span
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    partition,
+    doc_id,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (partition, doc_id)
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    partition,
+    hash INTEGER NOT NULL,
+    doc_id,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fingerprints_by_hash
+    ON fingerprints (partition, hash);
+CREATE INDEX IF NOT EXISTS fingerprints_by_doc
+    ON fingerprints (partition, doc_id);
+CREATE TABLE IF NOT EXISTS duplicated_fingerprints (
+    partition,
+    hash INTEGER NOT NULL,
+    doc_id
+);
+CREATE INDEX IF NOT EXISTS duplicated_fingerprints_by_hash
+    ON duplicated_fingerprints (partition, hash);
+CREATE INDEX IF NOT EXISTS duplicated_fingerprints_by_doc
+    ON duplicated_fingerprints (partition, doc_id);
+CREATE TABLE IF NOT EXISTS sources (
+    partition,
+    doc_id,
+    source_doc_id
+);
+CREATE INDEX IF NOT EXISTS sources_by_source
+    ON sources (partition, source_doc_id);
+CREATE INDEX IF NOT EXISTS sources_by_doc
+    ON sources (partition, doc_id);
+"""
+
+
+class SqliteFingerprintIndex:
+    """
+    Persistent storage of the documents previously seen by a `DuplicateFinder`,
+    in a SQLite database file.
+
+    Fingerprints are stored as (partition, hash, docId, start, end) rows. When a
+    new document is processed, the spans of all stored documents having a
+    fingerprint in common with the new document are retrieved in one query, so
+    the history does not need to be fingerprinted again nor loaded in memory.
+
+    The ids of the source documents of the duplicates of each document are also
+    stored, as well as the hashes of the fingerprints only found in spans
+    belonging to duplicates, to find out which documents are affected when a
+    document is removed or replaced.
+
+    Several histories (for instance one per patient) can be stored in the same
+    file by using different partitions. Document ids must be unique within a
+    partition.
+
+    Fingerprints are stored as 64-bit hashes. Collisions are unlikely enough to
+    be ignored.
+
+    The index can be used from several threads (for instance by concurrent
+    `DuplicateFinder.queryDuplicates()` calls), lookups being serialized.
+    """
+
+    def __init__(self, path, partition="", batchSize=10000):
+        """
+        Parameters
+        ----------
+        path: str
+            Path of the SQLite database file. Will be created if it does not
+            exist
+        partition: Union[str, int]
+            Key of the history to use in the database file
+        batchSize: int
+            Number of fingerprints to insert per `executemany()` call
+        """
+
+        self.path = path
+        self.partition = partition
+        self.batchSize = batchSize
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # lookups go through the query_hashes table of the connection
+        self._lookupLock = threading.Lock()
+        self.connection.executescript(_SCHEMA)
+        self.connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS query_hashes (hash INTEGER PRIMARY KEY)"
+        )
+
+    def __contains__(self, docId):
+        cursor = self.connection.execute(
+            "SELECT 1 FROM documents WHERE partition = ? AND doc_id = ?",
+            (self.partition, docId),
+        )
+        return cursor.fetchone() is not None
+
+    def __len__(self):
+        cursor = self.connection.execute(
+            "SELECT COUNT(*) FROM documents WHERE partition = ?", (self.partition,)
+        )
+        return cursor.fetchone()[0]
+
+    def getDocIds(self):
+        """
+        Return the ids of all stored documents of the partition
+
+        Returns
+        -------
+        List[str]
+            Identifiers of stored documents, in insertion order
+        """
+
+        cursor = self.connection.execute(
+            "SELECT doc_id FROM documents WHERE partition = ? ORDER BY seq",
+            (self.partition,),
+        )
+        return [docId for docId, in cursor]
+
+    def addDocument(self, doc):
+        """
+        Store a document, after all previously stored documents of the
+        partition, in one transaction
+
+        Parameters
+        ----------
+        doc: _Document
+            Fingerprinted document to store
+        """
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO documents (partition, doc_id, seq) "
+                "SELECT ?, ?, COALESCE(MAX(seq), 0) + 1 FROM documents WHERE partition = ?",
+                (self.partition, doc.id, self.partition),
+            )
+            self._insertDocumentData(doc)
+
+    def removeDocument(self, docId):
+        """
+        Remove a stored document, in one transaction
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document to remove
+        """
+
+        with self.connection:
+            self._deleteDocumentData(docId)
+            self.connection.execute(
+                "DELETE FROM documents WHERE partition = ? AND doc_id = ?",
+                (self.partition, docId),
+            )
+
+    def replaceDocument(self, doc):
+        """
+        Replace a stored document by a new version with the same id, keeping
+        its position, in one transaction
+
+        Parameters
+        ----------
+        doc: _Document
+            New version of the document
+        """
+
+        with self.connection:
+            self._deleteDocumentData(doc.id)
+            self._insertDocumentData(doc)
+
+    def _insertDocumentData(self, doc):
+        """Insert fingerprints and sources of a document (in a transaction)"""
+
+        rows = (
+            (
+                self.partition,
+                _hashFingerprint(fingerprint),
+                doc.id,
+                span.start,
+                span.end,
+            )
+            for fingerprint, spans in doc.spansByFingerprint.items()
+            for span in spans
+        )
+        while True:
+            batch = [row for _, row in zip(range(self.batchSize), rows)]
+            if not batch:
+                break
+            self.connection.executemany(
+                "INSERT INTO fingerprints (partition, hash, doc_id, start, end) "
+                "VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+
+        self.connection.executemany(
+            "INSERT INTO duplicated_fingerprints (partition, hash, doc_id) "
+            "VALUES (?, ?, ?)",
+            (
+                (self.partition, _hashFingerprint(fingerprint), doc.id)
+                for fingerprint in doc.duplicatedFingerprints
+            ),
+        )
+        self.connection.executemany(
+            "INSERT INTO sources (partition, doc_id, source_doc_id) VALUES (?, ?, ?)",
+            ((self.partition, doc.id, s) for s in doc.sourceDocIds),
+        )
+
+    def _deleteDocumentData(self, docId):
+        """Delete fingerprints and sources of a document (in a transaction)"""
+
+        for table in ("fingerprints", "duplicated_fingerprints", "sources"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE partition = ? AND doc_id = ?",
+                (self.partition, docId),
+            )
+
+    def getDocuments(self, fingerprints, beforeDocId=None):
+        """
+        Return stored documents having fingerprints in common with a target
+        document, only containing the spans of these fingerprints.
+
+        Parameters
+        ----------
+        fingerprints: Set[str]
+            Fingerprints of the target document
+        beforeDocId: Optional[str]
+            If provided, only documents stored before this one are returned
+
+        Returns
+        -------
+        List[_Document]
+            Stored documents having at least one fingerprint in
+            `fingerprints`, in insertion order
+        """
+
+        fingerprintsByHash = {_hashFingerprint(f): f for f in fingerprints}
+        with self._lookupLock:
+            self._setQueryHashes(fingerprintsByHash)
+            rows = self.connection.execute(
+                "SELECT f.doc_id, f.hash, f.start, f.end "
+                "FROM query_hashes q "
+                "JOIN fingerprints f ON f.hash = q.hash "
+                "JOIN documents d ON d.partition = f.partition AND d.doc_id = f.doc_id "
+                "WHERE f.partition = ? AND d.seq < ? "
+                "ORDER BY d.seq, f.start",
+                (self.partition, self._getSeq(beforeDocId)),
+            ).fetchall()
+
+        docs = []
+        doc = None
+        for docId, hash, start, end in rows:
+            if doc is None or doc.id != docId:
+                doc = _Document(docId, {})
+                docs.append(doc)
+            fingerprint = fingerprintsByHash[hash]
+            doc.spansByFingerprint.setdefault(fingerprint, []).append(Span(start, end))
+        return docs
+
+    def getAffectedDocIds(self, docId, fingerprints):
+        """
+        Return the documents stored after `docId` whose duplicates may change
+        if `docId` is removed or replaced
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the removed or replaced document
+        fingerprints: Optional[Set[str]]
+            Fingerprints of the new version of the document (empty if it is
+            removed). If `None`, all the documents stored after `docId` are
+            considered affected
+
+        Returns
+        -------
+        List[str]
+            Identifiers of the documents stored after `docId` having it as
+            source or having fingerprints in `fingerprints` (including in the
+            spans belonging to their duplicates, which are matched too), in
+            insertion order
+        """
+
+        seq = self._getSeq(docId)
+        if fingerprints is None:
+            cursor = self.connection.execute(
+                "SELECT doc_id FROM documents WHERE partition = ? AND seq > ? "
+                "ORDER BY seq",
+                (self.partition, seq),
+            )
+            return [affectedDocId for affectedDocId, in cursor]
+
+        with self._lookupLock:
+            self._setQueryHashes({_hashFingerprint(f) for f in fingerprints})
+            rows = self.connection.execute(
+                "SELECT d.doc_id FROM documents d "
+                "WHERE d.partition = ? AND d.seq > ? AND ("
+                "  d.doc_id IN (SELECT s.doc_id FROM sources s "
+                "    WHERE s.partition = d.partition AND s.source_doc_id = ?) "
+                "  OR d.doc_id IN (SELECT f.doc_id FROM query_hashes q "
+                "    JOIN fingerprints f ON f.hash = q.hash WHERE f.partition = d.partition)"
+                "  OR d.doc_id IN (SELECT f.doc_id FROM query_hashes q "
+                "    JOIN duplicated_fingerprints f ON f.hash = q.hash "
+                "    WHERE f.partition = d.partition)"
+                ") ORDER BY d.seq",
+                (self.partition, seq, docId),
+            ).fetchall()
+        return [affectedDocId for affectedDocId, in rows]
+
+    def _getSeq(self, docId):
+        """
+        Return the position of a stored document in the partition (after all
+        documents if `docId` is `None`)
+        """
+
+        if docId is None:
+            return float("inf")
+        cursor = self.connection.execute(
+            "SELECT seq FROM documents WHERE partition = ? AND doc_id = ?",
+            (self.partition, docId),
+        )
+        return cursor.fetchone()[0]
+
+    def _setQueryHashes(self, hashes):
+        """Fill the temporary table of hashes to look up"""
+
+        with self.connection:
+            self.connection.execute("DELETE FROM query_hashes")
+            self.connection.executemany(
+                "INSERT INTO query_hashes (hash) VALUES (?)", ((h,) for h in hashes)
+            )
+
+    def close(self):
+        """Close the underlying database connection"""
+
+        self.connection.close()
@@ -0,0 +1,368 @@
+import re
+
+from .duplicate_finder import Duplicate
+from .span import Span
+
+_LINE_REGEXP = re.compile(r"[^\r\n]+")
+
+
+class _TextDocument:
+    """Document stored by a `SuffixArrayEngine`"""
+
+    def __init__(self, id, segments, sourceDocIds=(), offsetMap=None):
+        """
+        Parameters
+        ----------
+        id: str
+            Identifier of the document
+        segments: List[Tuple[int, str]]
+            Parts of the document text that can be used as sources for upcoming
+            documents, along with their position in the full document text.
+            Parts of the text that were themselves duplicated from older
+            documents are left out
+        sourceDocIds: Iterable[str]
+            Identifiers of the documents used as sources by the duplicates of
+            the document
+        offsetMap: Optional[OffsetMap]
+            If the document was normalized, mapping of positions to the
+            original text (cf `_Document`)
+        """
+
+        self.id = id
+        self.segments = segments
+        self.sourceDocIds = frozenset(sourceDocIds)
+        self.offsetMap = offsetMap
+
+
+class SuffixArrayEngine:
+    """
+    Matching engine for `DuplicateFinder` relying on a suffix array instead of
+    fingerprints.
+
+    When a new document is processed, a generalized suffix array is built over
+    the text of the new document and the texts of all previously seen
+    documents. Suffixes of the new document and of previous documents that are
+    next to each other in the suffix array share a common prefix, and all
+    maximal common sequences of consecutive chars at least `minDuplicateLength`
+    long can be found by scanning the array along with its longest common
+    prefix (LCP) array.
+
+    Compared to fingerprinting, there is no trade-off between speed and
+    the length of the shortest duplicates that can be detected, and only the
+    non-duplicated text of previous documents needs to be stored rather than one
+    fingerprint per position. On the other hand, the suffix array is rebuilt
+    over the whole history (the non-duplicated text of all previous documents)
+    for each new document, in O(n log(n)^2) where n is the length of the
+    history, so this engine is only suited for short documents and small
+    histories.
+
+    The duplicates found are the same as the ones that would be found with a
+    `CharFingerprintBuilder` having a fingerprint length of 1.
+    """
+
+    def __init__(self, caseSensitive=True, allowMultiline=True):
+        """
+        Parameters
+        ----------
+        caseSensitive: bool
+            If False, texts will be converted to lowercase, thus making
+            duplicate detection case-insensitive
+        allowMultiline: bool
+            Whether duplicates can span over multiple lines. Set to False
+            to prevent multiline duplicates
+        """
+
+        self.caseSensitive = caseSensitive
+        self.allowMultiline = allowMultiline
+
+    def buildDocument(self, docId, docText, duplicates):
+        """
+        Build the document to store for `docText`, leaving out the parts
+        that were duplicated from previous documents.
+
+        Parameters
+        ----------
+        docId: str
+            Identifier of the document
+        docText: str
+            Text of the document
+        duplicates: List[Duplicate]
+            Non-overlapping duplicates found in the document
+
+        Returns
+        -------
+        _TextDocument
+            Document that can be passed to `buildDuplicates()` as source
+        """
+
+        segments = []
+        start = 0
+        for duplicate in sorted(duplicates, key=lambda d: d.targetSpan.start):
+            segments.extend(
+                self._buildSegments(docText, start, duplicate.targetSpan.start)
+            )
+            start = max(start, duplicate.targetSpan.end)
+        segments.extend(self._buildSegments(docText, start, len(docText)))
+        return _TextDocument(docId, segments, {d.sourceDocId for d in duplicates})
+
+    def buildDuplicates(self, docText, sourceDocs, minDuplicateLength):
+        """
+        Find all maximal common parts between `docText` and source documents.
+
+        Parameters
+        ----------
+        docText: str
+            Text of the target document
+        sourceDocs: List[_TextDocument]
+            Documents to be used as sources, as returned by `buildDocument()`
+        minDuplicateLength: int
+            Minimum number of characters in duplicates
+
+        Returns
+        -------
+        Dict[str, List[Duplicate]]
+            Possibly overlapping duplicates, by source document id
+        """
+
+        # concatenate the target segments and the segments of all source docs
+        # into one sequence of ints, separated by unique sentinels. For each
+        # position, we remember to which document it belongs (-1 for the
+        # target, -2 for sentinels) and its position in the document text
+        segmentsByDoc = [self._buildSegments(docText, 0, len(docText))]
+        segmentsByDoc += [d.segments for d in sourceDocs]
+        sequence = []
+        owners = []
+        positions = []
+        nextSentinel = 0x110000
+        for owner, segments in enumerate(segmentsByDoc, start=-1):
+            for segmentStart, segment in segments:
+                sequence.extend(map(ord, segment))
+                owners.extend([owner] * len(segment))
+                positions.extend(range(segmentStart, segmentStart + len(segment)))
+                sequence.append(nextSentinel)
+                owners.append(-2)
+                positions.append(-1)
+                nextSentinel += 1
+
+        suffixArray = _buildSuffixArray(sequence)
+        lcps = _buildLcpArray(sequence, suffixArray)
+
+        duplicatesBySourceId = {}
+        nbSuffixes = len(suffixArray)
+        groupStart = 0
+        # process groups of consecutive suffixes sharing at least
+        # minDuplicateLength chars
+        while groupStart < nbSuffixes:
+            groupEnd = groupStart + 1
+            while groupEnd < nbSuffixes and lcps[groupEnd] >= minDuplicateLength:
+                groupEnd += 1
+            if groupEnd - groupStart > 1:
+                self._addGroupDuplicates(
+                    groupStart,
+                    groupEnd,
+                    suffixArray,
+                    lcps,
+                    sequence,
+                    owners,
+                    positions,
+                    sourceDocs,
+                    duplicatesBySourceId,
+                )
+            groupStart = groupEnd
+
+        for duplicates in duplicatesBySourceId.values():
+            duplicates.sort(key=lambda d: (d.targetSpan.start, d.sourceSpan.start))
+        return duplicatesBySourceId
+
+    def _addGroupDuplicates(
+        self,
+        groupStart,
+        groupEnd,
+        suffixArray,
+        lcps,
+        sequence,
+        owners,
+        positions,
+        sourceDocs,
+        duplicatesBySourceId,
+    ):
+        """
+        Create duplicates for all pairs of target and source suffixes in a
+        group of consecutive suffixes of the suffix array.
+
+        The group is traversed bottom-up as a tree of LCP intervals (with a
+        stack), so that each pair of suffixes is only considered in the
+        smallest interval containing both of them, whose LCP is the length of
+        the duplicate. Only left-maximal pairs (whose previous chars differ)
+        are kept, others are contained in a longer duplicate starting before.
+        Suffixes are grouped by previous char in each interval, so that pairs
+        that aren't left-maximal are skipped without being enumerated.
+        """
+
+        def buildLeaf(rank):
+            index = suffixArray[rank]
+            owner = owners[index]
+            # (there is always a sentinel before the 1st char of a source
+            # segment so index can't be 0 for sources)
+            previous = sequence[index - 1] if index > 0 else None
+            if owner == -1:
+                return [1, {previous: [index]}, {}]
+            if owner >= 0:
+                return [1, {}, {previous: [index]}]
+            return [0, {}, {}]
+
+        def addDuplicates(targetsByPrevious, sourcesByPrevious, length):
+            for targetPrevious, targetIndices in targetsByPrevious.items():
+                for sourcePrevious, sourceIndices in sourcesByPrevious.items():
+                    if sourcePrevious == targetPrevious:
+                        continue
+                    for targetIndex in targetIndices:
+                        targetStart = positions[targetIndex]
+                        targetSpan = Span(
+                            targetStart, targetStart + length, length=length
+                        )
+                        for sourceIndex in sourceIndices:
+                            sourceDocId = sourceDocs[owners[sourceIndex]].id
+                            sourceStart = positions[sourceIndex]
+                            duplicate = Duplicate(
+                                sourceDocId,
+                                Span(sourceStart, sourceStart + length, length=length),
+                                targetSpan,
+                            )
+                            duplicatesBySourceId.setdefault(sourceDocId, []).append(
+                                duplicate
+                            )
+
+        def merge(node, otherNode, length):
+            """
+            Create duplicates between the suffixes of 2 nodes whose common
+            prefix is `length` chars long, and merge them into one node
+            """
+
+            addDuplicates(node[1], otherNode[2], length)
+            addDuplicates(otherNode[1], node[2], length)
+            # merge the smallest node into the biggest one
+            if node[0] < otherNode[0]:
+                node, otherNode = otherNode, node
+            node[0] += otherNode[0]
+            for byPrevious, otherByPrevious in zip(node[1:], otherNode[1:]):
+                for previous, indices in otherByPrevious.items():
+                    byPrevious.setdefault(previous, []).extend(indices)
+            return node
+
+        # open LCP intervals, as (lcp, node) pairs with increasing lcps
+        stack = []
+        for rank in range(groupStart, groupEnd):
+            node = buildLeaf(rank)
+            # LCP with the next suffix (lower than all LCPs of the group after
+            # the last suffix, so that all intervals are closed)
+            nextLcp = lcps[rank + 1] if rank + 1 < groupEnd else -1
+            while stack and stack[-1][0] > nextLcp:
+                lcp, previousNode = stack.pop()
+                node = merge(previousNode, node, lcp)
+            if stack and stack[-1][0] == nextLcp:
+                stack[-1][1] = merge(stack[-1][1], node, nextLcp)
+            elif nextLcp >= 0:
+                stack.append([nextLcp, node])
+
+    def _buildSegments(self, docText, start, end):
+        """
+        Return the parts of `docText` between `start` and `end` to use for
+        matching, along with their positions
+        """
+
+        if start >= end:
+            return []
+
+        text = docText[start:end]
+        if not self.caseSensitive:
+            text = text.lower()
+
+        if self.allowMultiline:
+            return [(start, text)]
+
+        return [
+            (start + match.start(), match.group())
+            for match in _LINE_REGEXP.finditer(text)
+        ]
+
+
+def _buildSuffixArray(sequence):
+    """
+    Build the suffix array of `sequence` by prefix doubling, in
+    O(n log(n) log(m)) where m is the length of the longest repeat
+
+    Parameters
+    ----------
+    sequence: List[int]
+        Sequence of ints. Must end with a value that is unique in the sequence
+
+    Returns
+    -------
+    List[int]
+        Start indices of all suffixes of `sequence`, sorted by suffix
+    """
+
+    nbItems = len(sequence)
+    suffixArray = sorted(range(nbItems), key=sequence.__getitem__)
+
+    # rank of each suffix considering only its 1st char
+    ranks = [0] * nbItems
+    for i in range(1, nbItems):
+        previous, current = suffixArray[i - 1], suffixArray[i]
+        ranks[current] = ranks[previous] + (sequence[current] != sequence[previous])
+
+    length = 1
+    while nbItems and ranks[suffixArray[-1]] < nbItems - 1:
+        # sort suffixes by their 2 * length 1st chars, using the ranks of their
+        # 2 halves
+        keys = [
+            ranks[i] * (nbItems + 1)
+            + (ranks[i + length] + 1 if i + length < nbItems else 0)
+            for i in range(nbItems)
+        ]
+        suffixArray.sort(key=keys.__getitem__)
+        for i in range(1, nbItems):
+            previous, current = suffixArray[i - 1], suffixArray[i]
+            ranks[current] = ranks[previous] + (keys[current] != keys[previous])
+        length *= 2
+
+    return suffixArray
+
+
+def _buildLcpArray(sequence, suffixArray):
+    """
+    Build the longest common prefix array of `suffixArray` with Kasai's
+    algorithm
+
+    Returns
+    -------
+    List[int]
+        For each position in `suffixArray`, length of the common prefix of the
+        suffix and of the previous suffix in the array (0 for the 1st suffix)
+    """
+
+    nbItems = len(sequence)
+    ranks = [0] * nbItems
+    for rank, i in enumerate(suffixArray):
+        ranks[i] = rank
+
+    lcps = [0] * nbItems
+    length = 0
+    for i in range(nbItems):
+        rank = ranks[i]
+        if rank == 0:
+            length = 0
+            continue
+        j = suffixArray[rank - 1]
+        while (
+            i + length < nbItems
+            and j + length < nbItems
+            and sequence[i + length] == sequence[j + length]
+        ):
+            length += 1
+        lcps[rank] = length
+        if length > 0:
+            length -= 1
+
+    return lcps
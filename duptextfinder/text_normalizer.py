@@ -0,0 +1,152 @@
+from array import array
+from bisect import bisect_right
+import unicodedata
+
+from .span import Span
+
+
+class OffsetMap:
+    """
+    Mapping of the character positions of a normalized text to the positions
+    of the original text, as returned by `TextNormalizer.normalize()`.
+
+    Only the positions at which the offset between the 2 texts changes are
+    stored, so the map stays small when few characters are removed or
+    replaced.
+    """
+
+    def __init__(self, normalizedStarts, originalStarts, originalLength):
+        """
+        Parameters
+        ----------
+        normalizedStarts: array
+            Positions in the normalized text at which the offset changes,
+            sorted. The 1st one must be 0
+        originalStarts: array
+            Corresponding positions in the original text
+        originalLength: int
+            Length of the original text
+        """
+
+        self.normalizedStarts = normalizedStarts
+        self.originalStarts = originalStarts
+        self.originalLength = originalLength
+
+    def toOriginal(self, position):
+        """
+        Return the position in the original text of the character at
+        `position` in the normalized text
+        """
+
+        i = bisect_right(self.normalizedStarts, position) - 1
+        return self.originalStarts[i] + position - self.normalizedStarts[i]
+
+    def toOriginalSpan(self, span):
+        """
+        Return the span of the original text corresponding to `span` of the
+        normalized text (from the original position of its 1st character to
+        the original position of its last character, included)
+        """
+
+        return Span(self.toOriginal(span.start), self.toOriginal(span.end - 1) + 1)
+
+
+class TextNormalizer:
+    """
+    Normalizes texts before fingerprinting, so that duplicates are found
+    regardless of differences in whitespace, accents or punctuation, and so
+    that there are fewer characters to fingerprint.
+
+    To be passed to `DuplicateFinder`, which takes care of mapping the spans
+    of duplicates back to the original texts.
+    """
+
+    def __init__(
+        self, collapseWhitespace=True, foldAccents=False, stripPunctuation=False
+    ):
+        """
+        Parameters
+        ----------
+        collapseWhitespace: bool
+            Whether to replace runs of whitespace characters by a single space
+            (or by a single newline if the run contains a newline, so that line
+            structure is kept)
+        foldAccents: bool
+            Whether to remove accents and other diacritics ("é" becomes "e")
+        stripPunctuation: bool
+            Whether to remove punctuation characters
+        """
+
+        self.collapseWhitespace = collapseWhitespace
+        self.foldAccents = foldAccents
+        self.stripPunctuation = stripPunctuation
+
+    def normalize(self, text):
+        """
+        Normalize a text
+
+        Parameters
+        ----------
+        text: str
+            Text to normalize
+
+        Returns
+        -------
+        Tuple[str, OffsetMap]
+            Normalized text and mapping of its character positions to the
+            positions of `text`
+        """
+
+        chars = []
+        normalizedStarts = array("q", [0])
+        originalStarts = array("q", [0])
+        # start of the run of whitespace being collapsed, if any
+        whitespaceStart = None
+
+        def append(normalizedChars, originalPosition):
+            # only store positions at which the offset changes
+            normalizedPosition = len(chars)
+            if (
+                originalPosition - originalStarts[-1]
+                != normalizedPosition - normalizedStarts[-1]
+            ):
+                if normalizedStarts[-1] == normalizedPosition:
+                    originalStarts[-1] = originalPosition
+                else:
+                    normalizedStarts.append(normalizedPosition)
+                    originalStarts.append(originalPosition)
+            chars.extend(normalizedChars)
+            # extra chars (from decompositions) map to the same position
+            for i in range(1, len(normalizedChars)):
+                normalizedStarts.append(normalizedPosition + i)
+                originalStarts.append(originalPosition)
+
+        for position, char in enumerate(text):
+            if self.collapseWhitespace and char.isspace():
+                if whitespaceStart is None:
+                    whitespaceStart = position
+                continue
+            if whitespaceStart is not None:
+                run = text[whitespaceStart:position]
+                append("\n" if "\n" in run else " ", whitespaceStart)
+                whitespaceStart = None
+
+            if self.stripPunctuation and unicodedata.category(char).startswith("P"):
+                continue
+            if self.foldAccents and not char.isascii():
+                folded = "".join(
+                    c
+                    for c in unicodedata.normalize("NFKD", char)
+                    if not unicodedata.combining(c)
+                )
+                if folded != char:
+                    if folded:
+                        append(folded, position)
+                    continue
+            append(char, position)
+
+        if whitespaceStart is not None:
+            run = text[whitespaceStart:]
+            append("\n" if "\n" in run else " ", whitespaceStart)
+
+        return "".join(chars), OffsetMap(normalizedStarts, originalStarts, len(text))
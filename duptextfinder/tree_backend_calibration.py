@@ -0,0 +1,257 @@
+import json
+import os
+from pathlib import Path
+import random
+import time
+
+from .span import Span
+
+# file in which thresholds are saved by `calibrateTreeBackends()`, unless
+# overridden by this environment variable
+_CONFIG_PATH_ENV_VAR = "DUPTEXTFINDER_TREE_BACKENDS"
+_DEFAULT_CONFIG_PATH = Path.home() / ".config" / "duptextfinder" / "tree_backends.json"
+_CONFIG_VERSION = 1
+
+# operations for which a backend is selected with TreeBackend.AUTO, and what
+# their input size is:
+# - removal of overlapping duplicates: number of duplicates
+# - blacklisting of spans belonging to duplicates: number of spans times number
+#   of duplicates
+REMOVE_OVERLAPPING_DUPLICATES = "removeOverlappingDuplicates"
+FIND_SPANS_BELONGING_TO_DUPLICATES = "findSpansBelongingToDuplicates"
+
+# thresholds used when no calibration was run: trees only pay off for
+# documents with many duplicates (backends that are not installed are skipped)
+_DEFAULT_THRESHOLDS = {
+    REMOVE_OVERLAPPING_DUPLICATES: [(0, "NONE"), (200, "NCLS")],
+    FIND_SPANS_BELONGING_TO_DUPLICATES: [(0, "NONE"), (100_000, "NCLS")],
+}
+
+# length of the synthetic fingerprint spans used for calibration
+_SPAN_LENGTH = 15
+# backends this many times slower than the fastest one for a size are not timed
+# for bigger sizes (they would only get slower)
+_MAX_SLOWDOWN = 10
+
+
+def getTreeBackendsConfigPath():
+    """
+    Return the path of the file in which tree backend thresholds are saved
+
+    Returns
+    -------
+    Path
+        Value of the DUPTEXTFINDER_TREE_BACKENDS environment variable if set,
+        ~/.config/duptextfinder/tree_backends.json otherwise
+    """
+
+    path = os.environ.get(_CONFIG_PATH_ENV_VAR)
+    return _DEFAULT_CONFIG_PATH if path is None else Path(path)
+
+
+def loadTreeBackendThresholds(path=None):
+    """
+    Load the thresholds used to select tree backends with `TreeBackend.AUTO`
+
+    Parameters
+    ----------
+    path: Optional[Union[str, Path]]
+        Config file saved by `calibrateTreeBackends()`. If `None` provided,
+        `getTreeBackendsConfigPath()` is used
+
+    Returns
+    -------
+    Dict[str, List[Tuple[int, str]]]
+        For each operation, minimum input sizes from which each backend should
+        be used, sorted by ascending size. Default thresholds are returned if
+        the file doesn't exist
+    """
+
+    if path is None:
+        path = getTreeBackendsConfigPath()
+    try:
+        with open(path) as fp:
+            config = json.load(fp)
+    except FileNotFoundError:
+        return dict(_DEFAULT_THRESHOLDS)
+
+    if config.get("version") != _CONFIG_VERSION:
+        raise Exception(f"Unsupported tree backends config version in {path}")
+    return {
+        operation: [
+            (minSize, backendName)
+            for minSize, backendName in config.get(operation, defaultThresholds)
+        ]
+        for operation, defaultThresholds in _DEFAULT_THRESHOLDS.items()
+    }
+
+
+def calibrateTreeBackends(
+    path=None, nbsDuplicates=(4, 16, 64, 256, 1024), nbRepeats=3, seed=0
+):
+    """
+    Time the available tree backends on synthetic documents of increasing
+    sizes and save the sizes from which each backend is the fastest, to be used
+    by duplicate finders with `TreeBackend.AUTO`.
+
+    Should be run once on the machine processing documents.
+
+    Parameters
+    ----------
+    path: Optional[Union[str, Path]]
+        File in which to save the thresholds. If `None` provided,
+        `getTreeBackendsConfigPath()` is used
+    nbsDuplicates: Sequence[int]
+        Numbers of duplicates per synthetic document to time backends with
+    nbRepeats: int
+        Number of times each backend is timed for each size (the fastest time
+        is kept)
+    seed: int
+        Seed of the generation of synthetic documents
+
+    Returns
+    -------
+    Dict[str, List[Tuple[int, str]]]
+        Thresholds that were saved (cf `loadTreeBackendThresholds()`)
+    """
+
+    from .duplicate_finder import (
+        TreeBackend,
+        _findSpansBelongingToDuplicates,
+        _isTreeBackendAvailable,
+        _getTreeBackendThresholds,
+        _removeOverlappingDuplicates,
+    )
+
+    treeBackends = [
+        b
+        for b in TreeBackend
+        if b is not TreeBackend.AUTO and _isTreeBackendAvailable(b)
+    ]
+
+    timingsByOperation = {
+        REMOVE_OVERLAPPING_DUPLICATES: [],
+        FIND_SPANS_BELONGING_TO_DUPLICATES: [],
+    }
+    treeBackendsByOperation = {
+        operation: list(treeBackends) for operation in timingsByOperation
+    }
+    for nbDuplicates in sorted(nbsDuplicates):
+        rng = random.Random(seed)
+        duplicates, spans = _buildSyntheticDocument(nbDuplicates, rng)
+        functionsByOperation = {
+            # removal mutates the list of duplicates it is given
+            REMOVE_OVERLAPPING_DUPLICATES: lambda treeBackend: (
+                _removeOverlappingDuplicates(
+                    list(duplicates), _SPAN_LENGTH, treeBackend
+                )
+            ),
+            FIND_SPANS_BELONGING_TO_DUPLICATES: lambda treeBackend: (
+                _findSpansBelongingToDuplicates(spans, duplicates, treeBackend)
+            ),
+        }
+        sizesByOperation = {
+            REMOVE_OVERLAPPING_DUPLICATES: nbDuplicates,
+            FIND_SPANS_BELONGING_TO_DUPLICATES: len(spans) * nbDuplicates,
+        }
+
+        for operation, function in functionsByOperation.items():
+            timings = {
+                treeBackend.value: _time(lambda: function(treeBackend), nbRepeats)
+                for treeBackend in treeBackendsByOperation[operation]
+            }
+            timingsByOperation[operation].append((sizesByOperation[operation], timings))
+            fastestTime = min(timings.values())
+            treeBackendsByOperation[operation] = [
+                b
+                for b in treeBackendsByOperation[operation]
+                if timings[b.value] <= _MAX_SLOWDOWN * fastestTime
+            ]
+
+    thresholds = {
+        operation: _getThresholds(timings)
+        for operation, timings in timingsByOperation.items()
+    }
+
+    if path is None:
+        path = getTreeBackendsConfigPath()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as fp:
+        json.dump({"version": _CONFIG_VERSION, **thresholds}, fp, indent=2)
+    # make sure new thresholds are used by this process
+    _getTreeBackendThresholds.cache_clear()
+
+    return thresholds
+
+
+def _buildSyntheticDocument(nbDuplicates, rng):
+    """
+    Build a random document with `nbDuplicates` possibly overlapping duplicates
+    and its fingerprinted spans, similar to what `DuplicateFinder` deals with
+
+    Returns
+    -------
+    Tuple[List[Duplicate], List[Span]]
+        Duplicates (sorted by target span) and spans of the document
+    """
+
+    from .duplicate_finder import Duplicate
+
+    # duplicates are 20 to 200 chars long and cover about half of the document
+    docLength = nbDuplicates * 200
+    duplicates = []
+    for _ in range(nbDuplicates):
+        length = rng.randint(20, 200)
+        targetStart = rng.randrange(docLength - length)
+        sourceStart = rng.randrange(docLength)
+        duplicates.append(
+            Duplicate(
+                "D0",
+                Span(sourceStart, sourceStart + length),
+                Span(targetStart, targetStart + length),
+            )
+        )
+    duplicates.sort(key=lambda d: d.targetSpan.start)
+    spans = [Span(i, i + _SPAN_LENGTH) for i in range(docLength - _SPAN_LENGTH + 1)]
+    return duplicates, spans
+
+
+def _time(function, nbRepeats):
+    """Return the fastest time out of `nbRepeats` calls of `function`"""
+
+    bestTime = None
+    for _ in range(nbRepeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if bestTime is None or elapsed < bestTime:
+            bestTime = elapsed
+    return bestTime
+
+
+def _getThresholds(timings):
+    """
+    Turn timings of backends into the sizes from which each backend is the
+    fastest
+
+    Parameters
+    ----------
+    timings: List[Tuple[int, Dict[str, float]]]
+        Time taken by each backend, for increasing sizes
+
+    Returns
+    -------
+    List[Tuple[int, str]]
+        Minimum size from which to use each backend, sorted by ascending size.
+        The 1st size is always 0
+    """
+
+    thresholds = []
+    for size, timingsByBackend in timings:
+        fastestBackend = min(timingsByBackend, key=timingsByBackend.get)
+        if not thresholds:
+            thresholds.append((0, fastestBackend))
+        elif fastestBackend != thresholds[-1][1]:
+            thresholds.append((size, fastestBackend))
+    return thresholds
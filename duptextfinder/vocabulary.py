@@ -0,0 +1,64 @@
+import hashlib
+
+
+class Vocabulary:
+    """
+    Cache of the integer ids of tokens (words, separators between words, etc),
+    that can be shared between fingerprint builders.
+
+    Ids are derived from a stable hash of tokens (not from the order in which
+    tokens are seen), so a same token always gets the same id, including in
+    other processes. Integer fingerprints can therefore be stored in persistent
+    indexes (such as `SqliteFingerprintIndex`) or shared with worker processes
+    (such as with `SharedMemoryIndex`) without having to save the vocabulary.
+    Ids are 64-bit, so collisions are unlikely enough to be ignored.
+
+    The cache grows with each new token. Since ids can always be recomputed,
+    it is simply emptied when it reaches `maxSize` tokens, if provided.
+    """
+
+    # default for vocabularies pickled before maxSize existed
+    maxSize = None
+
+    def __init__(self, maxSize=None):
+        """
+        Parameters
+        ----------
+        maxSize: Optional[int]
+            Maximum number of tokens to keep in the cache. `None` means no
+            limit, which is fine as long as the set of distinct tokens is
+            bounded (words of a language, separators, etc) but not for texts
+            containing many unique tokens (numbers, identifiers, etc)
+        """
+
+        self.maxSize = maxSize
+        self.idsByToken = dict()
+
+    def __len__(self):
+        return len(self.idsByToken)
+
+    def getId(self, token):
+        """
+        Return the id of `token`
+
+        Parameters
+        ----------
+        token: str
+            Token for which to get an id
+
+        Returns
+        -------
+        int
+            Id of the token, between 0 and 2**64 - 1
+        """
+
+        id = self.idsByToken.get(token)
+        if id is None:
+            digest = hashlib.blake2b(
+                token.encode("utf-8", "surrogatepass"), digest_size=8
+            ).digest()
+            id = int.from_bytes(digest, "big")
+            if self.maxSize is not None and len(self.idsByToken) >= self.maxSize:
+                self.idsByToken.clear()
+            self.idsByToken[token] = id
+        return id
@@ -1,3 +1,4 @@
+import itertools
 import re
 import warnings
 
@@ -5,6 +6,12 @@ from .span import Span
 
 _DEFAULT_WORD_REGEXP = re.compile(r"[\w\d]+")
 _LINE_REGEXP = re.compile(r"[^\r\n]+")
+# number of words read at once from texts
+_CHUNK_SIZE = 1024
+
+# parameters of the polynomial hash of token ids
+_HASH_MODULUS = 2**61 - 1
+_HASH_BASE = 1_000_000_007
 
 
 class WordFingerprintBuilder:
@@ -69,6 +76,22 @@ class WordFingerprintBuilder:
     between words wouldn't be fingerprinted at all. The fingerprints wouldn't be
     adjacent, there would be gaps and because of the gaps we wouldn't be able to
     find duplicates going across several words.
+
+    When a `Vocabulary` is provided, fingerprints are ints instead of strings:
+    each word and each sequence of non-word chars between 2 words is mapped to
+    an integer id, and fingerprints are polynomial hashes of the ids of the
+    words and separators they contain. Hashes are computed from prefix hashes,
+    so each fingerprint costs the same whatever the length of its words, and no
+    substring spanning several tokens is created (each token is only sliced
+    once, to be looked up in the vocabulary). Hash collisions are unlikely
+    enough to be ignored.
+
+    Integer fingerprints take less memory than substrings (in the history of
+    `DuplicateFinder` and in persistent indexes), but building them is about
+    twice as slow as building substring fingerprints, since each word and
+    separator is looked up in the vocabulary. Ids being derived from a stable
+    hash of tokens (cf `Vocabulary`), fingerprints are the same in all
+    processes, so they can be stored in persistent or shared indexes.
     """
 
     def __init__(
@@ -78,6 +101,7 @@ class WordFingerprintBuilder:
         wordRegexp=_DEFAULT_WORD_REGEXP,
         caseSensitive=True,
         allowMultiline=True,
+        vocabulary=None,
     ):
         """
         Parameters
@@ -111,6 +135,11 @@ class WordFingerprintBuilder:
         allowMultiline: bool
             Whether fingerprints can span over multiple lines. Set to False
             to prevent multiline duplicates
+        vocabulary: Optional[Vocabulary]
+            Vocabulary to use to build integer fingerprints. If `None`,
+            fingerprints will be substrings of the text. A same vocabulary can
+            be shared by all builders of a process to avoid hashing the same
+            tokens several times
         """
 
         if fingerprintLength < 2:
@@ -127,6 +156,7 @@ class WordFingerprintBuilder:
         self.wordRegexp = wordRegexp
         self.caseSensitive = caseSensitive
         self.allowMultiline = allowMultiline
+        self.vocabulary = vocabulary
 
     def buildFingerprints(self, text):
         """
@@ -140,33 +170,51 @@ class WordFingerprintBuilder:
 
         Returns
         -------
-        List[Tuple[Span, str]]
+        List[Tuple[Span, Union[str, int]]]
             List of fingerprints contained in `text` and their corresponding
-            characters spans, sorted by ascending span
+            characters spans, sorted by ascending span. Fingerprints are ints
+            if a vocabulary is used
+        """
+
+        return list(self.iterFingerprints(text))
+
+    def iterFingerprints(self, text):
+        """
+        Same as `buildFingerprints()` but yield fingerprints one by one, so
+        that they don't have to be all kept in memory for long texts.
+
+        Parameters
+        ----------
+        text: str
+            Text for which to build the fingerprints
+
+        Returns
+        -------
+        Iterator[Tuple[Span, Union[str, int]]]
+            Iterator over fingerprints contained in `text` and their
+            corresponding characters spans, sorted by ascending span
         """
 
         if not self.caseSensitive:
             text = text.lower()
 
         if self.allowMultiline:
-            return list(self._buildFingerprints(text, 0))
+            yield from self._buildFingerprints(text, 0)
+            return
 
         # build fingerprints line by line if multiline fingerprints aren't
         # allowed
-        spansAndFingerprints = []
         for match in _LINE_REGEXP.finditer(text):
-            lineStart = match.start()
-            line = match.group()
-            spansAndFingerprintsForLine = self._buildFingerprints(line, lineStart)
-            spansAndFingerprints.extend(spansAndFingerprintsForLine)
-
-        return spansAndFingerprints
+            yield from self._buildFingerprints(match.group(), match.start())
 
     def _buildFingerprints(self, text, textStart=0):
         """
         Yield fingerprints and character spans in which they are found in
         `text`, using `textStart` to offset the spans.
 
+        Words are read by chunks, and only the words that can be part of
+        upcoming fingerprints are kept.
+
         Parameters
         ----------
         text: str
@@ -177,39 +225,124 @@ class WordFingerprintBuilder:
 
         Returns
         -------
-        Iterator[Tuple[Span, str]]
+        Iterator[Tuple[Span, Union[str, int]]]
             Iterator over fingerprints contained in `text` and their
             corresponding characters spans, sorted by ascending span
         """
 
-        # get start/end boundaries of all words using regexp
-        wordSpans = [match.span() for match in self.wordRegexp.finditer(text)]
-        nbWords = len(wordSpans)
-        if nbWords == 0:
-            return
-
-        # build fingerprints for consecutive words
-        fingerprintLength = min(self.fingerprintLength, nbWords)
-
+        fingerprintLength = self.fingerprintLength
+        if self.vocabulary is not None:
+            # all fingerprints except the tail contain the same number of
+            # tokens (words and separators)
+            fullBasePower = pow(_HASH_BASE, 2 * fingerprintLength - 1, _HASH_MODULUS)
+
+        words = self.wordRegexp.finditer(text)
+        # start/end boundaries of words that can still be part of fingerprints
+        # (wordSpans[0] is the word at index wordOffset in the text)
+        wordSpans = []
+        wordOffset = 0
+        # index of the 1st word of the next fingerprint
+        wordStart = 0
+        # index following the last word of the last fingerprint
         wordEnd = 0
-        for wordStart in range(0, nbWords - self.fingerprintLength + 1, self.orf):
-            # take start of current word
-            start, _ = wordSpans[wordStart]
-            # take end of last word to include in fingerprint
-            wordEnd = wordStart + fingerprintLength
-            _, end = wordSpans[wordEnd - 1]
-
-            fingerprint = text[start:end]
-            span = Span(textStart + start, textStart + end)
-            assert span.length == len(fingerprint)
-            yield span, fingerprint
+
+        while True:
+            newWordSpans = [m.span() for m in itertools.islice(words, _CHUNK_SIZE)]
+            wordSpans += newWordSpans
+            nbWords = wordOffset + len(wordSpans)
+            if self.vocabulary is not None:
+                prefixHashes = self._buildPrefixHashes(text, wordSpans)
+
+            # build fingerprints for consecutive words
+            while wordStart + fingerprintLength <= nbWords:
+                wordEnd = wordStart + fingerprintLength
+                # indices in wordSpans
+                first = wordStart - wordOffset
+                last = wordEnd - wordOffset
+                # take start of current word and end of last word to include
+                # in fingerprint
+                start, _ = wordSpans[first]
+                _, end = wordSpans[last - 1]
+
+                span = Span(textStart + start, textStart + end)
+                if self.vocabulary is not None:
+                    fingerprint = (
+                        prefixHashes[2 * last - 1]
+                        - prefixHashes[2 * first] * fullBasePower
+                    ) % _HASH_MODULUS
+                else:
+                    fingerprint = text[start:end]
+                    assert span.length == len(fingerprint)
+                yield span, fingerprint
+                wordStart += self.orf
+
+            if len(newWordSpans) < _CHUNK_SIZE:
+                break
+
+            # forget words that won't be part of upcoming fingerprints (nor of
+            # the tail)
+            nbForgottenWords = min(wordStart, wordEnd) - wordOffset
+            del wordSpans[:nbForgottenWords]
+            wordOffset += nbForgottenWords
 
         # when nbWords is not a multiple of fingerprintLength, we have to handle
         # the tail
         if wordEnd != nbWords:
-            wordStart = wordEnd
-            start, _ = wordSpans[wordStart]
+            first = wordEnd - wordOffset
+            last = nbWords - wordOffset
+            start, _ = wordSpans[first]
             _, end = wordSpans[-1]
-            fingerprint = text[start:end]
+            if self.vocabulary is not None:
+                basePower = pow(_HASH_BASE, 2 * (last - first) - 1, _HASH_MODULUS)
+                fingerprint = (
+                    prefixHashes[2 * last - 1] - prefixHashes[2 * first] * basePower
+                ) % _HASH_MODULUS
+            else:
+                fingerprint = text[start:end]
             span = Span(textStart + start, textStart + end)
             yield span, fingerprint
+
+    def _buildPrefixHashes(self, text, wordSpans):
+        """
+        Map the words of `text` and the separators between them to ids, and
+        compute the hashes of all prefixes of the resulting sequence of ids.
+
+        The sequence of ids alternates words and separators, so the words from
+        i to j (excluded) correspond to the ids from 2i to 2j - 1 (excluded),
+        and their hash can be derived from the prefix hashes in constant time.
+
+        Parameters
+        ----------
+        text: str
+            Text containing the words
+        wordSpans: List[Tuple[int, int]]
+            Start and end of each word in `text`
+
+        Returns
+        -------
+        List[int]
+            Hashes of all prefixes of the sequence of ids, starting with the
+            empty prefix
+        """
+
+        # look up ids directly in the vocabulary, only calling getId() for new
+        # tokens, which is much faster
+        getId = self.vocabulary.getId
+        idsByToken = self.vocabulary.idsByToken
+        tokens = []
+        previousEnd = None
+        for start, end in wordSpans:
+            if previousEnd is not None:
+                tokens.append(text[previousEnd:start])
+            tokens.append(text[start:end])
+            previousEnd = end
+
+        prefixHashes = [0]
+        hash = 0
+        for token in tokens:
+            id = idsByToken.get(token)
+            if id is None:
+                id = getId(token)
+            hash = (hash * _HASH_BASE + id + 1) % _HASH_MODULUS
+            prefixHashes.append(hash)
+        return prefixHashes
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from duptextfinder import CharFingerprintBuilder, WordFingerprintBuilder
+
+TEST_CASES_DIR = Path(__file__).parent / "test_cases"
+TEST_CASES_FILES = sorted(TEST_CASES_DIR.glob("*.json"))
+
+
+def getDuplicatesData(duplicates):
+    """Return comparable (sourceDocId, sourceStart, sourceEnd, targetStart,
+    targetEnd) tuples"""
+
+    return [
+        (
+            d.sourceDocId,
+            d.sourceSpan.start,
+            d.sourceSpan.end,
+            d.targetSpan.start,
+            d.targetSpan.end,
+        )
+        for d in duplicates
+    ]
+
+
+def buildFingerprintBuilder(settings):
+    """Return the fingerprint builder described by the settings of a test case"""
+
+    if settings["fingerprint_type"] == "char":
+        return CharFingerprintBuilder(settings["fingerprint_length"])
+    else:
+        return WordFingerprintBuilder(settings["fingerprint_length"])
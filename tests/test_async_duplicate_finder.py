@@ -0,0 +1,66 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+from pathlib import Path
+
+import pytest
+
+from duptextfinder import AsyncDuplicateFinder, CharFingerprintBuilder, DuplicateFinder
+
+from ._helpers import getDuplicatesData
+
+_TEST_CASE_FILE = Path(__file__).parent / "test_cases" / "21_multidocs_cascading.json"
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+    """Thread pool keeping track of the number of submitted calls"""
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.nbCalls = 0
+
+    def submit(self, *args, **kwargs):
+        self.nbCalls += 1
+        return super().submit(*args, **kwargs)
+
+
+def _createDuplicateFinder(partition):
+    return DuplicateFinder(CharFingerprintBuilder(2), minDuplicateLength=4)
+
+
+def test_ordering_and_coalescing():
+    with open(_TEST_CASE_FILE) as fp:
+        docs = json.load(fp)["docs"]
+
+    duplicateFinder = _createDuplicateFinder("P1")
+    expectedResults = [
+        getDuplicatesData(duplicateFinder.findDuplicates(d["id"], d["text"]))
+        for d in docs
+    ]
+
+    executor = _CountingExecutor()
+    asyncFinder = AsyncDuplicateFinder(_createDuplicateFinder, executor)
+
+    async def run():
+        # submit all docs of 2 partitions concurrently
+        return await asyncio.gather(
+            *(
+                asyncFinder.findDuplicates(partition, d["id"], d["text"])
+                for d in docs
+                for partition in ["P1", "P2"]
+            ),
+            # already submitted id in partition
+            asyncFinder.findDuplicates("P1", docs[0]["id"], docs[0]["text"]),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    executor.shutdown()
+
+    *results, error = results
+    assert [getDuplicatesData(r) for r in results[::2]] == expectedResults
+    assert [getDuplicatesData(r) for r in results[1::2]] == expectedResults
+    assert isinstance(error, Exception)
+    # all docs were submitted before processing started, so all docs of a
+    # partition are coalesced into 1 batch
+    assert executor.nbCalls == 2
@@ -0,0 +1,128 @@
+import mmap
+
+import pytest
+
+from duptextfinder import (
+    ByteFingerprintBuilder,
+    CharFingerprintBuilder,
+    DuplicateFinder,
+)
+
+_TEXT = "Hello Bob.\nHELLO bob!\r\nBye"
+
+
+def _getSpans(spansAndFingerprints):
+    return [(s.start, s.end) for s, _ in spansAndFingerprints]
+
+
+@pytest.mark.parametrize("fingerprintLength", [1, 3, 100])
+@pytest.mark.parametrize("orf", [1, 2])
+@pytest.mark.parametrize("caseSensitive", [True, False])
+@pytest.mark.parametrize("allowMultiline", [True, False])
+@pytest.mark.parametrize("unit", ["bytes", "chars"])
+@pytest.mark.filterwarnings("ignore::UserWarning")
+def test_same_as_char_fingerprint_builder(
+    fingerprintLength, orf, caseSensitive, allowMultiline, unit
+):
+    """Spans and equality of fingerprints are the same for ASCII texts"""
+
+    params = dict(
+        fingerprintLength=fingerprintLength,
+        orf=orf,
+        caseSensitive=caseSensitive,
+        allowMultiline=allowMultiline,
+    )
+    expected = CharFingerprintBuilder(**params).buildFingerprints(_TEXT)
+    actual = ByteFingerprintBuilder(**params, unit=unit).buildFingerprints(
+        _TEXT.encode("utf-8")
+    )
+    assert _getSpans(actual) == _getSpans(expected)
+    for (_, fingerprint1), (_, expectedFingerprint1) in zip(actual, expected):
+        for (_, fingerprint2), (_, expectedFingerprint2) in zip(actual, expected):
+            assert (fingerprint1 == fingerprint2) == (
+                expectedFingerprint1 == expectedFingerprint2
+            )
+
+
+def test_chars_unit():
+    text = "très été\nété"
+    builder = ByteFingerprintBuilder(fingerprintLength=4, unit="chars")
+    spansAndFingerprints = builder.buildFingerprints(text.encode("utf-8"))
+    # windows only start at character boundaries
+    assert _getSpans(spansAndFingerprints) == [
+        (0, 3),
+        (1, 4),
+        (2, 5),
+        (3, 6),
+        (4, 7),
+        (5, 8),
+        (6, 9),
+        (7, 10),
+        (8, 11),
+        (9, 12),
+    ]
+    # same text, same fingerprint
+    fingerprintsBySpan = {(s.start, s.end): f for s, f in spansAndFingerprints}
+    assert fingerprintsBySpan[(5, 8)] == fingerprintsBySpan[(9, 12)]
+    assert len(set(fingerprintsBySpan.values())) == len(fingerprintsBySpan) - 1
+
+
+def test_duplicate_finder_with_mmap(tmp_path):
+    texts = [
+        "Le patient est très fatigué, œdème des membres.",
+        "Hier: le patient est très fatigué, œdème des membres inférieurs.",
+    ]
+    path = tmp_path / "export.txt"
+    path.write_bytes(b"".join(t.encode("utf-8") for t in texts))
+
+    duplicateFinder = DuplicateFinder(
+        ByteFingerprintBuilder(6, caseSensitive=False, unit="chars"),
+        minDuplicateLength=6,
+    )
+    with path.open("rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        view = memoryview(buffer)
+        start = 0
+        allDuplicates = []
+        for i, text in enumerate(texts):
+            end = start + len(text.encode("utf-8"))
+            allDuplicates.append(
+                duplicateFinder.findDuplicates(f"D{i}", view[start:end])
+            )
+            start = end
+        del view
+
+    assert allDuplicates[0] == []
+    duplicate = allDuplicates[1][0]
+    sourceText = texts[0][duplicate.sourceSpan.start : duplicate.sourceSpan.end]
+    targetText = texts[1][duplicate.targetSpan.start : duplicate.targetSpan.end]
+    assert sourceText == "Le patient est très fatigué, œdème des membres"
+    assert targetText == "le patient est très fatigué, œdème des membres"
+
+
+def test_invalid_unit():
+    with pytest.raises(ValueError):
+        ByteFingerprintBuilder(fingerprintLength=4, unit="words")
+
+
+@pytest.mark.parametrize("unit", ["bytes", "chars"])
+def test_coverage(unit):
+    """Make sure coverages are computed in the unit of spans"""
+
+    texts = ["Œdème très sévère.", "Hier: œdème très sévère."]
+    duplicateFinder = DuplicateFinder(
+        ByteFingerprintBuilder(4, caseSensitive=False, unit=unit),
+        minDuplicateLength=4,
+    )
+    duplicateFinder.findCoverage("D0", texts[0].encode("utf-8"))
+    coverage = duplicateFinder.findCoverage("D1", texts[1].encode("utf-8"))
+
+    # "Œ" and "œ" only differ by their last byte
+    duplicatedText = "dème très sévère."
+    if unit == "bytes":
+        assert coverage.length == len(texts[1].encode("utf-8"))
+        assert coverage.nbDuplicatedChars == len(duplicatedText.encode("utf-8"))
+    else:
+        assert coverage.length == len(texts[1])
+        assert coverage.nbDuplicatedChars == len(duplicatedText)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+    TreeBackend,
+)
+
+from ._helpers import TEST_CASES_FILES, buildFingerprintBuilder, getDuplicatesData
+
+
+@pytest.mark.parametrize("chunkSize", [1, 3, 50])
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_as_unchunked(testCaseFile, chunkSize):
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+    settings = testCase["settings"]
+
+    duplicateFinder = DuplicateFinder(
+        buildFingerprintBuilder(settings),
+        minDuplicateLength=settings["min_duplicate_length"],
+        treeBackend=TreeBackend.NONE,
+        chunkSize=chunkSize,
+    )
+
+    duplicatesData = []
+    for docData in testCase["docs"]:
+        duplicates = duplicateFinder.findDuplicates(docData["id"], docData["text"])
+        duplicatesData += getDuplicatesData(duplicates)
+
+    expectedDuplicatesData = [
+        (
+            d["source_doc_id"],
+            d["source_start"],
+            d["source_end"],
+            d["target_start"],
+            d["target_end"],
+        )
+        for d in testCase["duplicates"]
+    ]
+    assert duplicatesData == expectedDuplicatesData
+
+
+def test_sqlite(tmp_path):
+    """Chunks are looked up separately in persistent indexes"""
+
+    texts = [
+        "Patient admitted for chest pain. No history of diabetes.",
+        "Follow-up visit. Patient admitted for chest pain, no history of diabetes.",
+        "No history of diabetes. Patient admitted for chest pain. Follow-up visit.",
+    ]
+
+    def findAllDuplicates(**kwargs):
+        duplicateFinder = DuplicateFinder(
+            CharFingerprintBuilder(5), minDuplicateLength=5, **kwargs
+        )
+        return [
+            getDuplicatesData(duplicateFinder.findDuplicates(str(i), text))
+            for i, text in enumerate(texts)
+        ]
+
+    expectedDuplicatesData = findAllDuplicates()
+    assert any(expectedDuplicatesData)
+    assert (
+        findAllDuplicates(
+            index=SqliteFingerprintIndex(tmp_path / "index.db"), chunkSize=4
+        )
+        == expectedDuplicatesData
+    )
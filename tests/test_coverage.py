@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    WordFingerprintBuilder,
+    DuplicateFinder,
+)
+
+from ._helpers import TEST_CASES_FILES
+
+
+def _buildDuplicateFinder(settings, **kwargs):
+    if settings["fingerprint_type"] == "char":
+        fingerprintBuilder = CharFingerprintBuilder(settings["fingerprint_length"])
+    else:
+        fingerprintBuilder = WordFingerprintBuilder(settings["fingerprint_length"])
+    return DuplicateFinder(
+        fingerprintBuilder,
+        minDuplicateLength=settings["min_duplicate_length"],
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("chunkSize", [None, 3])
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_as_duplicates(testCaseFile, chunkSize):
+    """
+    Make sure coverages match the duplicates returned by `findDuplicates()`,
+    including for upcoming documents
+    """
+
+    np = pytest.importorskip("numpy")
+
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+    settings = testCase["settings"]
+
+    duplicateFinder = _buildDuplicateFinder(settings)
+    coverageDuplicateFinder = _buildDuplicateFinder(settings, chunkSize=chunkSize)
+    for docData in testCase["docs"]:
+        docText = docData["text"]
+        duplicates = duplicateFinder.findDuplicates(docData["id"], docText)
+        coverage = coverageDuplicateFinder.findCoverage(
+            docData["id"], docText, bitmap=True
+        )
+
+        expectedDuplicatedChars = np.zeros(len(docText), dtype=bool)
+        for duplicate in duplicates:
+            span = duplicate.targetSpan
+            expectedDuplicatedChars[span.start : span.end] = True
+        assert coverage.length == len(docText)
+        assert coverage.nbDuplicatedChars == expectedDuplicatedChars.sum()
+        duplicatedChars = np.unpackbits(coverage.bitmap, count=len(docText))
+        assert np.array_equal(duplicatedChars.astype(bool), expectedDuplicatedChars)
+
+
+def test_fraction():
+    duplicateFinder = DuplicateFinder(CharFingerprintBuilder(4), minDuplicateLength=8)
+    coverage = duplicateFinder.findCoverage("D0", "The patient has no allergies.")
+    assert coverage.nbDuplicatedChars == 0
+    assert coverage.bitmap is None
+
+    coverage = duplicateFinder.findCoverage("D1", "Unrelated. The patient has no")
+    assert coverage.nbDuplicatedChars == 18
+    assert coverage.fraction == 18 / 29
+
+    with pytest.raises(Exception, match="Already processed"):
+        duplicateFinder.findCoverage("D1", "")
@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DbDocumentReader,
+    DbDuplicateWriter,
+    DuplicateFinder,
+    findDuplicatesInDb,
+)
+
+_DOCS = [
+    # partition, id, date, text
+    ("P2", "D3", "2020-01-02", "Hello Alice. How are you? See you"),
+    ("P1", "D1", "2020-01-02", "Hello Alice. How are you? Bye"),
+    ("P1", "D0", "2020-01-01", "Hello Rick. How are you? See you soon"),
+    ("P2", "D2", "2020-01-01", "Hi Bob. See you"),
+]
+
+
+def _createDuplicateFinder(partition):
+    return DuplicateFinder(CharFingerprintBuilder(2), minDuplicateLength=4)
+
+
+def test_read_write():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE documents (partition, id, date, text)")
+    connection.executemany("INSERT INTO documents VALUES (?, ?, ?, ?)", _DOCS)
+
+    # documents are read by partition and date, even with small chunks
+    reader = DbDocumentReader(connection, chunkSize=1)
+    assert [(p, id) for p, id, _ in reader] == [
+        ("P1", "D0"),
+        ("P1", "D1"),
+        ("P2", "D2"),
+        ("P2", "D3"),
+    ]
+
+    writer = DbDuplicateWriter(connection, batchSize=2)
+    writer.createTable()
+    assert findDuplicatesInDb(reader, writer, _createDuplicateFinder) == 4
+
+    rows = connection.execute(
+        "SELECT * FROM duplicates ORDER BY partition, target_doc_id, target_start"
+    ).fetchall()
+
+    # same result as processing each partition directly
+    expectedRows = []
+    for partition in ["P1", "P2"]:
+        duplicateFinder = _createDuplicateFinder(partition)
+        for _, id, _, text in sorted(d for d in _DOCS if d[0] == partition):
+            for d in duplicateFinder.findDuplicates(id, text):
+                expectedRows.append(
+                    (
+                        partition,
+                        d.sourceDocId,
+                        id,
+                        d.sourceSpan.start,
+                        d.sourceSpan.end,
+                        d.targetSpan.start,
+                        d.targetSpan.end,
+                    )
+                )
+    assert expectedRows
+    assert rows == expectedRows
+
+
+def test_flush_on_error():
+    connection = sqlite3.connect(":memory:")
+    writer = DbDuplicateWriter(connection, batchSize=100)
+    writer.createTable()
+    duplicateFinder = _createDuplicateFinder("P1")
+    duplicateFinder.findDuplicates("D0", "Hello Rick. How are you?")
+    duplicates = duplicateFinder.findDuplicates("D1", "Hello Alice. How are you?")
+    assert duplicates
+
+    # duplicates of documents processed before the error are written
+    with pytest.raises(ValueError):
+        with writer:
+            writer.write("P1", "D1", duplicates)
+            raise ValueError()
+    (nbRows,) = connection.execute("SELECT COUNT(*) FROM duplicates").fetchone()
+    assert nbRows == len(duplicates)
+
+
+class _NamedCursor(sqlite3.Cursor):
+    """sqlite3 cursor accepting the attributes of named cursors"""
+
+
+class _NamedCursorConnection:
+    """sqlite3 connection wrapper accepting the arguments of named cursors"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursorKwargs = []
+
+    def cursor(self, **kwargs):
+        self.cursorKwargs.append(kwargs)
+        return self.connection.cursor(_NamedCursor)
+
+
+def test_named_cursor():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE documents (partition, id, date, text)")
+    connection.executemany("INSERT INTO documents VALUES (?, ?, ?, ?)", _DOCS)
+
+    wrapper = _NamedCursorConnection(connection)
+    reader = DbDocumentReader(wrapper, cursorName="documents_cursor")
+    assert len(list(reader)) == len(_DOCS)
+    assert wrapper.cursorKwargs == [{"name": "documents_cursor"}]
+
+    # commits of the writer would close the named cursor
+    writer = DbDuplicateWriter(wrapper)
+    with pytest.raises(ValueError, match="separate connection"):
+        findDuplicatesInDb(reader, writer, _createDuplicateFinder)
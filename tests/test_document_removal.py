@@ -0,0 +1,141 @@
+import itertools
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+    SuffixArrayEngine,
+    TreeBackend,
+)
+
+from ._helpers import getDuplicatesData
+
+_TEXTS = {
+    "A": "Patient admitted for chest pain. History of diabetes.",
+    "B": "Patient admitted for chest pain. Started on aspirin daily.",
+    "C": "Started on aspirin daily. Discharged home.",
+    "D": "Unrelated note about a broken wrist.",
+}
+
+
+@pytest.fixture(params=["memory", "sqlite", "engine"])
+def createDuplicateFinder(request, tmp_path):
+    counter = itertools.count()
+
+    def create(minDuplicateLength=10):
+        if request.param == "engine":
+            return DuplicateFinder(
+                engine=SuffixArrayEngine(), minDuplicateLength=minDuplicateLength
+            )
+        index = None
+        if request.param == "sqlite":
+            # new database file for each finder
+            index = SqliteFingerprintIndex(tmp_path / f"index{next(counter)}.db")
+        return DuplicateFinder(
+            CharFingerprintBuilder(min(5, minDuplicateLength)),
+            minDuplicateLength=minDuplicateLength,
+            index=index,
+            treeBackend=TreeBackend.NONE,
+        )
+
+    return create
+
+
+def _findAll(duplicateFinder, docIds):
+    return {
+        docId: getDuplicatesData(duplicateFinder.findDuplicates(docId, _TEXTS[docId]))
+        for docId in docIds
+    }
+
+
+def test_remove(createDuplicateFinder):
+    duplicateFinder = createDuplicateFinder()
+    _findAll(duplicateFinder, "ABCD")
+
+    # only B uses A as source
+    assert duplicateFinder.removeDocument("A") == ["B"]
+    assert len(duplicateFinder) == 3
+
+    # once B is recomputed, its duplicates are the ones obtained without A
+    expectedDuplicatesData = _findAll(createDuplicateFinder(), "BCD")
+    duplicates, affectedDocIds = duplicateFinder.replaceDocument("B", _TEXTS["B"])
+    assert getDuplicatesData(duplicates) == expectedDuplicatesData["B"] == []
+    assert affectedDocIds[0] == "C"
+
+    # A can be processed again as a new document, after D
+    duplicates = duplicateFinder.findDuplicates("A", _TEXTS["A"])
+    assert {d.sourceDocId for d in duplicates} == {"B"}
+
+
+def test_replace_keeps_position(createDuplicateFinder):
+    duplicateFinder = createDuplicateFinder()
+    _findAll(duplicateFinder, "ABCD")
+
+    # new text of D copied from C: D stays after C so C is a source (and B,
+    # from which C was partly copied)
+    duplicates, affectedDocIds = duplicateFinder.replaceDocument("D", _TEXTS["C"])
+    assert {d.sourceDocId for d in duplicates} == {"B", "C"}
+    assert affectedDocIds == []
+
+    # new text of A copied from C: C is after A so it can't be a source, but
+    # B and C are affected
+    duplicates, affectedDocIds = duplicateFinder.replaceDocument("A", _TEXTS["C"])
+    assert duplicates == []
+    assert "B" in affectedDocIds and "C" in affectedDocIds
+
+    # recompute B and C, then results match a finder built from scratch
+    for docId in ["B", "C"]:
+        duplicateFinder.replaceDocument(docId, _TEXTS[docId])
+    expectedDuplicateFinder = createDuplicateFinder()
+    for docId, docText in [
+        ("A", _TEXTS["C"]),
+        ("B", _TEXTS["B"]),
+        ("C", _TEXTS["C"]),
+        ("D", _TEXTS["C"]),
+    ]:
+        expectedDuplicateFinder.findDuplicates(docId, docText)
+
+    text = _TEXTS["A"] + " " + _TEXTS["C"]
+    assert getDuplicatesData(
+        duplicateFinder.findDuplicates("E", text)
+    ) == getDuplicatesData(expectedDuplicateFinder.findDuplicates("E", text))
+
+
+def test_replace_with_new_text(createDuplicateFinder):
+    """
+    Make sure later documents whose copied parts are found in the new text are
+    affected, even if they were copied from other documents
+    """
+
+    texts = [
+        "x cab yy cab ab",
+        "x ab ba cab ab ab yy",
+        "abc x ba yy ab x yy abc ab cab ba x x ba ab cab",
+    ]
+
+    duplicateFinder = createDuplicateFinder(minDuplicateLength=4)
+    duplicateFinder.findDuplicates("D0", texts[0])
+    duplicateFinder.findDuplicates("D1", "qqqqqqq")
+    duplicateFinder.findDuplicates("D2", texts[2])
+    _, affectedDocIds = duplicateFinder.replaceDocument("D1", texts[1])
+    assert affectedDocIds == ["D2"]
+
+    # once D2 is recomputed, results match a finder built from scratch
+    duplicates, _ = duplicateFinder.replaceDocument("D2", texts[2])
+    expectedDuplicateFinder = createDuplicateFinder(minDuplicateLength=4)
+    for i, text in enumerate(texts):
+        expectedDuplicates = expectedDuplicateFinder.findDuplicates(f"D{i}", text)
+    assert {d.sourceDocId for d in expectedDuplicates} == {"D0", "D1"}
+    assert getDuplicatesData(duplicates) == getDuplicatesData(expectedDuplicates)
+
+
+def test_unknown_document(createDuplicateFinder):
+    duplicateFinder = createDuplicateFinder()
+    _findAll(duplicateFinder, "A")
+
+    with pytest.raises(Exception, match="Unknown document"):
+        duplicateFinder.removeDocument("B")
+    with pytest.raises(Exception, match="Unknown document"):
+        duplicateFinder.replaceDocument("B", _TEXTS["B"])
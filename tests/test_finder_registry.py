@@ -0,0 +1,53 @@
+import pytest
+
+from duptextfinder import CharFingerprintBuilder, DuplicateFinder, FinderRegistry
+
+
+def _createDuplicateFinder(partition):
+    return DuplicateFinder(CharFingerprintBuilder(2), minDuplicateLength=4)
+
+
+@pytest.mark.parametrize("useSpillDir", [False, True])
+def test_spill(useSpillDir, tmp_path):
+    spillDir = tmp_path / "finders" if useSpillDir else None
+    registry = FinderRegistry(_createDuplicateFinder, maxFinders=2, spillDir=spillDir)
+
+    for partition in ["P1", "P2", "P3"]:
+        duplicateFinder = registry.getDuplicateFinder(partition)
+        duplicateFinder.findDuplicates("D0", "Hello Rick. How are you?")
+    # P1 was evicted
+    assert len(registry) == 2
+    assert registry.nbEvictions == 1
+    assert ("P1" in registry) == useSpillDir
+
+    # P1 is reloaded with its history (or recreated), P2 is evicted
+    duplicateFinder = registry.getDuplicateFinder("P1")
+    duplicates = duplicateFinder.findDuplicates("D1", "Hello Alice. How are you?")
+    assert bool(duplicates) == useSpillDir
+    assert registry.nbEvictions == 2
+    if useSpillDir:
+        assert len(list(spillDir.iterdir())) == 2
+
+    registry.spillAll()
+    assert len(registry) == 0
+    assert registry.getNbDocuments() == 0
+    if useSpillDir:
+        assert len(registry.getDuplicateFinder("P1")) == 2
+
+
+def test_max_documents(tmp_path):
+    registry = FinderRegistry(_createDuplicateFinder, maxDocuments=3, spillDir=tmp_path)
+
+    duplicateFinder = registry.getDuplicateFinder("P1")
+    for i in range(3):
+        duplicateFinder.findDuplicates(f"D{i}", f"Note {i}")
+    registry.getDuplicateFinder("P2").findDuplicates("D0", "Note 0")
+    # limit is only checked when a finder is requested
+    assert len(registry) == 2
+    registry.getDuplicateFinder("P2")
+    assert len(registry) == 1
+    assert registry.getNbDocuments() == 1
+
+    # pinned finders are not evicted
+    registry.getDuplicateFinder("P1", pinnedPartitions={"P2"})
+    assert len(registry) == 2
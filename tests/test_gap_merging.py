@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    WordFingerprintBuilder,
+    DuplicateFinder,
+    SuffixArrayEngine,
+)
+
+from ._helpers import TEST_CASES_FILES, getDuplicatesData
+
+_SOURCE_TEXT = "Seen on 12/03/2021, aspirin 100 mg daily, follow-up."
+
+
+def _findDuplicates(targetText, maxGapLength):
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4), minDuplicateLength=12, maxGapLength=maxGapLength
+    )
+    duplicateFinder.findDuplicates("D0", _SOURCE_TEXT)
+    return getDuplicatesData(duplicateFinder.findDuplicates("D1", targetText))
+
+
+def test_gap_merging():
+    targetText = "Seen on 19/03/2021, aspirin 200 mg daily, follow-up."
+    assert _findDuplicates(targetText, None) == [
+        ("D0", 10, 28, 10, 28),
+        ("D0", 29, 52, 29, 52),
+    ]
+    # "Seen on " is too short to be a duplicate alone, but is merged
+    assert _findDuplicates(targetText, 5) == [("D0", 0, 52, 0, 52)]
+    # gaps are too long
+    assert _findDuplicates(targetText, 0) == _findDuplicates(targetText, None)
+
+    # parts not on the same diagonal are not merged
+    targetText = "Seen on 19/03/2021, aspirin 1000 mg daily, follow-up."
+    assert _findDuplicates(targetText, 5) == [
+        ("D0", 0, 31, 0, 31),
+        ("D0", 30, 52, 31, 53),
+    ]
+
+
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_when_chunked(testCaseFile):
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+    settings = testCase["settings"]
+
+    duplicatesDataByChunkSize = {}
+    for chunkSize in [None, 1, 3]:
+        if settings["fingerprint_type"] == "char":
+            fingerprintBuilder = CharFingerprintBuilder(settings["fingerprint_length"])
+        else:
+            fingerprintBuilder = WordFingerprintBuilder(settings["fingerprint_length"])
+        duplicateFinder = DuplicateFinder(
+            fingerprintBuilder,
+            minDuplicateLength=settings["min_duplicate_length"],
+            maxGapLength=3,
+            chunkSize=chunkSize,
+        )
+        duplicatesDataByChunkSize[chunkSize] = [
+            getDuplicatesData(
+                duplicateFinder.findDuplicates(docData["id"], docData["text"])
+            )
+            for docData in testCase["docs"]
+        ]
+    assert (
+        duplicatesDataByChunkSize[None]
+        == duplicatesDataByChunkSize[1]
+        == duplicatesDataByChunkSize[3]
+    )
+
+
+def test_unsupported():
+    with pytest.raises(ValueError, match="maxGapLength"):
+        DuplicateFinder(engine=SuffixArrayEngine(), maxGapLength=5)
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    WordFingerprintBuilder,
+    DuplicateFinder,
+    SuffixArrayEngine,
+    TreeBackend,
+)
+
+from ._helpers import TEST_CASES_FILES, getDuplicatesData
+
+
+def _findAllDuplicates(testCase, **kwargs):
+    settings = testCase["settings"]
+    if settings["fingerprint_type"] == "char":
+        fingerprintBuilder = CharFingerprintBuilder(settings["fingerprint_length"])
+    else:
+        fingerprintBuilder = WordFingerprintBuilder(settings["fingerprint_length"])
+    duplicateFinder = DuplicateFinder(
+        fingerprintBuilder,
+        minDuplicateLength=settings["min_duplicate_length"],
+        globalOverlapResolution=True,
+        **kwargs,
+    )
+    return [
+        duplicateFinder.findDuplicates(docData["id"], docData["text"])
+        for docData in testCase["docs"]
+    ]
+
+
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_no_overlaps(testCaseFile):
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+
+    expectedDuplicatesData = None
+    for treeBackend in TreeBackend:
+        for chunkSize in [None, 3]:
+            allDuplicates = _findAllDuplicates(
+                testCase, treeBackend=treeBackend, chunkSize=chunkSize
+            )
+            for duplicates in allDuplicates:
+                targetSpans = sorted(
+                    (d.targetSpan.start, d.targetSpan.end) for d in duplicates
+                )
+                for (_, end), (nextStart, _) in zip(targetSpans, targetSpans[1:]):
+                    assert nextStart >= end
+
+            # same results with all backends
+            duplicatesData = [getDuplicatesData(d) for d in allDuplicates]
+            if expectedDuplicatesData is None:
+                expectedDuplicatesData = duplicatesData
+            assert duplicatesData == expectedDuplicatesData
+
+
+def test_tie_break():
+    # the duplicates from D0 and D1 have the same length and overlap on "Smith"
+    docs = {"D0": "Now seen by Dr Smith.", "D1": "Smith recommended ok"}
+    targetText = "Now seen by Dr Smith recommended ok"
+
+    for kwargs in [
+        dict(fingerprintBuilder=CharFingerprintBuilder(4)),
+        dict(engine=SuffixArrayEngine()),
+    ]:
+        for globalOverlapResolution, expectedDuplicatesData in [
+            (False, [("D0", 0, 20), ("D1", 15, 35)]),
+            # the earliest source is kept
+            (True, [("D0", 0, 20), ("D1", 20, 35)]),
+        ]:
+            duplicateFinder = DuplicateFinder(
+                minDuplicateLength=10,
+                globalOverlapResolution=globalOverlapResolution,
+                **kwargs,
+            )
+            for docId, docText in docs.items():
+                duplicateFinder.findDuplicates(docId, docText)
+            duplicates = duplicateFinder.queryDuplicates(targetText)
+            assert [
+                (d.sourceDocId, d.targetSpan.start, d.targetSpan.end)
+                for d in duplicates
+            ] == expectedDuplicatesData
+
+
+def test_max_sources():
+    """
+    Make sure sources whose duplicates are all removed when resolving overlaps
+    don't count in `maxSources`
+    """
+
+    # D0 has the most fingerprints in common with the target, but its only
+    # duplicate is trimmed below minDuplicateLength by the longer one of D1
+    docs = {
+        "D0": "seen today#Patie#s see#chest#pain.#for c",
+        "D1": "Patient was seen",
+        "D2": "for chest pain.",
+    }
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4),
+        minDuplicateLength=8,
+        maxSources=2,
+        globalOverlapResolution=True,
+    )
+    for docId, docText in docs.items():
+        duplicateFinder.findDuplicates(docId, docText)
+    duplicates = duplicateFinder.queryDuplicates(
+        "Patient was seen today for chest pain."
+    )
+    assert [
+        (d.sourceDocId, d.targetSpan.start, d.targetSpan.end) for d in duplicates
+    ] == [("D1", 0, 16), ("D2", 23, 38)]
+    assert not duplicates.truncated
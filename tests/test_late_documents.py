@@ -0,0 +1,192 @@
+import itertools
+import json
+import random
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    WordFingerprintBuilder,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+    SuffixArrayEngine,
+    TreeBackend,
+)
+
+from ._helpers import TEST_CASES_FILES, getDuplicatesData
+
+_SENTENCES = [
+    "Patient admitted for chest pain.",
+    "History of diabetes.",
+    "Started on aspirin daily.",
+    "Blood pressure was normal.",
+    "Discharged home.",
+    "Follow-up in three months.",
+]
+
+
+def _checkSameAsInOrder(createDuplicateFinder, docs, order):
+    """
+    Make sure processing `docs` in `order` with timestamps gives the same
+    duplicates as processing them chronologically
+    """
+
+    duplicateFinder = createDuplicateFinder(allowLateDocuments=False)
+    expectedDuplicatesData = {
+        docId: getDuplicatesData(duplicateFinder.findDuplicates(docId, docText))
+        for docId, docText in docs
+    }
+
+    lateDuplicateFinder = createDuplicateFinder(allowLateDocuments=True)
+    duplicatesData = {}
+    for timestamp in order:
+        docId, docText = docs[timestamp]
+        duplicates = lateDuplicateFinder.findDuplicates(docId, docText, timestamp)
+        duplicatesData[docId] = getDuplicatesData(duplicates)
+        for revisedDocId, revisedDuplicates in duplicates.revisedDuplicates.items():
+            duplicatesData[revisedDocId] = getDuplicatesData(revisedDuplicates)
+    assert duplicatesData == expectedDuplicatesData
+
+    # history is the same
+    text = " ".join(docText for _, docText in docs)
+    assert getDuplicatesData(
+        lateDuplicateFinder.queryDuplicates(text)
+    ) == getDuplicatesData(duplicateFinder.queryDuplicates(text))
+
+
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_as_in_order(testCaseFile):
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+    settings = testCase["settings"]
+
+    def createDuplicateFinder(allowLateDocuments):
+        if settings["fingerprint_type"] == "char":
+            fingerprintBuilder = CharFingerprintBuilder(settings["fingerprint_length"])
+        else:
+            fingerprintBuilder = WordFingerprintBuilder(settings["fingerprint_length"])
+        return DuplicateFinder(
+            fingerprintBuilder,
+            minDuplicateLength=settings["min_duplicate_length"],
+            allowLateDocuments=allowLateDocuments,
+        )
+
+    docs = [(d["id"], d["text"]) for d in testCase["docs"]]
+    for order in itertools.permutations(range(len(docs))):
+        _checkSameAsInOrder(createDuplicateFinder, docs, order)
+
+
+@pytest.mark.parametrize("useEngine", [False, True])
+def test_random_order(useEngine):
+    rng = random.Random(0)
+    docs = [
+        (f"D{i}", " ".join(rng.choices(_SENTENCES, k=rng.randint(1, 4))))
+        for i in range(12)
+    ]
+
+    def createDuplicateFinder(allowLateDocuments):
+        if useEngine:
+            return DuplicateFinder(
+                engine=SuffixArrayEngine(),
+                minDuplicateLength=10,
+                allowLateDocuments=allowLateDocuments,
+            )
+        return DuplicateFinder(
+            CharFingerprintBuilder(5),
+            minDuplicateLength=10,
+            allowLateDocuments=allowLateDocuments,
+        )
+
+    for _ in range(5):
+        order = list(range(len(docs)))
+        rng.shuffle(order)
+        _checkSameAsInOrder(createDuplicateFinder, docs, order)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_random_texts(seed):
+    """
+    Compare with in-order processing on random texts made of a few short
+    tokens, so that later documents often have duplicates from several
+    sources overlapping each other
+    """
+
+    rng = random.Random(seed)
+    tokens = ["x", "ab", "ba", "cab", "yy", "abc"]
+
+    def createDuplicateFinder(allowLateDocuments):
+        return DuplicateFinder(
+            CharFingerprintBuilder(4),
+            minDuplicateLength=4,
+            treeBackend=TreeBackend.NONE,
+            allowLateDocuments=allowLateDocuments,
+        )
+
+    for _ in range(20):
+        docs = [
+            (f"D{i}", " ".join(rng.choices(tokens, k=rng.randint(3, 16))))
+            for i in range(rng.randint(3, 6))
+        ]
+        order = list(range(len(docs)))
+        rng.shuffle(order)
+        _checkSameAsInOrder(createDuplicateFinder, docs, order)
+
+
+def test_only_affected_reprocessed():
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(5), minDuplicateLength=10, allowLateDocuments=True
+    )
+    duplicateFinder.findDuplicates("A", "Patient admitted for chest pain.", 1)
+    duplicateFinder.findDuplicates("C", "Unrelated note about a broken wrist.", 3)
+    duplicateFinder.findDuplicates("D", "Started on aspirin daily. Discharged.", 4)
+
+    duplicates = duplicateFinder.findDuplicates(
+        "B", "Patient admitted for chest pain. Started on aspirin daily.", 2
+    )
+    assert {d.sourceDocId for d in duplicates} == {"A"}
+    # D is now a copy of B, C is not affected
+    assert list(duplicates.revisedDuplicates) == ["D"]
+    assert {d.sourceDocId for d in duplicates.revisedDuplicates["D"]} == {"B"}
+
+
+def test_equal_timestamps_and_removal():
+    """
+    Make sure late documents are stored after the documents with the same
+    timestamp, including after removals
+    """
+
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(5), minDuplicateLength=10, allowLateDocuments=True
+    )
+    for docId, timestamp in [("A", 1), ("B", 2), ("C", 2), ("E", 3), ("D", 2)]:
+        duplicateFinder.findDuplicates(docId, _SENTENCES[0], timestamp)
+    assert list(duplicateFinder._index.getDocIds()) == ["A", "B", "C", "D", "E"]
+
+    duplicateFinder.removeDocument("C")
+    duplicateFinder.removeDocument("E")
+    duplicateFinder.findDuplicates("F", _SENTENCES[0], 2)
+    duplicateFinder.findDuplicates("G", _SENTENCES[0], 1)
+    assert list(duplicateFinder._index.getDocIds()) == ["A", "G", "B", "D", "F"]
+
+
+def test_timestamps_required(tmp_path):
+    duplicateFinder = DuplicateFinder(CharFingerprintBuilder(5), minDuplicateLength=10)
+    with pytest.raises(Exception, match="timestamp"):
+        duplicateFinder.findDuplicates("A", "Some text", 1)
+
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(5), minDuplicateLength=10, allowLateDocuments=True
+    )
+    with pytest.raises(Exception, match="timestamp"):
+        duplicateFinder.findDuplicates("A", "Some text")
+
+    with pytest.raises(ValueError, match="MemoryIndex"):
+        DuplicateFinder(
+            CharFingerprintBuilder(5),
+            index=SqliteFingerprintIndex(tmp_path / "index.db"),
+            allowLateDocuments=True,
+        )
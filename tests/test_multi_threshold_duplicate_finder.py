@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    DuplicateFinder,
+    MultiThresholdDuplicateFinder,
+    TreeBackend,
+)
+
+from ._helpers import TEST_CASES_FILES, buildFingerprintBuilder, getDuplicatesData
+
+
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_as_separate_finders(testCaseFile):
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+    settings = testCase["settings"]
+
+    minLength = settings["min_duplicate_length"]
+    minLengths = [minLength, minLength + 2, minLength * 3]
+    multiFinder = MultiThresholdDuplicateFinder(
+        buildFingerprintBuilder(settings), minLengths, TreeBackend.NONE
+    )
+    finders = {
+        m: DuplicateFinder(buildFingerprintBuilder(settings), m, TreeBackend.NONE)
+        for m in minLengths
+    }
+
+    for docData in testCase["docs"]:
+        id = docData["id"]
+        text = docData["text"]
+        duplicatesByMinLength = multiFinder.findDuplicates(id, text)
+        assert sorted(duplicatesByMinLength) == minLengths
+        for minLength, duplicates in duplicatesByMinLength.items():
+            expectedDuplicates = finders[minLength].findDuplicates(id, text)
+            assert getDuplicatesData(duplicates) == getDuplicatesData(
+                expectedDuplicates
+            )
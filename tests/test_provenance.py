@@ -0,0 +1,101 @@
+from duptextfinder import CharFingerprintBuilder, DuplicateFinder, ProvenanceIndex
+
+_TEXTS = {
+    "A": "Patient admitted for chest pain. History of diabetes.",
+    "B": "Patient admitted for chest pain. Started on aspirin daily.",
+    "C": "Started on aspirin daily. History of diabetes.",
+}
+
+
+def _getCopiesData(copies):
+    return [
+        (
+            c.sourceDocId,
+            c.sourceSpan.start,
+            c.sourceSpan.end,
+            c.targetDocId,
+            c.targetSpan.start,
+            c.targetSpan.end,
+        )
+        for c in copies
+    ]
+
+
+def _buildDuplicateFinder():
+    provenanceIndex = ProvenanceIndex()
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(5),
+        minDuplicateLength=10,
+        provenanceIndex=provenanceIndex,
+    )
+    duplicatesByDocId = {
+        docId: duplicateFinder.findDuplicates(docId, docText)
+        for docId, docText in _TEXTS.items()
+    }
+    return duplicateFinder, provenanceIndex, duplicatesByDocId
+
+
+def test_copies():
+    _, provenanceIndex, duplicatesByDocId = _buildDuplicateFinder()
+
+    # reverse of the duplicates found
+    expectedCopiesData = [
+        (d.sourceDocId, d.sourceSpan.start, d.sourceSpan.end, docId)
+        + (d.targetSpan.start, d.targetSpan.end)
+        for docId, duplicates in duplicatesByDocId.items()
+        for d in duplicates
+        if d.sourceDocId == "A"
+    ]
+    assert len(expectedCopiesData) == 2
+    assert _getCopiesData(provenanceIndex.getCopies("A")) == expectedCopiesData
+    assert _getCopiesData(provenanceIndex.getSources("C")) == _getCopiesData(
+        provenanceIndex.getCopies("A", start=35)
+    ) + _getCopiesData(provenanceIndex.getCopies("B", start=35))
+
+    # range lookup
+    assert [c.targetDocId for c in provenanceIndex.getCopies("A", end=10)] == ["B"]
+    assert [c.targetDocId for c in provenanceIndex.getCopies("A", start=40)] == ["C"]
+
+
+def test_walk_copies():
+    duplicateFinder, provenanceIndex, _ = _buildDuplicateFinder()
+    # copy of the part of C copied from B
+    duplicateFinder.findDuplicates("D", "Follow-up. Started on aspirin daily. Ok.")
+
+    chain = [
+        (depth, copy.sourceDocId, copy.targetDocId)
+        for depth, copy in provenanceIndex.walkCopies("B", start=33)
+    ]
+    # D copies the text from B, the source-most document
+    assert chain == [(1, "B", "C"), (1, "B", "D")]
+    assert list(provenanceIndex.walkCopies("B", maxDepth=0)) == []
+
+
+def test_remove_replace():
+    duplicateFinder, provenanceIndex, _ = _buildDuplicateFinder()
+    nbCopies = len(provenanceIndex)
+
+    duplicateFinder.replaceDocument("C", "Nothing in common.")
+    assert provenanceIndex.getSources("C") == []
+    assert len(provenanceIndex) == nbCopies - 2
+
+    duplicateFinder.removeDocument("A")
+    assert provenanceIndex.getCopies("A") == []
+    assert len(provenanceIndex) == 0
+
+
+def test_save_load(tmp_path):
+    _, provenanceIndex, _ = _buildDuplicateFinder()
+
+    path = tmp_path / "provenance.bin"
+    provenanceIndex.save(path)
+    loadedIndex = ProvenanceIndex.load(path)
+
+    assert len(loadedIndex) == len(provenanceIndex)
+    for docId in _TEXTS:
+        assert _getCopiesData(loadedIndex.getCopies(docId)) == _getCopiesData(
+            provenanceIndex.getCopies(docId)
+        )
+        assert _getCopiesData(loadedIndex.getSources(docId)) == _getCopiesData(
+            provenanceIndex.getSources(docId)
+        )
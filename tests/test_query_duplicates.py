@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+from pathlib import Path
+import pickle
+import threading
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+)
+from duptextfinder.read_write_lock import ReadWriteLock
+
+from ._helpers import getDuplicatesData
+
+_TEST_CASE_FILE = Path(__file__).parent / "test_cases" / "21_multidocs_cascading.json"
+
+
+@pytest.fixture
+def docs():
+    with open(_TEST_CASE_FILE) as fp:
+        return json.load(fp)["docs"]
+
+
+@pytest.mark.parametrize("useSqlite", [False, True])
+def test_same_as_find(docs, useSqlite, tmp_path):
+    """
+    Make sure queries return the same duplicates as `findDuplicates()` without
+    modifying the history, including when run from several threads
+    """
+
+    index = SqliteFingerprintIndex(tmp_path / "index.db") if useSqlite else None
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(2), minDuplicateLength=4, index=index
+    )
+    for doc in docs[:-1]:
+        duplicateFinder.findDuplicates(doc["id"], doc["text"])
+
+    lastDoc = docs[-1]
+    with ThreadPoolExecutor(4) as executor:
+        results = list(
+            executor.map(duplicateFinder.queryDuplicates, [lastDoc["text"]] * 8)
+        )
+    assert len(duplicateFinder) == len(docs) - 1
+
+    expectedDuplicatesData = getDuplicatesData(
+        duplicateFinder.findDuplicates(lastDoc["id"], lastDoc["text"])
+    )
+    assert expectedDuplicatesData
+    for duplicates in results:
+        assert getDuplicatesData(duplicates) == expectedDuplicatesData
+
+
+def test_pickle(docs):
+    duplicateFinder = DuplicateFinder(CharFingerprintBuilder(2), minDuplicateLength=4)
+    for doc in docs[:-1]:
+        duplicateFinder.findDuplicates(doc["id"], doc["text"])
+
+    unpickledDuplicateFinder = pickle.loads(pickle.dumps(duplicateFinder))
+    lastDoc = docs[-1]
+    assert getDuplicatesData(
+        unpickledDuplicateFinder.queryDuplicates(lastDoc["text"])
+    ) == getDuplicatesData(duplicateFinder.queryDuplicates(lastDoc["text"]))
+
+
+def test_read_write_lock():
+    lock = ReadWriteLock()
+    events = []
+
+    def write():
+        with lock.writing():
+            events.append("write")
+
+    with lock.reading():
+        # several readers at once
+        with lock.reading():
+            pass
+        writer = threading.Thread(target=write)
+        writer.start()
+        # writer waits for readers
+        writer.join(0.05)
+        assert events == []
+        events.append("read")
+    writer.join()
+    assert events == ["read", "write"]
@@ -0,0 +1,20 @@
+from duptextfinder import CharFingerprintBuilder, DuplicateFinder
+
+
+def test_search_passage():
+    duplicateFinder = DuplicateFinder(CharFingerprintBuilder(4), minDuplicateLength=8)
+    duplicateFinder.findDuplicates("D0", "Vitals stable. No allergies. Vitals stable.")
+    duplicateFinder.findDuplicates("D1", "Patient seen today. No allergies.")
+    duplicateFinder.findDuplicates("D2", "Patient seen today. Vitals stable.")
+
+    # all occurrences are returned, but copies are not indexed
+    hits = duplicateFinder.searchPassage("Patient seen. Vitals stable.")
+    assert [(docId, span.start, span.end) for docId, span in hits] == [
+        ("D0", 0, 14),
+        ("D0", 27, 43),
+        ("D1", 0, 12),
+    ]
+    # the passage was not stored
+    assert len(duplicateFinder) == 3
+
+    assert duplicateFinder.searchPassage("Vitals stable", minLength=20) == []
@@ -0,0 +1,166 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from duptextfinder import CharFingerprintBuilder, DuplicateFinder
+from duptextfinder.service import DuplicateFinderService, createServer
+
+
+def _createDuplicateFinder(partition):
+    return DuplicateFinder(CharFingerprintBuilder(2), minDuplicateLength=4)
+
+
+@pytest.fixture
+def serverUrl():
+    service = DuplicateFinderService(_createDuplicateFinder, maxFinders=1)
+    server = createServer(service, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _postDocument(serverUrl, partition, id, text):
+    data = json.dumps({"partition": partition, "id": id, "text": text})
+    request = urllib.request.Request(
+        serverUrl + "/documents", data=data.encode("utf-8"), method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def test_service(serverUrl):
+    assert _postDocument(serverUrl, "P1", "D0", "Hello Rick. How are you?") == []
+    assert _postDocument(serverUrl, "P1", "D1", "Hello Alice. How are you?") == [
+        {
+            "source_doc_id": "D0",
+            "source_start": 0,
+            "source_end": 6,
+            "target_start": 0,
+            "target_end": 6,
+        },
+        {
+            "source_doc_id": "D0",
+            "source_start": 10,
+            "source_end": 24,
+            "target_start": 11,
+            "target_end": 25,
+        },
+    ]
+
+    # already processed document
+    with pytest.raises(urllib.error.HTTPError) as excInfo:
+        _postDocument(serverUrl, "P1", "D1", "Hello Alice. How are you?")
+    assert excInfo.value.code == 409
+
+    # new partition evicts P1 (only 1 finder allowed)
+    assert _postDocument(serverUrl, "P2", "D0", "Hello Rick. How are you?") == []
+    assert _postDocument(serverUrl, "P1", "D2", "Hello Rick. How are you?") == []
+
+    with urllib.request.urlopen(serverUrl + "/metrics") as response:
+        metrics = response.read().decode("utf-8")
+    assert "duptextfinder_documents_total 5\n" in metrics
+    assert "duptextfinder_errors_total 1\n" in metrics
+    assert "duptextfinder_evictions_total 2\n" in metrics
+    assert "duptextfinder_stored_documents 1\n" in metrics
+    assert 'duptextfinder_request_latency_seconds_bucket{le="+Inf"} 5\n' in metrics
+
+
+def test_spill(tmp_path):
+    service = DuplicateFinderService(
+        _createDuplicateFinder, maxFinders=1, spillDir=tmp_path
+    )
+    assert service.findDuplicates("P1", "D0", "Hello Rick. How are you?") == []
+    assert service.findDuplicates("P2", "D0", "Hello Rick. How are you?") == []
+    # P1 was evicted but its history was kept
+    duplicates = service.findDuplicates("P1", "D1", "Hello Alice. How are you?")
+    assert [d.sourceDocId for d in duplicates] == ["D0", "D0"]
+
+
+def test_server_error(serverUrl):
+    # text must be a string
+    with pytest.raises(urllib.error.HTTPError) as excInfo:
+        _postDocument(serverUrl, "P1", "D0", 42)
+    assert excInfo.value.code == 500
+
+
+def test_metrics_dont_wait_for_finders():
+    service = DuplicateFinderService(_createDuplicateFinder)
+    service.findDuplicates("P1", "D0", "Hello Rick. How are you?")
+    service.findDuplicates("P1", "D1", "Hello Alice. How are you?")
+
+    # finder busy with a long write
+    duplicateFinder = service._registry.getLoadedDuplicateFinder("P1")
+    with duplicateFinder._lock.writing():
+        assert "duptextfinder_stored_documents 2\n" in service.renderMetrics()
+
+
+def test_unexpected_error():
+    """Errors outside of the processing of documents don't block the partition"""
+
+    service = DuplicateFinderService(_createDuplicateFinder)
+    updateNbDocuments = service._registry.updateNbDocuments
+
+    def failingUpdateNbDocuments(partition, nbDocs):
+        raise RuntimeError("Unexpected")
+
+    service._registry.updateNbDocuments = failingUpdateNbDocuments
+    with pytest.raises(RuntimeError):
+        service.findDuplicates("P1", "D0", "Hello Rick. How are you?")
+
+    service._registry.updateNbDocuments = updateNbDocuments
+    thread = threading.Thread(
+        target=service.findDuplicates,
+        args=("P1", "D1", "Hello Alice. How are you?"),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_slow_spill(tmp_path):
+    service = DuplicateFinderService(
+        _createDuplicateFinder, maxFinders=1, spillDir=tmp_path
+    )
+    service.findDuplicates("P1", "D0", "Hello Rick. How are you?")
+
+    # block the spill of P1 when P2 comes in
+    spillStarted = threading.Event()
+    canSpill = threading.Event()
+    spillDuplicateFinder = service._registry.spillDuplicateFinder
+
+    def slowSpillDuplicateFinder(partition, duplicateFinder):
+        spillStarted.set()
+        canSpill.wait()
+        spillDuplicateFinder(partition, duplicateFinder)
+
+    service._registry.spillDuplicateFinder = slowSpillDuplicateFinder
+    thread = threading.Thread(
+        target=service.findDuplicates, args=("P2", "D0", "Hello Rick. How are you?")
+    )
+    thread.start()
+    assert spillStarted.wait(5)
+
+    # metrics don't wait for the spill
+    assert "duptextfinder_evictions_total 1\n" in service.renderMetrics()
+    # P1 can't be reloaded until it is saved
+    reloadThread = threading.Thread(
+        target=service.findDuplicates,
+        args=("P1", "D1", "Hello Alice. How are you?"),
+    )
+    reloadThread.start()
+    reloadThread.join(0.1)
+    assert reloadThread.is_alive()
+
+    canSpill.set()
+    thread.join()
+    reloadThread.join()
+    with pytest.raises(Exception):
+        # P1 was reloaded with its history
+        service.findDuplicates("P1", "D0", "Hello Rick. How are you?")
@@ -0,0 +1,142 @@
+import json
+from multiprocessing import get_context
+from pathlib import Path
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    MemoryIndex,
+    SharedMemoryIndex,
+    TreeBackend,
+)
+
+from ._helpers import getDuplicatesData
+
+_TEST_CASE_FILE = Path(__file__).parent / "test_cases" / "21_multidocs_cascading.json"
+
+
+def _createDuplicateFinder(index):
+    return DuplicateFinder(
+        CharFingerprintBuilder(2),
+        minDuplicateLength=4,
+        treeBackend=TreeBackend.NONE,
+        index=index,
+    )
+
+
+def _findLastDuplicates(index, docId, docText):
+    """Process last doc in worker"""
+    return getDuplicatesData(
+        _createDuplicateFinder(index).findDuplicates(docId, docText)
+    )
+
+
+@pytest.fixture
+def docs():
+    with open(_TEST_CASE_FILE) as fp:
+        return json.load(fp)["docs"]
+
+
+@pytest.fixture
+def sharedIndex(docs):
+    # process history in main process
+    index = MemoryIndex()
+    duplicateFinder = _createDuplicateFinder(index)
+    for doc in docs[:-1]:
+        duplicateFinder.findDuplicates(doc["id"], doc["text"])
+
+    sharedIndex = SharedMemoryIndex.create(index)
+    yield sharedIndex
+    sharedIndex.unlink()
+
+
+def test_same_as_memory(docs, sharedIndex):
+    expectedFinder = _createDuplicateFinder(MemoryIndex())
+    for doc in docs:
+        expectedDuplicates = expectedFinder.findDuplicates(doc["id"], doc["text"])
+
+    attachedIndex = SharedMemoryIndex.attach(sharedIndex.name)
+    lastDoc = docs[-1]
+    assert lastDoc["id"] not in attachedIndex
+    assert _findLastDuplicates(
+        attachedIndex, lastDoc["id"], lastDoc["text"]
+    ) == getDuplicatesData(expectedDuplicates)
+
+    # documents processed locally are added to the local part of the index
+    assert lastDoc["id"] in attachedIndex
+    assert len(attachedIndex) == len(docs)
+    # but not to the shared part
+    reattachedIndex = pickle.loads(pickle.dumps(attachedIndex))
+    assert lastDoc["id"] not in reattachedIndex
+    reattachedIndex.close()
+    attachedIndex.close()
+
+
+def test_multiprocessing(docs, sharedIndex):
+    lastDoc = docs[-1]
+    attachedIndex = SharedMemoryIndex.attach(sharedIndex.name)
+    expectedDuplicatesData = _findLastDuplicates(
+        attachedIndex, lastDoc["id"], lastDoc["text"]
+    )
+    attachedIndex.close()
+
+    # index is attached by name in workers when pickled
+    with get_context("spawn").Pool(2) as pool:
+        results = pool.starmap(
+            _findLastDuplicates,
+            [(sharedIndex, lastDoc["id"], lastDoc["text"])] * 2,
+        )
+    assert results == [expectedDuplicatesData] * 2
+
+
+def test_attach_from_other_process(sharedIndex):
+    """Workers attaching to the block must not destroy it when exiting"""
+
+    code = (
+        "import sys\n"
+        "from duptextfinder import SharedMemoryIndex\n"
+        "index = SharedMemoryIndex.attach(sys.argv[1])\n"
+        "print(len(index))\n"
+        "index.close()\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, sharedIndex.name],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    assert int(result.stdout) == len(sharedIndex)
+
+    # block still exists
+    SharedMemoryIndex.attach(sharedIndex.name).close()
+
+
+def test_replace(docs, sharedIndex):
+    """Only documents processed locally can be removed or replaced"""
+
+    attachedIndex = SharedMemoryIndex.attach(sharedIndex.name)
+    duplicateFinder = _createDuplicateFinder(attachedIndex)
+    lastDoc = docs[-1]
+    expectedDuplicates = duplicateFinder.findDuplicates(lastDoc["id"], lastDoc["text"])
+
+    # replacing with the same text gives the same duplicates
+    duplicates, affectedDocIds = duplicateFinder.replaceDocument(
+        lastDoc["id"], lastDoc["text"]
+    )
+    assert getDuplicatesData(duplicates) == getDuplicatesData(expectedDuplicates)
+    assert affectedDocIds == []
+
+    with pytest.raises(Exception, match="shared history"):
+        duplicateFinder.replaceDocument(docs[0]["id"], docs[0]["text"])
+    with pytest.raises(Exception, match="shared history"):
+        duplicateFinder.removeDocument(docs[0]["id"])
+
+    assert duplicateFinder.removeDocument(lastDoc["id"]) == []
+    assert lastDoc["id"] not in attachedIndex
+    attachedIndex.close()
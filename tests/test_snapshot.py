@@ -0,0 +1,99 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+import duptextfinder
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+    TextNormalizer,
+)
+
+from ._helpers import getDuplicatesData
+
+_TEXTS = [
+    "Patient admitted for chest pain. History of diabetes.",
+    "History of diabetes. Started on aspirin daily.",
+    "Started on aspirin daily. Blood pressure was normal.",
+    "Patient admitted for chest pain. Blood pressure was normal. Discharged home.",
+]
+
+
+def _createDuplicateFinder():
+    return DuplicateFinder(
+        CharFingerprintBuilder(5), minDuplicateLength=5, normalizer=TextNormalizer()
+    )
+
+
+def test_snapshot(tmp_path):
+    duplicateFinder = _createDuplicateFinder()
+    for i, text in enumerate(_TEXTS[:-1]):
+        duplicateFinder.findDuplicates(f"D{i}", text)
+    duplicateFinder.addTemplate("T0", "Follow-up in three months.")
+    duplicateFinder.saveSnapshot(tmp_path / "finder.snapshot")
+
+    loadedDuplicateFinder = DuplicateFinder.loadSnapshot(tmp_path / "finder.snapshot")
+    assert len(loadedDuplicateFinder) == len(_TEXTS) - 1
+
+    # a snapshot of a snapshot whose documents weren't unpacked yet
+    loadedDuplicateFinder.saveSnapshot(tmp_path / "finder2.snapshot")
+    reloadedDuplicateFinder = DuplicateFinder.loadSnapshot(
+        tmp_path / "finder2.snapshot"
+    )
+
+    text = _TEXTS[-1] + " Follow-up in three months."
+    expectedDuplicates = duplicateFinder.findDuplicates("D3", text)
+    assert expectedDuplicates
+    for d in (loadedDuplicateFinder, reloadedDuplicateFinder):
+        duplicates = d.findDuplicates("D3", text)
+        assert getDuplicatesData(duplicates) == getDuplicatesData(expectedDuplicates)
+        assert getDuplicatesData(duplicates.templateDuplicates) == (
+            getDuplicatesData(expectedDuplicates.templateDuplicates)
+        )
+
+
+def test_invalid_snapshot(tmp_path):
+    path = tmp_path / "finder.snapshot"
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(Exception):
+        DuplicateFinder.loadSnapshot(path)
+
+    index = SqliteFingerprintIndex(tmp_path / "history.db")
+    duplicateFinder = DuplicateFinder(CharFingerprintBuilder(5), index=index)
+    with pytest.raises(Exception):
+        duplicateFinder.saveSnapshot(path)
+
+
+def test_lazy_imports():
+    """
+    Optional packages and modules not needed by `DuplicateFinder` must not be
+    imported until they are used
+    """
+
+    code = (
+        "import sys, duptextfinder; "
+        "modules = {'numpy', 'ncls', 'intervaltree', 'asyncio', 'sqlite3', "
+        "'multiprocessing', 'csv', 'pickle'}; "
+        "print(sorted(modules & set(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_star_import():
+    """Lazily imported names are also exported by `import *`"""
+
+    namespace = {}
+    exec("from duptextfinder import *", namespace)
+    assert "DuplicateFinder" in namespace
+    assert namespace["SqliteFingerprintIndex"] is SqliteFingerprintIndex
+    assert set(duptextfinder.__all__) <= set(dir(duptextfinder))
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+    TreeBackend,
+)
+
+from ._helpers import TEST_CASES_FILES, buildFingerprintBuilder, getDuplicatesData
+
+
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_as_memory(testCaseFile, tmp_path):
+    """
+    Make sure the sqlite index yields the same duplicates as the in-memory
+    index, even when reopened between documents
+    """
+
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+    settings = testCase["settings"]
+
+    memoryFinder = DuplicateFinder(
+        buildFingerprintBuilder(settings),
+        minDuplicateLength=settings["min_duplicate_length"],
+        treeBackend=TreeBackend.NONE,
+    )
+
+    dbPath = tmp_path / "index.db"
+    for docData in testCase["docs"]:
+        id = docData["id"]
+        text = docData["text"]
+        expectedDuplicates = memoryFinder.findDuplicates(id, text)
+
+        # reopen index for each document
+        index = SqliteFingerprintIndex(dbPath, partition="P1")
+        sqliteFinder = DuplicateFinder(
+            buildFingerprintBuilder(settings),
+            minDuplicateLength=settings["min_duplicate_length"],
+            treeBackend=TreeBackend.NONE,
+            index=index,
+        )
+        duplicates = sqliteFinder.findDuplicates(id, text)
+        index.close()
+
+        assert getDuplicatesData(duplicates) == getDuplicatesData(expectedDuplicates)
+
+
+def test_partitions(tmp_path):
+    dbPath = tmp_path / "index.db"
+    index1 = SqliteFingerprintIndex(dbPath, partition="P1")
+    index2 = SqliteFingerprintIndex(dbPath, partition="P2")
+    finder1 = DuplicateFinder(CharFingerprintBuilder(2), 4, index=index1)
+    finder2 = DuplicateFinder(CharFingerprintBuilder(2), 4, index=index2)
+
+    finder1.findDuplicates("D0", "Hello Rick")
+    # same id in another partition is allowed, and does not see the 1st doc
+    assert finder2.findDuplicates("D0", "Hello Rick") == []
+    assert len(index1) == len(index2) == 1
+
+    duplicates = finder1.findDuplicates("D1", "Hello Alice")
+    assert getDuplicatesData(duplicates) == [("D0", 0, 6, 0, 6)]
+    with pytest.raises(Exception):
+        finder1.findDuplicates("D1", "Hello Alice")
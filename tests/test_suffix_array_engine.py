@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from duptextfinder import (
+    CharFingerprintBuilder,
+    DuplicateFinder,
+    SuffixArrayEngine,
+    TreeBackend,
+)
+
+from ._helpers import TEST_CASES_FILES, getDuplicatesData
+
+
+@pytest.mark.filterwarnings("ignore:Using a fingerprint of smaller than 2")
+@pytest.mark.parametrize("minDuplicateLength", [1, 4, 8])
+@pytest.mark.parametrize(
+    "testCaseFile",
+    TEST_CASES_FILES,
+    ids=[f.name for f in TEST_CASES_FILES],
+)
+def test_same_as_char_fingerprints(testCaseFile, minDuplicateLength):
+    """
+    Make sure the suffix array engine yields the same duplicates as 1-char
+    fingerprints
+    """
+
+    with open(testCaseFile) as fp:
+        testCase = json.load(fp)
+
+    fingerprintFinder = DuplicateFinder(
+        CharFingerprintBuilder(fingerprintLength=1),
+        minDuplicateLength=minDuplicateLength,
+        treeBackend=TreeBackend.NONE,
+    )
+    engineFinder = DuplicateFinder(
+        engine=SuffixArrayEngine(),
+        minDuplicateLength=minDuplicateLength,
+        treeBackend=TreeBackend.NONE,
+    )
+
+    for docData in testCase["docs"]:
+        id = docData["id"]
+        text = docData["text"]
+        expectedDuplicates = fingerprintFinder.findDuplicates(id, text)
+        duplicates = engineFinder.findDuplicates(id, text)
+        assert getDuplicatesData(duplicates) == getDuplicatesData(expectedDuplicates)
+
+
+def test_options():
+    engine = SuffixArrayEngine(caseSensitive=False, allowMultiline=False)
+    duplicateFinder = DuplicateFinder(engine=engine, minDuplicateLength=4)
+
+    duplicateFinder.findDuplicates("D0", "Hello\nBob")
+    duplicates = duplicateFinder.findDuplicates("D1", "HELLO BOB")
+    # case is ignored but duplicates don't span over several lines
+    assert getDuplicatesData(duplicates) == [("D0", 0, 5, 0, 5)]
+
+
+def test_builder_or_engine():
+    with pytest.raises(ValueError):
+        DuplicateFinder()
+    with pytest.raises(ValueError):
+        DuplicateFinder(CharFingerprintBuilder(2), engine=SuffixArrayEngine())
+
+
+@pytest.mark.parametrize("minDuplicateLength", [1, 3, 6])
+def test_repetitive_texts(minDuplicateLength):
+    """
+    Make sure all maximal common parts are found in repetitive texts, by
+    comparing with a naive search
+    """
+
+    sourceText = "| 1.0 | 1.0 |\n" * 5 + "abab"
+    targetText = "Res: | 1.0 | 1.0 |\n" * 4 + "ababab"
+
+    expectedDuplicatesData = []
+    for targetStart in range(len(targetText)):
+        for sourceStart in range(len(sourceText)):
+            # only keep left-maximal common parts
+            if (
+                targetStart > 0
+                and sourceStart > 0
+                and targetText[targetStart - 1] == sourceText[sourceStart - 1]
+            ):
+                continue
+            length = 0
+            while (
+                targetStart + length < len(targetText)
+                and sourceStart + length < len(sourceText)
+                and targetText[targetStart + length] == sourceText[sourceStart + length]
+            ):
+                length += 1
+            if length >= minDuplicateLength:
+                expectedDuplicatesData.append(
+                    (
+                        "D0",
+                        sourceStart,
+                        sourceStart + length,
+                        targetStart,
+                        targetStart + length,
+                    )
+                )
+
+    engine = SuffixArrayEngine()
+    sourceDoc = engine.buildDocument("D0", sourceText, [])
+    duplicatesBySourceId = engine.buildDuplicates(
+        targetText, [sourceDoc], minDuplicateLength
+    )
+    assert getDuplicatesData(duplicatesBySourceId["D0"]) == expectedDuplicatesData
@@ -0,0 +1,38 @@
+import pytest
+
+from duptextfinder import CharFingerprintBuilder, DuplicateFinder, SuffixArrayEngine
+
+from ._helpers import getDuplicatesData
+
+_TEMPLATE = "DISCHARGE SUMMARY\nReason for admission:\nTreatment:\n"
+
+
+def test_templates():
+    duplicateFinder = DuplicateFinder(CharFingerprintBuilder(5), minDuplicateLength=10)
+    duplicateFinder.addTemplate("T0", _TEMPLATE)
+
+    text0 = _TEMPLATE.replace(":\n", ": chest pain\n", 1)
+    duplicates = duplicateFinder.findDuplicates("D0", text0)
+    assert duplicates == []
+    assert getDuplicatesData(duplicates.templateDuplicates) == [
+        ("T0", 0, 39, 0, 39),
+        ("T0", 39, 51, 50, 62),
+    ]
+
+    # the template parts are not reported as copied from D0, but the rest is
+    text1 = text0 + "Aspirin daily."
+    duplicates = duplicateFinder.findDuplicates("D1", text1)
+    assert getDuplicatesData(duplicates) == [("D0", 39, 50, 39, 50)]
+    assert [d.sourceDocId for d in duplicates.templateDuplicates] == ["T0", "T0"]
+
+    # template parts are not stored
+    assert duplicateFinder.searchPassage(_TEMPLATE) == []
+
+    with pytest.raises(Exception, match="Already added template"):
+        duplicateFinder.addTemplate("T0", _TEMPLATE)
+
+
+def test_unsupported():
+    duplicateFinder = DuplicateFinder(engine=SuffixArrayEngine(), minDuplicateLength=10)
+    with pytest.raises(Exception, match="Templates"):
+        duplicateFinder.addTemplate("T0", _TEMPLATE)
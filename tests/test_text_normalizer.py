@@ -0,0 +1,97 @@
+from duptextfinder import (
+    CharFingerprintBuilder,
+    Duplicate,
+    DuplicateFinder,
+    SqliteFingerprintIndex,
+    TextNormalizer,
+)
+from duptextfinder.span import Span
+import pytest
+
+_TEXTS = [
+    "Patient très  fatigué.\nRetour à domicile.",
+    "  Hello,   world!\t\n\nBye ",
+    "Œdème (ﬁn) — ok…",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", _TEXTS)
+@pytest.mark.parametrize("foldAccents", [False, True])
+@pytest.mark.parametrize("stripPunctuation", [False, True])
+def test_offset_map(text, foldAccents, stripPunctuation):
+    normalizer = TextNormalizer(
+        foldAccents=foldAccents, stripPunctuation=stripPunctuation
+    )
+    normalizedText, offsetMap = normalizer.normalize(text)
+    assert offsetMap.originalLength == len(text)
+
+    previousPosition = -1
+    for i, char in enumerate(normalizedText):
+        position = offsetMap.toOriginal(i)
+        assert position >= previousPosition
+        previousPosition = position
+        originalChar = text[position]
+        if char.isspace():
+            assert originalChar.isspace()
+        elif not foldAccents:
+            assert char == originalChar
+
+
+def test_normalize():
+    normalizer = TextNormalizer(foldAccents=True, stripPunctuation=True)
+    normalizedText, offsetMap = normalizer.normalize("Très  fatigué.\n\n  Retour")
+    assert normalizedText == "Tres fatigue\nRetour"
+    span = offsetMap.toOriginalSpan(Span(5, 12))
+    assert (span.start, span.end) == (6, 13)
+    span = offsetMap.toOriginalSpan(Span(13, 19))
+    assert (span.start, span.end) == (18, 24)
+
+
+def test_duplicate_finder():
+    normalizer = TextNormalizer(foldAccents=True)
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4), minDuplicateLength=8, normalizer=normalizer
+    )
+    text0 = "Patient très  fatigué.\nRetour à domicile."
+    text1 = "Patient tres fatigue. \n\n Retour a domicile demain."
+    assert duplicateFinder.findDuplicates("D0", text0) == []
+    duplicates = duplicateFinder.findDuplicates("D1", text1)
+    # spans are in original texts and have different lengths
+    assert [
+        (d.sourceSpan.start, d.sourceSpan.end, d.targetSpan.start, d.targetSpan.end)
+        for d in duplicates
+    ] == [(0, 40, 0, 42)]
+
+    hits = duplicateFinder.searchPassage("tres   fatigue")
+    assert [(docId, span.start, span.end) for docId, span in hits] == [("D0", 8, 21)]
+
+
+def test_templates():
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4), minDuplicateLength=8, normalizer=TextNormalizer()
+    )
+    duplicateFinder.addTemplate("T0", "Compte  rendu\nde sortie")
+    duplicates = duplicateFinder.findDuplicates("D0", "Compte rendu \n de sortie: ok")
+    assert duplicates == []
+    assert [
+        (d.sourceSpan.start, d.sourceSpan.end, d.targetSpan.start, d.targetSpan.end)
+        for d in duplicates.templateDuplicates
+    ] == [(0, 23, 0, 24)]
+
+
+def test_unsupported_index(tmp_path):
+    index = SqliteFingerprintIndex(tmp_path / "history.db")
+    with pytest.raises(ValueError):
+        DuplicateFinder(
+            CharFingerprintBuilder(4), index=index, normalizer=TextNormalizer()
+        )
+
+
+def test_duplicate_lengths():
+    """Make sure spans of different lengths are only allowed once mapped"""
+
+    with pytest.raises(AssertionError):
+        Duplicate("D0", Span(0, 10), Span(0, 12))
+    duplicate = Duplicate("D0", Span(0, 10), Span(0, 12), mapped=True)
+    assert duplicate.length == 12
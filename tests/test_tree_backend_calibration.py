@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from duptextfinder import TreeBackend, calibrateTreeBackends
+from duptextfinder.duplicate_finder import (
+    _getTreeBackendThresholds,
+    _isTreeBackendAvailable,
+    _selectTreeBackend,
+)
+from duptextfinder.tree_backend_calibration import (
+    REMOVE_OVERLAPPING_DUPLICATES,
+    loadTreeBackendThresholds,
+)
+
+
+@pytest.fixture(autouse=True)
+def clearThresholdsCache():
+    """Make sure thresholds of a test aren't used by other tests"""
+
+    _getTreeBackendThresholds.cache_clear()
+    yield
+    _getTreeBackendThresholds.cache_clear()
+
+
+def test_calibration(tmp_path, monkeypatch):
+    path = tmp_path / "tree_backends.json"
+    monkeypatch.setenv("DUPTEXTFINDER_TREE_BACKENDS", str(path))
+
+    thresholds = calibrateTreeBackends(nbsDuplicates=(2, 8), nbRepeats=1)
+    assert loadTreeBackendThresholds(path) == thresholds
+    for operationThresholds in thresholds.values():
+        assert operationThresholds[0][0] == 0
+        for _, backendName in operationThresholds:
+            assert _isTreeBackendAvailable(TreeBackend(backendName))
+
+
+def test_select_tree_backend(tmp_path, monkeypatch):
+    path = tmp_path / "tree_backends.json"
+    config = {
+        "version": 1,
+        REMOVE_OVERLAPPING_DUPLICATES: [[0, "NONE"], [10, "INTERVAL_TREE"]],
+    }
+    path.write_text(json.dumps(config))
+    monkeypatch.setenv("DUPTEXTFINDER_TREE_BACKENDS", str(path))
+
+    assert _selectTreeBackend(REMOVE_OVERLAPPING_DUPLICATES, 9) is TreeBackend.NONE
+    expectedTreeBackend = (
+        TreeBackend.INTERVAL_TREE
+        if _isTreeBackendAvailable(TreeBackend.INTERVAL_TREE)
+        else TreeBackend.NONE
+    )
+    assert _selectTreeBackend(REMOVE_OVERLAPPING_DUPLICATES, 10) is expectedTreeBackend
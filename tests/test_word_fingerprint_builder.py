@@ -1,6 +1,6 @@
 import pytest
 
-from duptextfinder import WordFingerprintBuilder, Span
+from duptextfinder import DuplicateFinder, WordFingerprintBuilder, Span, Vocabulary
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -108,3 +108,94 @@ def test_fingerprint_length_orf_combinations(
     builder = WordFingerprintBuilder(fingerprintLength, orf)
     spansAndFingerprints = builder.buildFingerprints(text)
     assert spansAndFingerprints == expectedspansAndFingerprints
+
+
+@pytest.mark.parametrize("fingerprintLength,orf,_", _TEST_CASES)
+def test_vocabulary(fingerprintLength, orf, _):
+    """
+    Test integer fingerprints built with a vocabulary have the same spans as
+    string fingerprints, and are equal when string fingerprints are equal
+    """
+
+    text = "hello, how are you? how are things? Hello, how are you?"
+
+    builder = WordFingerprintBuilder(fingerprintLength, orf)
+    expectedSpansAndFingerprints = builder.buildFingerprints(text)
+
+    vocabularyBuilder = WordFingerprintBuilder(
+        fingerprintLength, orf, vocabulary=Vocabulary()
+    )
+    spansAndFingerprints = vocabularyBuilder.buildFingerprints(text)
+
+    assert [s for s, _ in spansAndFingerprints] == [
+        s for s, _ in expectedSpansAndFingerprints
+    ]
+    assert all(isinstance(f, int) for _, f in spansAndFingerprints)
+    for (_, f1), (_, e1) in zip(spansAndFingerprints, expectedSpansAndFingerprints):
+        for (_, f2), (_, e2) in zip(spansAndFingerprints, expectedSpansAndFingerprints):
+            assert (f1 == f2) == (e1 == e2)
+
+
+def test_vocabulary_shared():
+    """Test builders sharing a vocabulary produce the same fingerprints"""
+
+    vocabulary = Vocabulary()
+    builder1 = WordFingerprintBuilder(2, vocabulary=vocabulary)
+    builder2 = WordFingerprintBuilder(2, vocabulary=vocabulary)
+
+    spansAndFingerprints1 = builder1.buildFingerprints("Hello Bob. Bye Bob")
+    spansAndFingerprints2 = builder2.buildFingerprints("Bye Bob")
+    assert spansAndFingerprints1[-1][1] == spansAndFingerprints2[0][1]
+    # 3 words and 2 separators
+    assert len(vocabulary) == 5
+
+
+def test_vocabulary_stable():
+    """Test ids don't depend on the vocabulary nor on the order of tokens"""
+
+    builder1 = WordFingerprintBuilder(2, vocabulary=Vocabulary())
+    builder2 = WordFingerprintBuilder(2, vocabulary=Vocabulary())
+    builder2.buildFingerprints("Other words first")
+
+    spansAndFingerprints1 = builder1.buildFingerprints("Hello Bob. Bye Bob")
+    spansAndFingerprints2 = builder2.buildFingerprints("Hello Bob. Bye Bob")
+    assert [f for _, f in spansAndFingerprints1] == [
+        f for _, f in spansAndFingerprints2
+    ]
+
+
+def test_vocabulary_max_size():
+    """Test emptying the cache of the vocabulary doesn't change ids"""
+
+    vocabulary = Vocabulary(maxSize=2)
+    builder = WordFingerprintBuilder(2, vocabulary=vocabulary)
+    expectedBuilder = WordFingerprintBuilder(2, vocabulary=Vocabulary())
+
+    text = "Hello Bob. Bye Bob"
+    assert builder.buildFingerprints(text) == expectedBuilder.buildFingerprints(text)
+    assert len(vocabulary) <= 2
+
+
+def test_vocabulary_duplicates():
+    """Test duplicates found with integer fingerprints are the same"""
+
+    texts = [
+        "Patient admitted for chest pain. No history of diabetes.",
+        "Follow-up visit. Patient admitted for chest pain, no history of diabetes.",
+        "No history of diabetes. Patient admitted for chest pain.",
+    ]
+
+    def getDuplicatesData(fingerprintBuilder):
+        duplicateFinder = DuplicateFinder(fingerprintBuilder, minDuplicateLength=10)
+        return [
+            (d.sourceDocId, d.sourceSpan.start, d.sourceSpan.end, d.targetSpan.start)
+            for i, text in enumerate(texts)
+            for d in duplicateFinder.findDuplicates(str(i), text)
+        ]
+
+    expectedDuplicatesData = getDuplicatesData(WordFingerprintBuilder(2))
+    assert expectedDuplicatesData
+    duplicatesData = getDuplicatesData(
+        WordFingerprintBuilder(2, vocabulary=Vocabulary())
+    )
+    assert duplicatesData == expectedDuplicatesData
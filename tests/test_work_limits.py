@@ -0,0 +1,100 @@
+import itertools
+
+from duptextfinder import CharFingerprintBuilder, DuplicateFinder, Truncation
+from duptextfinder import duplicate_finder
+
+# pathological text with many repeated fingerprints
+_SOURCE_TEXT = "Results:\n" + "=" * 100 + "\n| 1.0 | 1.0 | 1.0 |\n" * 20
+_TARGET_TEXT = "Other results:\n" + "=" * 50 + "\n| 1.0 | 1.0 | 1.0 |\n" * 10
+
+
+def _findDuplicates(**limits):
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4), minDuplicateLength=4, **limits
+    )
+    duplicateFinder.findDuplicates("D0", _SOURCE_TEXT)
+    return duplicateFinder.findDuplicates("D1", _TARGET_TEXT)
+
+
+def test_no_limits():
+    duplicates = _findDuplicates()
+    assert duplicates
+    assert not duplicates.truncated
+
+
+def test_max_source_spans():
+    duplicates = _findDuplicates(maxSourceSpansPerFingerprint=10)
+    assert duplicates.truncations == {Truncation.SOURCE_SPANS}
+    assert duplicates
+
+
+def test_max_in_progress_duplicates():
+    duplicates = _findDuplicates(maxInProgressDuplicates=5)
+    assert duplicates.truncations == {Truncation.IN_PROGRESS_DUPLICATES}
+    assert duplicates
+
+
+def test_max_time():
+    duplicates = _findDuplicates(maxTime=0)
+    assert duplicates.truncations == {Truncation.TIME}
+    assert duplicates == []
+
+
+def test_max_time_while_building_duplicates(monkeypatch):
+    """
+    Make sure the deadline is checked while building duplicates, even when the
+    1st target span has no fingerprint in common with the source doc
+    """
+
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4), minDuplicateLength=4, maxTime=10
+    )
+    duplicateFinder.findDuplicates("D0", "The patient has no allergies.")
+    # the deadline is exceeded after it is computed and checked once per
+    # source doc
+    times = itertools.chain([0, 0], itertools.repeat(100))
+    monkeypatch.setattr(duplicate_finder.time, "monotonic", lambda: next(times))
+    duplicates = duplicateFinder.findDuplicates("D1", "Z The patient has no allergies.")
+    assert duplicates.truncations == {Truncation.TIME}
+    assert duplicates == []
+
+
+def _findSourceIds(**limits):
+    duplicateFinder = DuplicateFinder(
+        CharFingerprintBuilder(4), minDuplicateLength=8, **limits
+    )
+    duplicateFinder.findDuplicates("D0", "The patient has no allergies.")
+    duplicateFinder.findDuplicates("D1", "Blood pressure was normal today.")
+    duplicateFinder.findDuplicates("D2", "Follow-up is planned in three months.")
+    duplicates = duplicateFinder.findDuplicates(
+        "D3",
+        "The patient has no allergies. Follow-up is planned in three months. "
+        "Blood pressure",
+    )
+    return duplicates, [d.sourceDocId for d in duplicates]
+
+
+def test_max_sources():
+    duplicates, sourceIds = _findSourceIds()
+    assert sourceIds == ["D0", "D1", "D2"]
+    assert not duplicates.truncated
+
+    # sources with the most fingerprints in common are kept, and returned in
+    # chronological order
+    duplicates, sourceIds = _findSourceIds(maxSources=2)
+    assert sourceIds == ["D0", "D2"]
+    assert duplicates.truncations == {Truncation.MAX_SOURCES}
+
+    duplicates, sourceIds = _findSourceIds(maxSources=3)
+    assert sourceIds == ["D0", "D1", "D2"]
+    assert not duplicates.truncated
+
+
+def test_covered_fraction():
+    duplicates, sourceIds = _findSourceIds(stopWhenCoveredFraction=0.4)
+    assert sourceIds == ["D2"]
+    assert duplicates.truncations == {Truncation.COVERED_FRACTION}
+
+    duplicates, sourceIds = _findSourceIds(stopWhenCoveredFraction=1.0)
+    assert sourceIds == ["D0", "D1", "D2"]
+    assert not duplicates.truncated